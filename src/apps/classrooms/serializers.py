@@ -168,7 +168,7 @@ class TDListSerializer(serializers.ModelSerializer):
         completed = Complete.objects.filter(
             user=request.user,
             content_type=ct,
-            object_id__in=[str(i) for i in items],
+            object_id__in=items,
             status='success',
         ).count()
         return {'completed': completed, 'total': len(items)}
@@ -451,7 +451,6 @@ def _compute_skill_axes(user_id: int, subject_id, weeks: int = 8) -> dict:
     if subject_id:
         content_qs = content_qs.filter(subject_id=subject_id)
     content_ids = list(content_qs.values_list('id', flat=True))
-    content_id_strs = [str(i) for i in content_ids]
 
     if not content_ids:
         return {
@@ -463,7 +462,7 @@ def _compute_skill_axes(user_id: int, subject_id, weeks: int = 8) -> dict:
     completes = Complete.objects.filter(
         user_id=user_id,
         content_type=content_ct,
-        object_id__in=content_id_strs,
+        object_id__in=content_ids,
     )
     total = completes.count()
     success_qs = completes.filter(status='success')
@@ -488,7 +487,7 @@ def _compute_skill_axes(user_id: int, subject_id, weeks: int = 8) -> dict:
         time_qs = StudyTimeTracker.objects.filter(
             user_id=user_id,
             content_type=content_ct,
-            object_id__in=[int(i) for i in success_obj_ids if i.isdigit()],
+            object_id__in=success_obj_ids,
         )
         agg = time_qs.aggregate(total=Sum('time_spent_seconds'), n=Count('id'))
         if agg['n']:
@@ -504,7 +503,7 @@ def _compute_skill_axes(user_id: int, subject_id, weeks: int = 8) -> dict:
     if success_obj_ids:
         diffs = (
             Content.objects
-            .filter(id__in=[int(i) for i in success_obj_ids if i.isdigit()])
+            .filter(id__in=success_obj_ids)
             .values_list('difficulty', flat=True)
         )
         scored = [DIFFICULTY_SCORE.get(d or 'easy', 33) for d in diffs]
@@ -519,7 +518,7 @@ def _compute_skill_axes(user_id: int, subject_id, weeks: int = 8) -> dict:
     eng_qs = StudyTimeTracker.objects.filter(
         user_id=user_id,
         content_type=content_ct,
-        object_id__in=[i for i in content_ids],  # int ids, StudyTimeTracker.object_id is int
+        object_id__in=content_ids,
         recorded_at__gte=cutoff,
     )
     total_seconds = eng_qs.aggregate(t=Sum('time_spent_seconds'))['t'] or 0
@@ -110,10 +110,14 @@ class ConcoursExam(SaveableMixin, models.Model):
 
     def save(self, *args, **kwargs):
         if self.display_id is None:
-            max_id = ConcoursExam.objects.filter(
-                concours_type=self.concours_type
-            ).aggregate(m=models.Max('display_id'))['m']
-            self.display_id = (max_id or 0) + 1
+            from apps.things.sequences import next_display_id
+            concours_type = self.concours_type
+            self.display_id = next_display_id(
+                f'concours:{concours_type}',
+                lambda: ConcoursExam.objects.filter(
+                    concours_type=concours_type
+                ).aggregate(m=models.Max('display_id'))['m'],
+            )
         super().save(*args, **kwargs)
 
     # JSON structure helpers ------------------------------------------------
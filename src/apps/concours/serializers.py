@@ -87,7 +87,7 @@ class ConcoursExamSerializer(serializers.ModelSerializer):
             return False
         ct = ContentType.objects.get_for_model(ConcoursExam)
         return Save.objects.filter(
-            user=u, content_type=ct, object_id=str(obj.id)
+            user=u, content_type=ct, object_id=obj.id
         ).exists()
 
     def get_comment_count(self, obj):
@@ -119,7 +119,7 @@ class ConcoursExamListSerializer(serializers.ModelSerializer):
             return False
         ct = ContentType.objects.get_for_model(ConcoursExam)
         return Save.objects.filter(
-            user=u, content_type=ct, object_id=str(obj.id)
+            user=u, content_type=ct, object_id=obj.id
         ).exists()
 
     def get_comment_count(self, obj):
@@ -208,7 +208,7 @@ class ConcoursTipSerializer(serializers.ModelSerializer):
         if not u:
             return False
         ct = ContentType.objects.get_for_model(ConcoursTip)
-        return Save.objects.filter(user=u, content_type=ct, object_id=str(obj.id)).exists()
+        return Save.objects.filter(user=u, content_type=ct, object_id=obj.id).exists()
 
     def get_vote_count(self, obj):
         return obj.votes.filter(value=1).count() - obj.votes.filter(value=-1).count()
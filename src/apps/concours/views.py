@@ -47,6 +47,7 @@ from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnl
 from rest_framework.response import Response
 
 from apps.interactions.models import Save, Vote
+from apps.things.pagination import paginate_by_cursor
 
 from .models import (
     ConcoursExam, ConcoursTip, ConcoursComment, ConcoursExamStats,
@@ -183,12 +184,12 @@ class ConcoursExamViewSet(viewsets.ModelViewSet):
         exam = self.get_object()
         ct = ContentType.objects.get_for_model(ConcoursExam)
         existing = Save.objects.filter(
-            user=request.user, content_type=ct, object_id=str(exam.id)
+            user=request.user, content_type=ct, object_id=exam.id
         ).first()
         if existing:
             existing.delete()
             return Response({'is_saved': False})
-        Save.objects.create(user=request.user, content_type=ct, object_id=str(exam.id))
+        Save.objects.create(user=request.user, content_type=ct, object_id=exam.id)
         return Response({'is_saved': True})
 
 
@@ -236,12 +237,12 @@ class ConcoursTipViewSet(viewsets.ModelViewSet):
         tip = self.get_object()
         ct = ContentType.objects.get_for_model(ConcoursTip)
         existing = Save.objects.filter(
-            user=request.user, content_type=ct, object_id=str(tip.id)
+            user=request.user, content_type=ct, object_id=tip.id
         ).first()
         if existing:
             existing.delete()
             return Response({'is_saved': False})
-        Save.objects.create(user=request.user, content_type=ct, object_id=str(tip.id))
+        Save.objects.create(user=request.user, content_type=ct, object_id=tip.id)
         return Response({'is_saved': True})
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
@@ -257,11 +258,11 @@ class ConcoursTipViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_400_BAD_REQUEST)
         ct = ContentType.objects.get_for_model(ConcoursTip)
         Vote.objects.filter(
-            user=request.user, content_type=ct, object_id=str(tip.id)
+            user=request.user, content_type=ct, object_id=tip.id
         ).delete()
         if value != 0:
             Vote.objects.create(
-                user=request.user, content_type=ct, object_id=str(tip.id), value=value,
+                user=request.user, content_type=ct, object_id=tip.id, value=value,
             )
         agg = tip.votes.filter(value=1).count() - tip.votes.filter(value=-1).count()
         return Response({'vote_count': agg, 'user_vote': value})
@@ -623,7 +624,7 @@ def session_recap(request, session_id):
 def my_sessions(request):
     qs = (SimulationSession.objects
           .filter(user=request.user)
-          .order_by('-started_at'))
+          .order_by('-started_at', '-id'))
     params = request.query_params
     if params.get('concours_type'):
         qs = qs.filter(concours_type=params['concours_type'])
@@ -631,6 +632,9 @@ def my_sessions(request):
         qs = qs.filter(status=params['status'])
     if params.get('mode'):
         qs = qs.filter(mode=params['mode'])
+    page = paginate_by_cursor(qs, request, lambda rows: SimulationSessionListSerializer(rows, many=True).data)
+    if page is not None:
+        return page
     return Response(SimulationSessionListSerializer(qs[:200], many=True).data)
 
 
@@ -1,90 +1,81 @@
-# management/commands/recalculate_taxonomy_time.py
+"""
+Management command to rebuild TaxonomyTimeSpent from StudyTimeTracker
+Run with: python manage.py recalculate [--workers 4] [--resume] [--dry-run]
+
+Set-based (see interactions/taxonomy_rollup.py): tracker seconds are summed
+per user and taxonomy in SQL and written per chunk of users with one delete
+and a bulk insert. Progress is checkpointed per user-id range; --resume
+continues an interrupted run over the same ranges. --dry-run writes nothing
+and reports how the stored rows differ from the trackers.
+"""
+from concurrent.futures import ProcessPoolExecutor
 
 from django.core.management.base import BaseCommand
-from django.contrib.contenttypes.models import ContentType
-from django.db import connection, transaction
-from datetime import timedelta
-from apps.interactions.models import StudyTimeTracker, TaxonomyTimeSpent, update_taxonomy_time
-import time
+from django.db import connections
 
+from apps.interactions.models import TaxonomyRebuildCheckpoint, TaxonomyTimeSpent
+from apps.interactions.taxonomy_rollup import rebuild_range, user_ranges
 
-class Command(BaseCommand):
-    help = 'Recalcule les temps par taxonomie à partir des StudyTimeTracker'
-
-    def handle(self, *args, **options):
-        # Test connection first
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                connection.ensure_connection()
-                self.stdout.write(self.style.SUCCESS('✓ Connexion DB établie'))
-                break
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    self.stdout.write(self.style.WARNING(f'Tentative {attempt + 1}/{max_retries} échouée: {e}'))
-                    time.sleep(2)
-                else:
-                    self.stdout.write(self.style.ERROR(f'Impossible de se connecter à la DB: {e}'))
-                    return
-
-        self.stdout.write('Suppression des anciennes données TaxonomyTimeSpent...')
-
-        # Supprimer toutes les données existantes avec transaction
-        try:
-            with transaction.atomic():
-                deleted_count = TaxonomyTimeSpent.objects.all().delete()[0]
-                self.stdout.write(f'Supprimé {deleted_count} entrées')
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Erreur lors de la suppression: {e}'))
-            return
-
-        # Recalculer à partir de StudyTimeTracker avec batching
-        try:
-            total = StudyTimeTracker.objects.count()
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Erreur comptage: {e}'))
-            return
+CHECKPOINT_PREFIX = 'taxonomy_time'
 
-        self.stdout.write(f'Recalcul de {total} entrées StudyTimeTracker...')
 
-        processed = 0
-        errors = 0
-        batch_size = 100
+def _rebuild(args):
+    """Process pool entry point: one user-id range on its own DB connection."""
+    import django
+    django.setup()
+    try:
+        return args[0], rebuild_range(*args)
+    finally:
+        connections.close_all()
 
-        # Process in batches to avoid memory issues
-        for offset in range(0, total, batch_size):
-            try:
-                batch = StudyTimeTracker.objects.select_related('content_type')[offset:offset + batch_size]
 
-                for tracker in batch:
-                    try:
-                        if tracker.time_spent_seconds > 0 and tracker.content_object:
-                            time_delta = timedelta(seconds=tracker.time_spent_seconds)
-                            update_taxonomy_time(tracker.user, tracker.content_object, time_delta)
-                        processed += 1
-
-                        if processed % 100 == 0:
-                            self.stdout.write(f'Traité {processed}/{total}...')
-
-                    except Exception as e:
-                        errors += 1
-                        self.stdout.write(self.style.WARNING(f'Erreur tracker {tracker.id}: {str(e)}'))
-
-                # Reconnect every batch to prevent timeout
-                connection.close()
-
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Erreur batch {offset}-{offset+batch_size}: {e}'))
-                errors += batch_size
-                continue
+class Command(BaseCommand):
+    help = 'Rebuild per-taxonomy study time (TaxonomyTimeSpent) from StudyTimeTracker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='User-id ranges rebuilt in parallel processes')
+        parser.add_argument('--chunk-users', type=int, default=500,
+                            help='Users rebuilt per transaction')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue the previous run from its checkpoints')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Write nothing; report the difference with the stored rows')
 
+    def handle(self, *args, **options):
+        chunk_users, dry_run = options['chunk_users'], options['dry_run']
+        checkpoints = TaxonomyRebuildCheckpoint.objects.filter(name__startswith=f'{CHECKPOINT_PREFIX}:')
+        if options['resume'] and not dry_run and checkpoints.exists():
+            ranges = [(c.name, c.lower, c.upper) for c in checkpoints if not c.finished]
+            self.stdout.write(self.style.WARNING(f'Resuming {len(ranges)} unfinished range(s)...'))
+        else:
+            if not dry_run:
+                checkpoints.delete()
+            parts = user_ranges(options['workers'])
+            ranges = [(f'{CHECKPOINT_PREFIX}:{i}/{len(parts)}', lo, hi) for i, (lo, hi) in enumerate(parts)]
+            self.stdout.write(self.style.WARNING(
+                f'{"Checking" if dry_run else "Rebuilding"} {len(ranges)} user range(s)...'
+            ))
+
+        jobs = [(name, lo, hi, chunk_users, dry_run) for name, lo, hi in ranges]
+        if options['workers'] > 1 and len(jobs) > 1:
+            connections.close_all()  # forked workers must not share the parent's connection
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                results = list(pool.map(_rebuild, jobs))
+        else:
+            results = [(job[0], rebuild_range(*job, progress=self._progress)) for job in jobs]
+
+        summary = {}
+        for name, totals in results:
+            self.stdout.write(f'{name}: ' + ', '.join(f'{k}={v}' for k, v in totals.items()))
+            for key, value in totals.items():
+                summary[key] = summary.get(key, 0) + value
         self.stdout.write(self.style.SUCCESS(
-            f'Terminé ! {processed} entrées traitées, {errors} erreurs'
+            ('Dry run: ' if dry_run else 'Done: ') + ', '.join(f'{k}={v}' for k, v in summary.items())
         ))
+        if not dry_run:
+            self.stdout.write(f'TaxonomyTimeSpent rows: {TaxonomyTimeSpent.objects.count()}')
 
-        # Afficher les totaux
-        try:
-            new_count = TaxonomyTimeSpent.objects.count()
-            self.stdout.write(f'Nouvelles entrées TaxonomyTimeSpent: {new_count}')
-        except Exception as e:
-            self.stdout.write(self.style.WARNING(f'Impossible de compter résultats: {e}'))
\ No newline at end of file
+    def _progress(self, name, lower, upper, users, rows):
+        self.stdout.write(f'{name}: users [{lower}, {upper if upper is not None else "∞"}) '
+                          f'-> {users} users, {rows} rows')
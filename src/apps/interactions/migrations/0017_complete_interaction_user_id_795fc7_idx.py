@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('interactions', '0016_remove_exam_author_remove_exam_chapters_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='complete',
+            index=models.Index(fields=['user', 'content_type', 'status', 'object_id'], name='interaction_user_id_795fc7_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:08
+
+from django.db import migrations, models
+
+GENERIC_MODELS = ['Vote', 'Save', 'Complete', 'Report', 'Evaluate', 'TimeSession', 'AICorrection']
+
+
+def check_object_ids(apps, schema_editor):
+    """Refuse to convert while any object_id is not a plain integer (the cast would fail midway)."""
+    bad = {}
+    for name in GENERIC_MODELS:
+        model = apps.get_model('interactions', name)
+        count = model.objects.exclude(object_id__regex=r'^[0-9]+$').count()
+        if count:
+            bad[name] = count
+    if bad:
+        raise RuntimeError(
+            f"Non-integer object_id values found {bad}; fix or delete those rows before migrating."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0017_complete_interaction_user_id_795fc7_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_object_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='aicorrection',
+            name='object_id',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='complete',
+            name='object_id',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='evaluate',
+            name='object_id',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='object_id',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='save',
+            name='object_id',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='timesession',
+            name='object_id',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='object_id',
+            field=models.PositiveIntegerField(),
+        ),
+    ]
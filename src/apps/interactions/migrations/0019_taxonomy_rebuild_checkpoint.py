@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0018_integer_object_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxonomyRebuildCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('lower', models.PositiveIntegerField()),
+                ('upper', models.PositiveIntegerField(blank=True, null=True)),
+                ('position', models.PositiveIntegerField()),
+                ('finished', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['lower'],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('interactions', '0019_taxonomy_rebuild_checkpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='taxonomytimespent',
+            name='interaction_user_id_746c0b_idx',
+        ),
+        migrations.AddIndex(
+            model_name='taxonomytimespent',
+            index=models.Index(fields=['user', 'taxonomy_type', '-total_time'], name='interaction_user_id_3adecb_idx'),
+        ),
+    ]
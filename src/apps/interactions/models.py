@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
 from datetime import timedelta
 from django.utils import timezone
 import logging
@@ -26,7 +27,7 @@ class Vote(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     content_type = models.ForeignKey(ContentType, on_delete=models.PROTECT)
-    object_id = models.CharField(max_length=64)
+    object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey('content_type', 'object_id')
 
     class Meta:
@@ -55,7 +56,7 @@ class Save(models.Model):
     saved_at = models.DateTimeField(auto_now_add=True)
 
     content_type = models.ForeignKey(ContentType, on_delete=models.PROTECT)
-    object_id = models.CharField(max_length=64)
+    object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey('content_type', 'object_id')
 
     class Meta:
@@ -95,7 +96,7 @@ class Complete(models.Model):
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='exercise_progress')
     content_type = models.ForeignKey(ContentType, on_delete=models.PROTECT)
-    object_id = models.CharField(max_length=64)
+    object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey('content_type', 'object_id')
     status = models.CharField(max_length=10, choices=PROGRESS_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -107,6 +108,8 @@ class Complete(models.Model):
         indexes = [
             models.Index(fields=['user']),
             models.Index(fields=['content_type', 'object_id']),
+            # covers the per-user status EXISTS filters on content lists
+            models.Index(fields=['user', 'content_type', 'status', 'object_id']),
         ]
 
     def __str__(self):
@@ -130,7 +133,7 @@ class CompleteableMixin(SaveableMixin,VotableMixin):
 class Report(models.Model):
     user = models.ForeignKey(User, on_delete=models.PROTECT)
     content_type = models.ForeignKey(ContentType, on_delete=models.PROTECT)
-    object_id = models.CharField(max_length=64)
+    object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey('content_type', 'object_id')
     reason = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -153,7 +156,7 @@ class Evaluate(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     content_type = models.ForeignKey(ContentType, on_delete=models.PROTECT)
-    object_id = models.CharField(max_length=64)
+    object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey('content_type', 'object_id')
     class Meta:
         app_label = 'interactions'
@@ -174,7 +177,7 @@ class TimeSession(models.Model):
     """
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='time_sessions')
     content_type = models.ForeignKey(ContentType, on_delete=models.PROTECT)
-    object_id = models.CharField(max_length=64)
+    object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey('content_type', 'object_id')
     
     # Temps de cette session spécifique
@@ -279,7 +282,8 @@ class TaxonomyTimeSpent(models.Model):
         app_label = 'interactions'
         unique_together = ('user', 'taxonomy_type', 'content_type', 'object_id')
         indexes = [
-            models.Index(fields=['user', 'taxonomy_type']),
+            # taxonomy stats: a user's rows of one type, longest first
+            models.Index(fields=['user', 'taxonomy_type', '-total_time']),
             models.Index(fields=['content_type', 'object_id']),
         ]
 
@@ -294,7 +298,80 @@ class TaxonomyTimeSpent(models.Model):
         return 0
 
 
-def update_taxonomy_time(user, content_object, time_delta):
+class TaxonomyRebuildCheckpoint(models.Model):
+    """
+    Progress of `manage.py recalculate` over one user-id range [lower, upper),
+    committed with each chunk so an interrupted rebuild resumes where it stopped.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    lower = models.PositiveIntegerField()
+    upper = models.PositiveIntegerField(null=True, blank=True)  # None: no upper bound
+    position = models.PositiveIntegerField()  # users below this id are rebuilt
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'interactions'
+        ordering = ['lower']
+
+    def __str__(self):
+        return f"{self.name}: [{self.lower}, {self.upper}) at {self.position}"
+
+
+TAXONOMY_FIELDS = (
+    # (taxonomy_type, field on the content model)
+    ('subject', 'subject'),
+    ('subfield', 'subfields'),
+    ('chapter', 'chapters'),
+    ('theorem', 'theorems'),
+)
+
+
+def content_taxonomies(contents):
+    """
+    {content pk: [(taxonomy_type, taxonomy model, taxonomy id), ...]} for
+    `contents` (instances of one model). Content memberships come from the
+    cached taxonomy map; other models read the FK from the instance and the
+    M2M memberships with one query per through table.
+    """
+    from apps.things.models import Content
+    from apps.things.taxonomy_map import get_many
+
+    contents = list(contents)
+    if not contents:
+        return {}
+    model = contents[0].__class__
+    if model is Content:
+        targets = {taxonomy_type: model._meta.get_field(name).related_model for taxonomy_type, name in TAXONOMY_FIELDS}
+        members = get_many(c.pk for c in contents)
+        return {
+            c.pk: [(taxonomy_type, targets[taxonomy_type], taxonomy_id)
+                   for taxonomy_type, taxonomy_id in members[c.pk].memberships()] if c.pk in members else []
+            for c in contents
+        }
+    ids = [c.pk for c in contents]
+    taxonomies = {pk: [] for pk in ids}
+    for taxonomy_type, name in TAXONOMY_FIELDS:
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        target = field.related_model
+        if field.many_to_one:
+            for c in contents:
+                value = getattr(c, field.attname)
+                if value:
+                    taxonomies[c.pk].append((taxonomy_type, target, value))
+        elif field.many_to_many:
+            through = field.remote_field.through
+            source, dest = field.m2m_field_name(), field.m2m_reverse_field_name()
+            rows = through.objects.filter(**{f'{source}__in': ids}).values_list(f'{source}_id', f'{dest}_id')
+            for content_id, taxonomy_id in rows:
+                taxonomies[content_id].append((taxonomy_type, target, taxonomy_id))
+    return taxonomies
+
+
+def update_taxonomy_time(user, content_object=None, time_delta=None, deltas=None):
     """
     Helper function to aggregate time to all related taxonomies
     Called when TimeSpent is updated
@@ -303,79 +380,58 @@ def update_taxonomy_time(user, content_object, time_delta):
         user: User object
         content_object: The content object (exercise, lesson, exam)
         time_delta: timedelta object representing time to add
-    """
-    if time_delta.total_seconds() <= 0:
-        return
+        deltas: list of (content_object, time_delta) pairs, instead of the two above
 
-    taxonomies_to_update = []
-
-    # Determine content type name for breakdown
-    content_type_name = getattr(content_object, 'type', content_object.__class__.__name__.lower())
-
-    # Get content type models
-    from django.apps import apps
-    Subject = apps.get_model('caracteristics', 'Subject')
-    Subfield = apps.get_model('caracteristics', 'Subfield')
-    Chapter = apps.get_model('caracteristics', 'Chapter')
-    Theorem = apps.get_model('caracteristics', 'Theorem')
-
-    # Extract taxonomies from content object
-    if hasattr(content_object, 'subject') and content_object.subject:
-        taxonomies_to_update.append({
-            'type': 'subject',
-            'content_type': ContentType.objects.get_for_model(Subject),
-            'object_id': content_object.subject.id
-        })
-
-    if hasattr(content_object, 'subfields'):
-        for subfield in content_object.subfields.all():
-            taxonomies_to_update.append({
-                'type': 'subfield',
-                'content_type': ContentType.objects.get_for_model(Subfield),
-                'object_id': subfield.id
-            })
+    All deltas are merged per taxonomy and added with a single
+    INSERT ... ON CONFLICT DO UPDATE (total_time = total_time + EXCLUDED.total_time),
+    so concurrent beacons never overwrite each other. The user's row lock
+    (taxonomy_rollup.lock_users) keeps a rebuild of the same user out.
+    """
+    from .study_time import upsert_increments
+    from .taxonomy_rollup import lock_users
 
-    if hasattr(content_object, 'chapters'):
-        for chapter in content_object.chapters.all():
-            taxonomies_to_update.append({
-                'type': 'chapter',
-                'content_type': ContentType.objects.get_for_model(Chapter),
-                'object_id': chapter.id
-            })
+    if deltas is None:
+        deltas = [(content_object, time_delta)]
+    deltas = [(obj, delta) for obj, delta in deltas if obj is not None and delta.total_seconds() > 0]
+    if not deltas:
+        return
 
-    if hasattr(content_object, 'theorems'):
-        for theorem in content_object.theorems.all():
-            taxonomies_to_update.append({
-                'type': 'theorem',
-                'content_type': ContentType.objects.get_for_model(Theorem),
-                'object_id': theorem.id
+    by_model = {}
+    for obj, _ in deltas:
+        by_model.setdefault(obj.__class__, {})[obj.pk] = obj
+    taxonomies = {}
+    for model, objects in by_model.items():
+        for pk, entries in content_taxonomies(objects.values()).items():
+            taxonomies[(model, pk)] = entries
+
+    # merge per taxonomy row: one statement cannot update the same row twice
+    zero = timedelta(0)
+    now = timezone.now()
+    rows = {}
+    for obj, delta in deltas:
+        # Time breakdown by content type name
+        content_type_name = getattr(obj, 'type', obj.__class__.__name__.lower())
+        breakdown = f'{content_type_name}_time' if content_type_name in ('exercise', 'lesson', 'exam') else None
+        for taxonomy_type, model, taxonomy_id in taxonomies[(obj.__class__, obj.pk)]:
+            ct = ContentType.objects.get_for_model(model)
+            row = rows.setdefault((taxonomy_type, ct.id, taxonomy_id), {
+                'user': user.id, 'taxonomy_type': taxonomy_type, 'content_type': ct.id,
+                'object_id': taxonomy_id, 'total_time': zero, 'exercise_time': zero,
+                'lesson_time': zero, 'exam_time': zero, 'created_at': now, 'updated_at': now,
             })
-
-    # Update or create TaxonomyTimeSpent records
-    for taxonomy in taxonomies_to_update:
-        taxonomy_time, created = TaxonomyTimeSpent.objects.get_or_create(
-            user=user,
-            taxonomy_type=taxonomy['type'],
-            content_type=taxonomy['content_type'],
-            object_id=taxonomy['object_id'],
-            defaults={
-                'total_time': timedelta(0),
-                'exercise_time': timedelta(0),
-                'lesson_time': timedelta(0),
-                'exam_time': timedelta(0)
-            }
+            row['total_time'] += delta
+            if breakdown:
+                row[breakdown] += delta
+
+    with transaction.atomic():
+        lock_users([user.id])
+        upsert_increments(
+            TaxonomyTimeSpent,
+            list(rows.values()),
+            conflict_fields=('user', 'taxonomy_type', 'content_type', 'object_id'),
+            increment_fields=('total_time', 'exercise_time', 'lesson_time', 'exam_time'),
+            set_fields=('updated_at',),
         )
-        taxonomy_time.total_time += time_delta
-
-        # Update specific content type time
-        if content_type_name == 'exercise':
-            taxonomy_time.exercise_time += time_delta
-        elif content_type_name == 'lesson':
-            taxonomy_time.lesson_time += time_delta
-        elif content_type_name == 'exam':
-            taxonomy_time.exam_time += time_delta
-
-        taxonomy_time.save()
 
 
 
@@ -546,7 +602,7 @@ class AICorrection(models.Model):
     # Relationships
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ai_corrections')
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
-    object_id = models.CharField(max_length=64)
+    object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey('content_type', 'object_id')
 
     # Submission
@@ -0,0 +1,150 @@
+"""
+Batched study-time writes.
+
+The frontend flushes study time as a list of (content_type, content_id,
+seconds) entries (POST /api/study-time/track-batch/). Entries are merged per
+user + content in memory, then written with one statement per table
+(StudyTimeTracker here, TaxonomyTimeSpent in update_taxonomy_time):
+
+    INSERT INTO interactions_studytimetracker (...) VALUES (...), (...)
+    ON CONFLICT (user_id, content_type_id, object_id)
+    DO UPDATE SET time_spent_seconds = time_spent_seconds + EXCLUDED.time_spent_seconds, ...
+
+so concurrent beacons add up instead of overwriting each other. ON CONFLICT
+works the same way on Postgres and SQLite (>= 3.24).
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger('django')
+
+# Merged content seconds below this are dropped, like single beacons in track_study_time
+MIN_SECONDS = 5
+MAX_BATCH_ENTRIES = 500
+UPSERT_CHUNK = 500
+
+# Frontend names for the unified Content model, registered as ContentType(model='content')
+CONTENT_ALIASES = ('exercise', 'lesson', 'exam')
+
+
+def upsert_increments(model, rows, conflict_fields, increment_fields, set_fields=()) -> int:
+    """
+    Insert `rows` (dicts keyed by field name) into `model`'s table. Rows that
+    hit the unique `conflict_fields` add their `increment_fields` to the stored
+    values and overwrite `set_fields`. Rows are written in key order so
+    concurrent batches take row locks in the same order.
+    """
+    if not rows:
+        return 0
+    meta = model._meta
+    fields = [meta.get_field(name) for name in rows[0]]
+    qn = connection.ops.quote_name
+    table = qn(meta.db_table)
+    columns = ', '.join(qn(f.column) for f in fields)
+    conflict = ', '.join(qn(meta.get_field(name).column) for name in conflict_fields)
+    updates = [
+        f'{qn(c)} = {table}.{qn(c)} + EXCLUDED.{qn(c)}'
+        for c in (meta.get_field(name).column for name in increment_fields)
+    ] + [
+        f'{qn(c)} = EXCLUDED.{qn(c)}'
+        for c in (meta.get_field(name).column for name in set_fields)
+    ]
+    placeholder = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    rows = sorted(rows, key=lambda row: tuple(row[name] for name in conflict_fields))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_CHUNK):
+            chunk = rows[start:start + UPSERT_CHUNK]
+            params = [f.get_db_prep_save(row[f.name], connection) for row in chunk for f in fields]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([placeholder] * len(chunk))} '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET {", ".join(updates)}',
+                params,
+            )
+    return len(rows)
+
+
+def resolve_content_type(name):
+    """ContentType for a frontend content_type name, or None when unknown."""
+    normalized = (name or '').lower()
+    if normalized in CONTENT_ALIASES:
+        normalized = 'content'
+    return ContentType.objects.filter(model=normalized).first()
+
+
+def coalesce_entries(entries):
+    """
+    Merge raw batch entries into {(content_type_id, object_id): seconds}.
+    Returns (merged, skipped) where skipped counts malformed entries.
+    """
+    merged = defaultdict(int)
+    content_types = {}
+    skipped = 0
+    for entry in entries[:MAX_BATCH_ENTRIES]:
+        try:
+            name = entry.get('content_type')
+            object_id = int(entry.get('content_id'))
+            seconds = float(entry.get('time_spent_seconds', 0))
+        except (AttributeError, TypeError, ValueError):
+            skipped += 1
+            continue
+        if name not in content_types:
+            content_types[name] = resolve_content_type(name)
+        ct = content_types[name]
+        if ct is None or object_id <= 0 or seconds <= 0:
+            skipped += 1
+            continue
+        merged[(ct.id, object_id)] += seconds
+    skipped += max(len(entries) - MAX_BATCH_ENTRIES, 0)
+    return {key: int(seconds) for key, seconds in merged.items()}, skipped
+
+
+def record_study_time(user, merged) -> dict:
+    """
+    Add merged {(content_type_id, object_id): seconds} to the user's
+    StudyTimeTracker rows and taxonomy totals. Returns the applied entries.
+    """
+    from .models import StudyTimeTracker, update_taxonomy_time
+
+    applied = {key: seconds for key, seconds in merged.items() if seconds >= MIN_SECONDS}
+    if not applied:
+        return {}
+
+    # only track content that still exists
+    by_type = defaultdict(list)
+    for ct_id, object_id in applied:
+        by_type[ct_id].append(object_id)
+    objects = {}
+    for ct_id, ids in by_type.items():
+        model = ContentType.objects.get_for_id(ct_id).model_class()
+        objects.update(((ct_id, obj.pk), obj) for obj in model._default_manager.filter(pk__in=ids))
+    applied = {key: seconds for key, seconds in applied.items() if key in objects}
+
+    # one transaction, so a taxonomy rebuild sees both writes or neither
+    now = timezone.now()
+    with transaction.atomic():
+        upsert_increments(
+            StudyTimeTracker,
+            [
+                {'user': user.id, 'content_type': ct_id, 'object_id': object_id,
+                 'time_spent_seconds': seconds, 'recorded_at': now}
+                for (ct_id, object_id), seconds in applied.items()
+            ],
+            conflict_fields=('user', 'content_type', 'object_id'),
+            increment_fields=('time_spent_seconds',),
+            set_fields=('recorded_at',),
+        )
+
+        try:
+            with transaction.atomic():
+                update_taxonomy_time(user, deltas=[
+                    (objects[key], timedelta(seconds=seconds)) for key, seconds in applied.items()
+                ])
+        except Exception as e:
+            logger.error(f"Failed to update taxonomy time: {e}")
+    return applied
@@ -0,0 +1,357 @@
+"""
+Set-based rebuild of TaxonomyTimeSpent from StudyTimeTracker.
+
+Tracker seconds are summed per (user, taxonomy) in SQL and written straight
+back, one statement per taxonomy over every tracked model that has the
+taxonomy field (Content, ConcoursTip, ... as in content_taxonomies):
+
+    INSERT INTO interactions_taxonomytimespent (user_id, taxonomy_type, ..., total_time, ...)
+    SELECT s.user_id, 'chapter', :chapter_ct, s.taxonomy_id, SUM(s.seconds), ...
+    FROM (
+        SELECT t.user_id, m.chapter_id AS taxonomy_id, c.type AS kind, t.time_spent_seconds AS seconds
+        FROM interactions_studytimetracker t
+        JOIN things_content c ON c.id = t.object_id
+        JOIN things_content_chapters m ON m.content_id = c.id
+        WHERE t.content_type_id = :content AND t.user_id >= :lo AND t.user_id < :hi
+        UNION ALL ...
+    ) s
+    GROUP BY s.user_id, s.taxonomy_id
+
+(subjects come from the FK column). Each chunk of users is one transaction
+that locks the users' rows (lock_users, also taken by update_taxonomy_time),
+deletes their TaxonomyTimeSpent rows, inserts the aggregate and moves its
+TaxonomyRebuildCheckpoint. A beacon for one of those users waits for the
+chunk or the chunk waits for it, so it is counted exactly once; other users
+and other ranges (--workers) are not blocked. A rebuild stopped at any point
+resumes after the last committed chunk.
+
+User ids are split into contiguous ranges [lower, upper) that can be rebuilt
+in parallel (see `manage.py recalculate --workers`); chunks inside a range
+are found by keyset on the tracker user ids. --dry-run sums the same query
+into Python (compute_rollup) and diffs it with the stored rows.
+
+`taxonomy_time_stats` serves /api/study-time/taxonomy-stats/ from the rollup
+with one indexed read ((user, taxonomy_type, -total_time)), names joined in
+SQL. It isn't cached: the read is cheap and tracking writes must show at once.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection, transaction
+from django.db.models import Case, CharField, IntegerField, OuterRef, Subquery, Value, When
+from django.utils import timezone
+
+from .models import TAXONOMY_FIELDS, StudyTimeTracker, TaxonomyRebuildCheckpoint, TaxonomyTimeSpent
+
+logger = logging.getLogger('django')
+
+BREAKDOWN = ('exercise', 'lesson', 'exam')
+
+
+def user_ranges(parts: int) -> list:
+    """Split tracker user ids into `parts` contiguous [lower, upper) ranges of similar user counts."""
+    users = StudyTimeTracker.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+    count = users.count()
+    bounds = [0]
+    for k in range(1, max(parts, 1)):
+        offset = count * k // parts
+        if 0 < offset < count:
+            bound = users[offset]
+            if bound > bounds[-1]:
+                bounds.append(bound)
+    return [(lo, hi) for lo, hi in zip(bounds, bounds[1:] + [None])]
+
+
+def next_bound(position, upper, chunk_users):
+    """Upper bound of the chunk starting at `position`: the id after its last user, or `upper`."""
+    users = StudyTimeTracker.objects.filter(user_id__gte=position)
+    if upper is not None:
+        users = users.filter(user_id__lt=upper)
+    last = users.order_by('user_id').values_list('user_id', flat=True).distinct()[chunk_users - 1:chunk_users]
+    last = list(last)
+    return last[0] + 1 if last else upper
+
+
+def _taxonomy_sources(lower, upper) -> list:
+    """
+    (taxonomy_type, taxonomy ContentType id, [(tracked ContentType id, table,
+    extra JOIN, taxonomy id column, content kind column or None), ...]) per
+    taxonomy, for every model tracked by users in [lower, upper) that has the
+    TAXONOMY_FIELDS update_taxonomy_time reads (content_taxonomies).
+    """
+    from apps.things.models import Content
+
+    qn = connection.ops.quote_name
+    tracked = StudyTimeTracker.objects.filter(**_range_filter(lower, upper)).order_by(
+        'content_type_id').values_list('content_type_id', flat=True).distinct()
+    models = [(ct_id, ContentType.objects.get_for_id(ct_id).model_class()) for ct_id in tracked]
+    sources = []
+    for taxonomy_type, name in TAXONOMY_FIELDS:
+        target = Content._meta.get_field(name).related_model
+        selects = []
+        for ct_id, model in models:
+            try:
+                field = model._meta.get_field(name) if model else None
+            except FieldDoesNotExist:
+                field = None
+            if field is None or field.related_model is not target:
+                continue
+            if field.many_to_many:
+                through = field.remote_field.through
+                join = (f'JOIN {qn(through._meta.db_table)} m '
+                        f'ON m.{qn(field.m2m_column_name())} = c.{qn(model._meta.pk.column)}')
+                column = f'm.{qn(field.m2m_reverse_name())}'
+            else:
+                join = ''
+                column = f'c.{qn(field.column)}'
+            try:
+                kind = f'c.{qn(model._meta.get_field("type").column)}'
+            except FieldDoesNotExist:
+                kind = None
+            selects.append((ct_id, model, join, column, kind))
+        if selects:
+            sources.append((taxonomy_type, ContentType.objects.get_for_model(target).id, selects))
+    return sources
+
+
+def _rollup_select(source, lower, upper, seconds=None, extra=()):
+    """
+    (SQL, params) aggregating tracker seconds per (user, taxonomy) for one
+    taxonomy source and users in [lower, upper), over every tracked model
+    (UNION ALL). Selects user id, taxonomy type, taxonomy ct id, taxonomy id,
+    then total / exercise / lesson / exam each wrapped by `seconds`, then the
+    `extra` values. Like update_taxonomy_time, the content kind is the model's
+    `type` field, or else its model name.
+    """
+    taxonomy_type, taxonomy_ct_id, selects = source
+    seconds = seconds or (lambda expr: expr)
+    qn = connection.ops.quote_name
+    tracker = qn(StudyTimeTracker._meta.db_table)
+    bounds = 't.user_id >= %s' + ('' if upper is None else ' AND t.user_id < %s')
+    parts, part_params = [], []
+    for ct_id, model, join, column, kind in selects:
+        parts.append(
+            f'SELECT t.user_id AS user_id, {column} AS taxonomy_id, {kind or "%s"} AS kind, '
+            f't.time_spent_seconds AS seconds '
+            f'FROM {tracker} t JOIN {qn(model._meta.db_table)} c ON c.{qn(model._meta.pk.column)} = t.object_id '
+            f'{join} WHERE t.content_type_id = %s AND t.time_spent_seconds > 0 AND {column} IS NOT NULL '
+            f'AND {bounds}'
+        )
+        part_params += ([] if kind else [model._meta.model_name]) + [ct_id, lower]
+        part_params += [] if upper is None else [upper]
+    sums = [seconds('SUM(s.seconds)')] + [
+        seconds('SUM(CASE WHEN s.kind = %s THEN s.seconds ELSE 0 END)') for _ in BREAKDOWN
+    ]
+    sql = (
+        f'SELECT s.user_id, %s, %s, s.taxonomy_id, {", ".join(sums + ["%s"] * len(extra))} '
+        f'FROM ({" UNION ALL ".join(parts)}) s '
+        # the WHERE lets SQLite parse the ON CONFLICT of an INSERT ... SELECT
+        f'WHERE s.user_id IS NOT NULL GROUP BY s.user_id, s.taxonomy_id'
+    )
+    return sql, [taxonomy_type, taxonomy_ct_id, *BREAKDOWN, *extra, *part_params]
+
+
+def compute_rollup(lower, upper) -> dict:
+    """
+    {(user_id, taxonomy_type, taxonomy ct id, taxonomy id): [total, exercise, lesson, exam] seconds}
+    for users in [lower, upper), straight from the trackers.
+    """
+    rollup = {}
+    with connection.cursor() as cursor:
+        for source in _taxonomy_sources(lower, upper):
+            cursor.execute(*_rollup_select(source, lower, upper))
+            for user_id, taxonomy_type, ct_id, taxonomy_id, *totals in cursor.fetchall():
+                rollup[(user_id, taxonomy_type, ct_id, taxonomy_id)] = [int(v) for v in totals]
+    return rollup
+
+
+def _range_filter(lower, upper) -> dict:
+    return {'user_id__gte': lower} if upper is None else {'user_id__gte': lower, 'user_id__lt': upper}
+
+
+def stored_rollup(lower, upper) -> dict:
+    """Current TaxonomyTimeSpent rows for users in [lower, upper), keyed like compute_rollup."""
+    rows = TaxonomyTimeSpent.objects.filter(**_range_filter(lower, upper)).values_list(
+        'user_id', 'taxonomy_type', 'content_type_id', 'object_id',
+        'total_time', 'exercise_time', 'lesson_time', 'exam_time',
+    )
+    return {
+        tuple(row[:4]): [int(d.total_seconds()) for d in row[4:]]
+        for row in rows.iterator()
+    }
+
+
+def _as_duration(expr: str) -> str:
+    """SQL turning summed seconds into the DurationField column value."""
+    if connection.features.has_native_duration_field:
+        return f"({expr}) * INTERVAL '1 second'"
+    return f'({expr}) * 1000000'  # stored as microseconds
+
+
+def lock_users(user_ids) -> None:
+    """
+    Lock the auth_user rows of `user_ids` until the end of the transaction
+    (FOR NO KEY UPDATE). Rebuilds and tracking writes both take it, so a
+    user's rows are never rebuilt while one of their beacons is half written.
+    SQLite serializes writers instead; no query is run there, so the next
+    write opens the transaction with the write lock.
+    """
+    if not connection.features.has_select_for_update:
+        return
+    User = StudyTimeTracker._meta.get_field('user').related_model
+    list(User.objects.select_for_update(no_key=True).filter(pk__in=user_ids).order_by('pk').values_list('pk'))
+
+
+def write_rollup(lower, upper) -> int:
+    """
+    Replace the rows of users in [lower, upper) with the aggregation of their
+    trackers, in SQL. Call inside a transaction; returns the rows written.
+    """
+    User = StudyTimeTracker._meta.get_field('user').related_model
+    qn = connection.ops.quote_name
+    meta = TaxonomyTimeSpent._meta
+    table = qn(meta.db_table)
+    column = lambda name: qn(meta.get_field(name).column)
+    columns = ', '.join(column(name) for name in (
+        'user', 'taxonomy_type', 'content_type', 'object_id',
+        'total_time', 'exercise_time', 'lesson_time', 'exam_time', 'created_at', 'updated_at',
+    ))
+    conflict = ', '.join(column(name) for name in ('user', 'taxonomy_type', 'content_type', 'object_id'))
+    # a user created after the lock whose beacon commits before the INSERT
+    # already has rows; its trackers are in the aggregate, so overwrite them
+    overwrite = ', '.join(f'{column(name)} = EXCLUDED.{column(name)}' for name in (
+        'total_time', 'exercise_time', 'lesson_time', 'exam_time', 'updated_at',
+    ))
+    now = meta.get_field('updated_at').get_db_prep_save(timezone.now(), connection)
+    users = User.objects.filter(pk__gte=lower) if upper is None else User.objects.filter(pk__gte=lower, pk__lt=upper)
+    lock_users(users.values('pk'))
+    written = 0
+    with connection.cursor() as cursor:
+        TaxonomyTimeSpent.objects.filter(**_range_filter(lower, upper)).delete()
+        for source in _taxonomy_sources(lower, upper):
+            sql, params = _rollup_select(source, lower, upper, seconds=_as_duration, extra=(now, now))
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) {sql} ON CONFLICT ({conflict}) DO UPDATE SET {overwrite}',
+                params,
+            )
+            written += cursor.rowcount
+    return written
+
+
+def diff_rollup(expected, stored) -> dict:
+    """Row counts a rebuild would add / remove / change, and the total seconds it would move."""
+    added = expected.keys() - stored.keys()
+    removed = stored.keys() - expected.keys()
+    changed = [k for k in expected.keys() & stored.keys() if expected[k] != stored[k]]
+    return {
+        'added': len(added),
+        'removed': len(removed),
+        'changed': len(changed),
+        'unchanged': len(expected) - len(added) - len(changed),
+        'seconds_delta': sum(v[0] for v in expected.values()) - sum(v[0] for v in stored.values()),
+    }
+
+
+def rebuild_range(name, lower, upper, chunk_users=500, dry_run=False, progress=None) -> dict:
+    """
+    Rebuild users in [lower, upper) chunk by chunk, resuming from checkpoint
+    `name` when it covers the same range. With dry_run, nothing is written and
+    the result is the diff against the stored rows.
+    """
+    totals = {'chunks': 0, 'users': 0, 'rows': 0}
+    if dry_run:
+        totals.update(added=0, removed=0, changed=0, unchanged=0, seconds_delta=0)
+        position = lower
+    else:
+        checkpoint, _ = TaxonomyRebuildCheckpoint.objects.get_or_create(
+            name=name, defaults={'lower': lower, 'upper': upper, 'position': lower}
+        )
+        if (checkpoint.lower, checkpoint.upper) != (lower, upper):
+            raise ValueError(f'Checkpoint {name} covers [{checkpoint.lower}, {checkpoint.upper}), '
+                             f'not [{lower}, {upper}); rerun without --resume')
+        if checkpoint.finished:
+            return totals
+        position = checkpoint.position
+
+    while True:
+        end = next_bound(position, upper, chunk_users)
+        if dry_run:
+            expected = compute_rollup(position, end)
+            rows, users = len(expected), len({key[0] for key in expected})
+            for key, value in diff_rollup(expected, stored_rollup(position, end)).items():
+                totals[key] += value
+        else:
+            with transaction.atomic():
+                rows = write_rollup(position, end)
+                users = TaxonomyTimeSpent.objects.filter(
+                    **_range_filter(position, end)
+                ).values('user_id').distinct().count()
+                checkpoint.position = position if end is None else end
+                checkpoint.finished = end == upper
+                checkpoint.save(update_fields=['position', 'finished', 'updated_at'])
+        totals['chunks'] += 1
+        totals['users'] += users
+        totals['rows'] += rows
+        if progress:
+            progress(name, position, end, users, rows)
+        if end == upper:
+            return totals
+        position = end
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+def _taxonomy_name():
+    from apps.things.models import Content
+
+    whens = []
+    for taxonomy_type, name in TAXONOMY_FIELDS:
+        model = Content._meta.get_field(name).related_model
+        names = model.objects.filter(pk=OuterRef('object_id')).values('name')[:1]
+        whens.append(When(taxonomy_type=taxonomy_type, then=Subquery(names)))
+    return Case(*whens, default=None, output_field=CharField())
+
+
+def taxonomy_time_stats(user_id, taxonomy_type=None, search=None, limit=None) -> list:
+    """
+    The user's taxonomies by total time, longest first, as dicts of seconds;
+    filtered by type and name and cut to `limit` in SQL. SQLite's LIKE only
+    folds ASCII case, so there the name search runs in Python over the user's
+    rows, before the limit.
+    """
+    rows = TaxonomyTimeSpent.objects.filter(user_id=user_id, total_time__gt=timedelta(0))
+    if taxonomy_type:
+        rows = rows.filter(taxonomy_type=taxonomy_type)
+    rows = rows.annotate(name=_taxonomy_name()).exclude(name=None)
+    python_search = search and connection.vendor == 'sqlite'
+    if search and not python_search:
+        rows = rows.filter(name__icontains=search)
+    # ties: subject, subfield, chapter, theorem, as the hierarchy reads
+    type_rank = Case(*[When(taxonomy_type=t, then=Value(i)) for i, (t, _) in enumerate(TAXONOMY_FIELDS)],
+                     default=Value(len(TAXONOMY_FIELDS)), output_field=IntegerField())
+    rows = rows.order_by('-total_time', type_rank, 'object_id').values_list(
+        'taxonomy_type', 'object_id', 'name', 'total_time', 'exercise_time', 'lesson_time', 'exam_time'
+    )
+    if python_search:
+        search_lower = search.lower()
+        rows = [row for row in rows if search_lower in row[2].lower()]
+    if limit is not None:
+        rows = rows[:limit]
+    return [
+        {
+            'id': f'{tax_type}_{tax_id}',
+            'taxonomy_type': tax_type,
+            'taxonomy_id': tax_id,
+            'name': name,
+            'total_time_seconds': int(total.total_seconds()),
+            'exercise_time_seconds': int(exercise.total_seconds()),
+            'lesson_time_seconds': int(lesson.total_seconds()),
+            'exam_time_seconds': int(exam.total_seconds()),
+        }
+        for tax_type, tax_id, name, total, exercise, lesson, exam in rows
+    ]
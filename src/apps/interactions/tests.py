@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.caracteristics.models import Chapter, Subject
+from apps.things import taxonomy_map
+from apps.things.models import Content
+from .models import StudyTimeTracker, TaxonomyTimeSpent
+from .study_time import MIN_SECONDS
+
+
+class StudyTimeTrackingTests(TestCase):
+    """Batches and single beacons add up in the tracker and the taxonomy totals."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='x')
+        cls.subject = Subject.objects.create(name='Mathématiques')
+        cls.chapter = Chapter.objects.create(name='Suites', subject=cls.subject)
+        cls.exercise, cls.lesson = (
+            Content.objects.create(type=type_, title=type_, author=cls.user, subject=cls.subject)
+            for type_ in ('exercise', 'lesson')
+        )
+        cls.exercise.chapters.add(cls.chapter)
+        cls.lesson.chapters.add(cls.chapter)
+
+    def setUp(self):
+        # the process-local taxonomy map outlives the rolled back test data
+        taxonomy_map.invalidate([])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _batch(self, entries):
+        response = self.client.post('/api/study-time/track-batch/', {'entries': entries}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def _beacon(self, content, seconds):
+        return self.client.post('/api/study-time/track/', {
+            'content_type': content.type, 'content_id': content.id, 'time_spent_seconds': seconds,
+        }, format='json')
+
+    def _tracked(self, content):
+        ct = ContentType.objects.get_for_model(Content)
+        row = StudyTimeTracker.objects.filter(user=self.user, content_type=ct, object_id=content.id).first()
+        return row and row.time_spent_seconds
+
+    def _taxonomy(self, taxonomy_type, obj):
+        return TaxonomyTimeSpent.objects.get(
+            user=self.user, taxonomy_type=taxonomy_type,
+            content_type=ContentType.objects.get_for_model(obj), object_id=obj.id,
+        )
+
+    def test_batches_and_beacon_add_up(self):
+        entries = [
+            {'content_type': 'exercise', 'content_id': self.exercise.id, 'time_spent_seconds': 40},
+            {'content_type': 'exercise', 'content_id': self.exercise.id, 'time_spent_seconds': 20},
+            {'content_type': 'lesson', 'content_id': self.lesson.id, 'time_spent_seconds': 30},
+        ]
+        for _ in range(2):
+            data = self._batch(entries)
+            self.assertEqual((data['tracked'], data['skipped'], data['time_spent_seconds']), (2, 0, 90))
+        self.assertEqual(self._beacon(self.exercise, 10).status_code, 200)
+
+        self.assertEqual(self._tracked(self.exercise), 130)
+        self.assertEqual(self._tracked(self.lesson), 60)
+        for taxonomy_type, obj in (('subject', self.subject), ('chapter', self.chapter)):
+            row = self._taxonomy(taxonomy_type, obj)
+            self.assertEqual(row.total_time, timedelta(seconds=190))
+            self.assertEqual(row.exercise_time, timedelta(seconds=130))
+            self.assertEqual(row.lesson_time, timedelta(seconds=60))
+            self.assertEqual(row.exam_time, timedelta(0))
+
+    def test_missing_and_malformed_entries_are_skipped(self):
+        data = self._batch([
+            {'content_type': 'exercise', 'content_id': self.exercise.id, 'time_spent_seconds': 30},
+            {'content_type': 'exercise', 'content_id': 999999, 'time_spent_seconds': 30},
+            {'content_type': 'exercise', 'content_id': 'abc', 'time_spent_seconds': 30},
+            {'content_type': 'bogus', 'content_id': self.exercise.id, 'time_spent_seconds': 30},
+            {'content_type': 'lesson', 'content_id': self.lesson.id, 'time_spent_seconds': -5},
+            'not an entry',
+        ])
+        self.assertEqual((data['tracked'], data['skipped'], data['time_spent_seconds']), (1, 5, 30))
+        self.assertEqual(self._tracked(self.exercise), 30)
+        self.assertIsNone(self._tracked(self.lesson))
+        self.assertEqual(StudyTimeTracker.objects.count(), 1)
+
+    def test_min_seconds(self):
+        short = MIN_SECONDS - 1
+        self.assertEqual(self._beacon(self.exercise, short).data['message'], 'Skipped - time too short')
+        data = self._batch([{'content_type': 'lesson', 'content_id': self.lesson.id, 'time_spent_seconds': short}])
+        self.assertEqual((data['tracked'], data['skipped']), (0, 1))
+        self.assertFalse(StudyTimeTracker.objects.exists())
+        self.assertFalse(TaxonomyTimeSpent.objects.exists())
+
+        # the threshold applies to the merged seconds of a content
+        data = self._batch([
+            {'content_type': 'exercise', 'content_id': self.exercise.id, 'time_spent_seconds': short},
+            {'content_type': 'exercise', 'content_id': self.exercise.id, 'time_spent_seconds': 1},
+        ])
+        self.assertEqual(data['tracked'], 1)
+        self.assertEqual(self._tracked(self.exercise), MIN_SECONDS)
+        self.assertEqual(self._taxonomy('subject', self.subject).exercise_time, timedelta(seconds=MIN_SECONDS))
@@ -4,6 +4,8 @@ from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F
 
 
 from .models import Vote, RevisionList, RevisionListItem, StudyTimeTracker, Complete, TaxonomyTimeSpent
@@ -58,14 +60,21 @@ class VoteMixin:
             if existing_vote.value == vote_value:
                 existing_vote.delete()
                 current_vote = None
+                score_delta = -vote_value
             else:
                 # If changing vote type (up to down or down to up)
+                score_delta = vote_value - existing_vote.value
                 existing_vote.value = vote_value
                 existing_vote.save()
                 current_vote = existing_vote
         else:
             # Create new vote
             current_vote = obj.votes.create(user=request.user, value=vote_value)
+            score_delta = vote_value
+
+        # Models with a denormalized vote_score column (Content) keep it in sync atomically
+        if hasattr(obj, 'vote_score'):
+            type(obj).objects.filter(pk=obj.pk).update(vote_score=F('vote_score') + score_delta)
             
         # Refresh the object to get updated vote count
         obj.refresh_from_db()
@@ -239,20 +248,45 @@ class RevisionListViewSet(viewsets.ModelViewSet):
 
 #----------------------------STUDY TIME TRACKING-------------------------------
 
+def _beacon_user(request, token):
+    """
+    (user, None) for a study-time beacon, or (None, skip Response).
+    sendBeacon cannot set headers, so the JWT may come in the body.
+    """
+    from rest_framework_simplejwt.tokens import AccessToken
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    user = None
+    if token:
+        try:
+            access_token = AccessToken(token)
+            user_id = access_token['user_id']
+            user = User.objects.get(id=user_id)
+            logger.info(f"Authenticated via token: user_id={user_id}")
+        except (InvalidToken, TokenError, User.DoesNotExist) as e:
+            logger.error(f"Invalid token in study time tracking: {e}")
+            return None, Response({'message': 'Skipped - invalid token'}, status=status.HTTP_200_OK)
+    elif request.user and hasattr(request.user, 'is_authenticated') and request.user.is_authenticated:
+        user = request.user
+        logger.info(f"Authenticated via session: user={user.username}")
+
+    if not user:
+        logger.warning(f"Study time tracking called without authentication")
+        return None, Response({'message': 'Skipped - not authenticated'}, status=status.HTTP_200_OK)
+    return user, None
+
+
 @api_view(['POST'])
 @permission_classes([])
 def track_study_time(request):
     """
     Track study time spent on a content page.
     """
-    from rest_framework_simplejwt.tokens import AccessToken
-    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-    from django.contrib.auth import get_user_model
     from datetime import timedelta
     from .models import update_taxonomy_time  # Ajouter cet import
 
-    User = get_user_model()
-
     try:
         # Support both JSON (normal requests) and FormData (sendBeacon)
         # Try request.data first (works for both JSON and DRF parsed data)
@@ -270,23 +304,9 @@ def track_study_time(request):
         user_authenticated = request.user and hasattr(request.user, 'is_authenticated') and request.user.is_authenticated
         logger.info(f"Study time track request - content_type: {content_type_name}, content_id: {content_id}, time: {time_spent}, has_token: {bool(token)}, user_authenticated: {user_authenticated}")
 
-        user = None
-        if token:
-            try:
-                access_token = AccessToken(token)
-                user_id = access_token['user_id']
-                user = User.objects.get(id=user_id)
-                logger.info(f"Authenticated via token: user_id={user_id}")
-            except (InvalidToken, TokenError, User.DoesNotExist) as e:
-                logger.error(f"Invalid token in study time tracking: {e}")
-                return Response({'message': 'Skipped - invalid token'}, status=status.HTTP_200_OK)
-        elif request.user and hasattr(request.user, 'is_authenticated') and request.user.is_authenticated:
-            user = request.user
-            logger.info(f"Authenticated via session: user={user.username}")
-
-        if not user:
-            logger.warning(f"Study time tracking called without authentication")
-            return Response({'message': 'Skipped - not authenticated'}, status=status.HTTP_200_OK)
+        user, skipped = _beacon_user(request, token)
+        if skipped:
+            return skipped
 
         if isinstance(time_spent, str):
             time_spent = float(time_spent)
@@ -322,31 +342,34 @@ def track_study_time(request):
             from django.db.models import F
             from django.utils import timezone
 
-            tracker, created = StudyTimeTracker.objects.get_or_create(
-                user=user,
-                content_type=content_type,
-                object_id=content_id,
-                defaults={'time_spent_seconds': int(time_spent)}
-            )
-
-            if not created:
-                tracker.time_spent_seconds = F('time_spent_seconds') + int(time_spent)
-                tracker.recorded_at = timezone.now()
-                tracker.save(update_fields=['time_spent_seconds', 'recorded_at'])
-                tracker.refresh_from_db()
-
-            # ========== NOUVEAU CODE : Mettre à jour les taxonomies ==========
-            # Récupérer l'objet content pour accéder aux taxonomies
-            try:
-                content_object = tracker.content_object
-                if content_object:
-                    time_delta = timedelta(seconds=int(time_spent))
-                    update_taxonomy_time(user, content_object, time_delta)
-                    logger.info(f"Updated taxonomy time for {user.username}: +{time_spent}s on {content_type_name}")
-            except Exception as tax_error:
-                # Ne pas faire échouer la requête si la mise à jour taxonomy échoue
-                logger.error(f"Failed to update taxonomy time: {str(tax_error)}")
-            # ==================================================================
+            # tracker and taxonomy rows together, so a taxonomy rebuild sees both or neither
+            with transaction.atomic():
+                tracker, created = StudyTimeTracker.objects.get_or_create(
+                    user=user,
+                    content_type=content_type,
+                    object_id=content_id,
+                    defaults={'time_spent_seconds': int(time_spent)}
+                )
+
+                if not created:
+                    tracker.time_spent_seconds = F('time_spent_seconds') + int(time_spent)
+                    tracker.recorded_at = timezone.now()
+                    tracker.save(update_fields=['time_spent_seconds', 'recorded_at'])
+                    tracker.refresh_from_db()
+
+                # ========== NOUVEAU CODE : Mettre à jour les taxonomies ==========
+                # Récupérer l'objet content pour accéder aux taxonomies
+                try:
+                    content_object = tracker.content_object
+                    if content_object:
+                        time_delta = timedelta(seconds=int(time_spent))
+                        with transaction.atomic():
+                            update_taxonomy_time(user, content_object, time_delta)
+                        logger.info(f"Updated taxonomy time for {user.username}: +{time_spent}s on {content_type_name}")
+                except Exception as tax_error:
+                    # Ne pas faire échouer la requête si la mise à jour taxonomy échoue
+                    logger.error(f"Failed to update taxonomy time: {str(tax_error)}")
+                # ==================================================================
 
             logger.info(f"Tracked {time_spent}s of study time for {user.username} on {content_type_name} {content_id} (total: {tracker.time_spent_seconds}s, {'created' if created else 'updated'})")
 
@@ -368,6 +391,50 @@ def track_study_time(request):
         return Response({'message': 'Skipped - error occurred'}, status=status.HTTP_200_OK)
 
 
+@api_view(['POST'])
+@permission_classes([])
+def track_study_time_batch(request):
+    """
+    Track study time for many contents in one request.
+    Body: {"entries": [{"content_type", "content_id", "time_spent_seconds"}, ...], "token"?}
+    `entries` may also be a JSON string (FormData from sendBeacon). Entries are
+    merged per content and written with one upsert per table, so the frontend
+    can flush its buffer periodically instead of on every visibility change.
+    """
+    import json
+    from .study_time import coalesce_entries, record_study_time
+
+    data = request.data if hasattr(request.data, 'get') else {}
+    user, skipped = _beacon_user(request, data.get('token'))
+    if skipped:
+        return skipped
+
+    entries = data.get('entries') or []
+    if isinstance(entries, str):
+        try:
+            entries = json.loads(entries)
+        except ValueError:
+            entries = None
+    if not isinstance(entries, list):
+        return Response({'error': 'entries must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        merged, invalid = coalesce_entries(entries)
+        applied = record_study_time(user, merged)
+    except Exception as e:
+        logger.error(f"Error tracking study time batch: {e}, user={user}", exc_info=True)
+        return Response({'message': 'Skipped - error occurred'}, status=status.HTTP_200_OK)
+
+    logger.info(f"Tracked study time batch for {user.username}: {len(entries)} entries, "
+                f"{len(applied)} contents, {sum(applied.values())}s")
+    return Response({
+        'message': 'Study time tracked successfully',
+        'tracked': len(applied),
+        'skipped': invalid + len(merged) - len(applied),
+        'time_spent_seconds': sum(applied.values()),
+    }, status=status.HTTP_200_OK)
+
+
 #----------------------------TAXONOMY TIME STATISTICS-------------------------------
 # views.py
 
@@ -375,11 +442,10 @@ def track_study_time(request):
 @permission_classes([IsAuthenticated])
 def get_taxonomy_time_stats(request):
     """
-    Get time spent statistics aggregated by taxonomy - REAL-TIME with SQL aggregation
+    Get time spent statistics aggregated by taxonomy, read from the
+    TaxonomyTimeSpent rollup (filtered and limited in SQL)
     """
-    from django.db.models import Sum, F, Value, CharField
-    from django.db.models.functions import Coalesce
-    from apps.things.models import Content
+    from .taxonomy_rollup import taxonomy_time_stats
 
     user = request.user
     taxonomy_type_filter = request.query_params.get('taxonomy_type', None)
@@ -387,10 +453,6 @@ def get_taxonomy_time_stats(request):
     limit = request.query_params.get('limit', None)
 
     try:
-        content_ct = ContentType.objects.get_for_model(Content)
-
-        results = {}
-
         def format_time(seconds):
             if not seconds or seconds == 0:
                 return "0s"
@@ -403,77 +465,17 @@ def get_taxonomy_time_stats(request):
                 minutes = (seconds % 3600) // 60
                 return f"{hours}h {minutes}m"
 
-        def add_to_results(tax_type, tax_id, tax_name, content_type, seconds):
-            if not seconds or seconds <= 0:
-                return
-            key = (tax_type, tax_id)
-            if key not in results:
-                results[key] = {
-                    'id': f"{tax_type}_{tax_id}",
-                    'taxonomy_type': tax_type,
-                    'taxonomy_id': tax_id,
-                    'name': tax_name,
-                    'total_time_seconds': 0,
-                    'exercise_time_seconds': 0,
-                    'lesson_time_seconds': 0,
-                    'exam_time_seconds': 0,
-                }
-            results[key]['total_time_seconds'] += seconds
-            results[key][f'{content_type}_time_seconds'] += seconds
-
-        # Fetch time per content object in one query
-        content_times = dict(
-            StudyTimeTracker.objects
-            .filter(user=user, content_type=content_ct, time_spent_seconds__gt=0)
-            .values_list('object_id', 'time_spent_seconds')
-        )
-
-        if content_times:
-            contents = (
-                Content.objects
-                .filter(id__in=content_times.keys())
-                .select_related('subject')
-                .prefetch_related('subfields', 'chapters', 'theorems')
-                .only('id', 'type', 'subject__id', 'subject__name')
-            )
+        try:
+            limit = int(limit) if limit else None
+        except ValueError:
+            limit = None
+        if limit is not None and limit < 0:
+            limit = None
 
-            for obj in contents:
-                time_spent = content_times.get(obj.id, 0)
-                ctype = obj.type  # 'exercise', 'lesson', or 'exam'
-                if obj.subject:
-                    add_to_results('subject', obj.subject.id, obj.subject.name, ctype, time_spent)
-                for sf in obj.subfields.all():
-                    add_to_results('subfield', sf.id, sf.name, ctype, time_spent)
-                for ch in obj.chapters.all():
-                    add_to_results('chapter', ch.id, ch.name, ctype, time_spent)
-                for th in obj.theorems.all():
-                    add_to_results('theorem', th.id, th.name, ctype, time_spent)
-
-        # Convertir en liste
-        result_list = list(results.values())
-
-        # Filtrer par type de taxonomie
-        if taxonomy_type_filter:
-            result_list = [r for r in result_list if r['taxonomy_type'] == taxonomy_type_filter]
-
-        # Filtrer par recherche
-        if search:
-            search_lower = search.lower()
-            result_list = [r for r in result_list if search_lower in r['name'].lower()]
-
-        # Trier par temps total décroissant
-        result_list.sort(key=lambda x: x['total_time_seconds'], reverse=True)
+        result_list = taxonomy_time_stats(user.id, taxonomy_type_filter, search, limit)
 
         # Ajouter le temps formaté
-        for r in result_list:
-            r['total_time_formatted'] = format_time(r['total_time_seconds'])
-
-        # Appliquer la limite
-        if limit:
-            try:
-                result_list = result_list[:int(limit)]
-            except ValueError:
-                pass
+        result_list = [{**r, 'total_time_formatted': format_time(r['total_time_seconds'])} for r in result_list]
 
         return Response({
             'count': len(result_list),
@@ -9,17 +9,32 @@ Each document:
         "version": "2.0",
         "blocks": [ ... ]
     },
+    "metrics": {                      # computed at write time, see
+        "total_points":   <int>,      # structure_utils.compute_metrics
+        "item_count":     <int>,
+        "section_count":  <int>,
+        "preview":        <str>,
+        "question_paths": [<str>, ...],
+    },
+    "revision":   <int>,              # bumped by every write, see patch_blocks
     "created_at": <datetime>,
     "updated_at": <datetime>,
 }
 
 Lookup key: (type, display_id) — unique index enforced at connection time.
+
+Writers either replace json_content wholesale (upsert_structure) or send
+block-level operations (patch_blocks), which only ship the blocks that
+changed, in one atomic pipeline update. Both bump `revision`; patch_blocks
+can be made conditional on the revision the editor started from (optimistic
+concurrency).
 """
 
 import logging
 from datetime import datetime, timezone
 
 from config.mongodb import get_db
+from .structure_utils import StructureIndex, cached_index, compute_metrics, structure_index
 
 logger = logging.getLogger('django')
 
@@ -30,6 +45,13 @@ def _col():
     return get_db()[COLLECTION]
 
 
+def metrics_of(doc: dict) -> dict:
+    """Stored metrics, or computed on the fly for documents not yet backfilled."""
+    if doc.get('metrics') is not None:
+        return doc['metrics']
+    return compute_metrics(doc.get('json_content') or {})
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
@@ -43,6 +65,44 @@ def get_structure(content_type: str, display_id: int) -> dict:
     return doc['json_content'] if doc else {}
 
 
+def get_structure_and_metrics(content_type: str, display_id: int) -> tuple[dict, dict]:
+    """Return (json_content, metrics) in one query; ({}, empty metrics) if not found."""
+    doc = _col().find_one(
+        {'type': content_type, 'display_id': display_id},
+        {'_id': 0, 'json_content': 1, 'metrics': 1},
+    )
+    if not doc:
+        return {}, compute_metrics({})
+    return doc.get('json_content') or {}, metrics_of(doc)
+
+
+def get_structure_index(content_type: str, display_id: int) -> StructureIndex:
+    """
+    StructureIndex (paths, blocks, points) of (type, display_id), memoized per
+    revision: a warm lookup only reads the revision, a miss reads json_content.
+    """
+    col = _col()
+    query = {'type': content_type, 'display_id': display_id}
+    head = col.find_one(query, {'_id': 0, 'revision': 1})
+    if head is None:
+        return structure_index({})
+    index = cached_index((content_type, display_id, head.get('revision')))
+    if index is not None:
+        return index
+    doc = col.find_one(query, {'_id': 0, 'json_content': 1, 'revision': 1}) or {}
+    return structure_index(doc.get('json_content') or {}, key=(content_type, display_id, doc.get('revision')))
+
+
+def get_metrics(content_type: str, display_id: int) -> dict:
+    """Return the metrics sub-document without loading json_content."""
+    col = _col()
+    query = {'type': content_type, 'display_id': display_id}
+    doc = col.find_one(query, {'_id': 0, 'metrics': 1})
+    if doc and doc.get('metrics') is None:
+        doc = col.find_one(query, {'_id': 0, 'json_content': 1})
+    return metrics_of(doc or {})
+
+
 def get_structures_batch(content_type: str, display_ids: list) -> dict:
     """Return {display_id: json_content} for all given IDs in one query."""
     docs = _col().find(
@@ -52,26 +112,297 @@ def get_structures_batch(content_type: str, display_ids: list) -> dict:
     return {doc['display_id']: doc['json_content'] for doc in docs}
 
 
-def upsert_structure(content_type: str, display_id: int, json_content: dict) -> None:
-    """Insert or replace the json_content for (type, display_id)."""
+def get_documents_multi(keys: list, fields=('json_content', 'metrics')) -> dict:
+    """
+    Return {(type, display_id): doc} for a mixed list of (type, display_id)
+    pairs in one query, projecting only `fields`.
+
+    display_id is only unique per type, so results are keyed by the pair —
+    an exercise and an exam sharing a display_id never collide.
+    """
+    by_type = {}
+    for content_type, display_id in keys:
+        if display_id is not None:
+            by_type.setdefault(content_type, set()).add(display_id)
+    if not by_type:
+        return {}
+    clauses = [
+        {'type': t, 'display_id': {'$in': sorted(ids)}}
+        for t, ids in by_type.items()
+    ]
+    query = clauses[0] if len(clauses) == 1 else {'$or': clauses}
+    projection = {'_id': 0, 'type': 1, 'display_id': 1, **{f: 1 for f in fields}}
+    return {(doc['type'], doc['display_id']): doc for doc in _col().find(query, projection)}
+
+
+def get_structures_multi(keys: list) -> dict:
+    """Return {(type, display_id): json_content} for a mixed list of keys."""
+    docs = get_documents_multi(keys, fields=('json_content',))
+    return {key: doc.get('json_content') or {} for key, doc in docs.items()}
+
+
+def get_metrics_multi(keys: list) -> dict:
+    """Return {(type, display_id): metrics} without loading json_content."""
+    docs = get_documents_multi(keys, fields=('metrics',))
+    stale = [key for key, doc in docs.items() if doc.get('metrics') is None]
+    if stale:
+        docs.update(get_documents_multi(stale, fields=('json_content',)))
+    return {key: metrics_of(doc) for key, doc in docs.items()}
+
+
+def upsert_structure(content_type: str, display_id: int, json_content: dict) -> int:
+    """Insert or replace the json_content (and its metrics) for (type, display_id). Returns the new revision."""
+    from pymongo import ReturnDocument
+    from pymongo.errors import OperationFailure
+
     now = datetime.now(tz=timezone.utc)
-    _col().update_one(
+    doc = _col().find_one_and_update(
         {'type': content_type, 'display_id': display_id},
         {
             '$set': {
                 'json_content': json_content,
+                'metrics': compute_metrics(json_content),
                 'updated_at': now,
             },
+            '$inc': {'revision': 1},
             '$setOnInsert': {
                 'type': content_type,
                 'display_id': display_id,
                 'created_at': now,
             },
         },
+        projection={'_id': 0, 'revision': 1},
         upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    _index_structure(content_type, display_id, json_content)
+    return doc['revision']
+
+
+def _index_structure(content_type, display_id, json_content):
+    try:
+        from apps.things.search_index import index_structure
+        index_structure(content_type, display_id, json_content)
+    except Exception as e:
+        logger.error(f"Search indexing failed for {content_type} {display_id}: {e}")
+
+
+# ---------------------------------------------------------------------------
+# Block-level patches
+# ---------------------------------------------------------------------------
+
+class PatchError(ValueError):
+    """The operations don't apply to the stored blocks (unknown id, duplicate id, bad op)."""
+
+
+class RevisionConflict(Exception):
+    """The document changed since the revision the editor started from."""
+
+    def __init__(self, expected, current):
+        super().__init__(f"expected revision {expected}, document is at {current}")
+        self.expected = expected
+        self.current = current
+
+
+PATCH_OPS = ('set', 'update', 'insert', 'remove')
+
+# "$mergeObjects requires object inputs" (a dotted update key through a scalar)
+MERGE_OBJECTS_TYPE_ERROR = 40400
+
+
+def _check_ops(ops: list, block_ids: list) -> None:
+    """Dry-run `ops` against the current block ids so nothing is written when one would fail."""
+    ids = list(block_ids)
+    for i, op in enumerate(ops):
+        kind = op.get('op') if isinstance(op, dict) else None
+        if kind not in PATCH_OPS:
+            raise PatchError(f"ops[{i}]: op must be one of {', '.join(PATCH_OPS)}")
+        if kind == 'insert':
+            block = op.get('block')
+            if not isinstance(block, dict) or not block.get('id'):
+                raise PatchError(f"ops[{i}]: insert needs a block with an id")
+            if block['id'] in ids:
+                raise PatchError(f"ops[{i}]: block {block['id']!r} already exists")
+            position = op.get('position')
+            if position is not None and (not isinstance(position, int) or position < 0):
+                raise PatchError(f"ops[{i}]: position must be a non-negative integer")
+            ids.insert(len(ids) if position is None else position, block['id'])
+            continue
+        if op.get('id') not in ids:
+            raise PatchError(f"ops[{i}]: no block with id {op.get('id')!r}")
+        if kind == 'remove':
+            ids.remove(op['id'])
+        elif kind == 'set':
+            block = op.get('block')
+            if not isinstance(block, dict) or block.get('id', op['id']) != op['id']:
+                raise PatchError(f"ops[{i}]: set needs a block keeping id {op['id']!r}")
+        else:
+            fields = op.get('fields')
+            if not isinstance(fields, dict) or not fields or 'id' in fields or \
+                    any(not k or k.startswith('$') for k in fields):
+                raise PatchError(f"ops[{i}]: update needs non-empty fields (id can't change)")
+
+
+BLOCKS = '$json_content.blocks'
+
+# Block keys StructureIndex reads; extract_text also reads every `html` value.
+DERIVED_KEYS = frozenset({'type', 'id', 'points', 'content', 'subQuestions', 'parts'})
+
+
+def _has_html(value) -> bool:
+    if isinstance(value, dict):
+        return 'html' in value or any(_has_html(v) for v in value.values())
+    if isinstance(value, list):
+        return any(_has_html(v) for v in value)
+    return False
+
+
+def _changes_derived(op: dict) -> bool:
+    """Whether `op` can change the metrics or the search text of the structure."""
+    if op['op'] != 'update':
+        return True
+    return any(
+        name.partition('.')[0] in DERIVED_KEYS or name.rpartition('.')[2] == 'html' or _has_html(value)
+        for name, value in op['fields'].items()
     )
 
 
+def _merged(expr: str, fields: dict) -> dict:
+    """$mergeObjects of `expr` with `fields`; dotted keys merge into the nested object like $set would."""
+    flat, nested = {}, {}
+    for name, value in fields.items():
+        head, _, rest = name.partition('.')
+        if rest:
+            nested.setdefault(head, {})[rest] = value
+        else:
+            flat[head] = {'$literal': value}
+    for head, sub in nested.items():
+        flat[head] = _merged(f'{expr}.{head}', sub)
+    return {'$mergeObjects': [{'$ifNull': [expr, {}]}, flat]}
+
+
+def _op_blocks(op: dict) -> dict:
+    """Aggregation expression for the blocks array after one op (values wrapped in $literal)."""
+    kind = op['op']
+    if kind in ('set', 'update'):
+        block = {'$literal': {**op['block'], 'id': op['id']}} if kind == 'set' else _merged('$$b', op['fields'])
+        return {'$map': {'input': BLOCKS, 'as': 'b', 'in': {
+            '$cond': [{'$eq': ['$$b.id', op['id']]}, block, '$$b'],
+        }}}
+    if kind == 'remove':
+        return {'$filter': {'input': BLOCKS, 'as': 'b', 'cond': {'$ne': ['$$b.id', op['id']]}}}
+    block = [{'$literal': op['block']}]
+    if op.get('position') is None:
+        return {'$concatArrays': [BLOCKS, block]}
+    if op['position'] == 0:
+        return {'$concatArrays': [block, BLOCKS]}
+    return {'$concatArrays': [
+        {'$slice': [BLOCKS, op['position']]},
+        block,
+        {'$slice': [BLOCKS, op['position'], {'$add': [{'$size': BLOCKS}, 1]}]},
+    ]}
+
+
+def patch_blocks(content_type: str, display_id: int, ops: list, expected_revision=None) -> int:
+    """
+    Apply block-level operations to the structure of (type, display_id),
+    addressing blocks by their `id`:
+
+        {'op': 'set',    'id': 'q3', 'block': {...}}          replace one block
+        {'op': 'update', 'id': 'q3', 'fields': {'points': 4}} set keys inside one block
+        {'op': 'insert', 'block': {...}, 'position': 2}       add a block (appended without position)
+        {'op': 'remove', 'id': 'q3'}                          drop a block
+
+    The whole batch is one pipeline update: a $set stage per op rewrites
+    `json_content.blocks` with $map / $filter / $concatArrays, so only the
+    touched blocks travel to Mongo and the ops land together or not at all.
+    The update is conditional on the revision read before it, so with
+    `expected_revision` (or when a concurrent writer gets in between) it fails
+    with RevisionConflict and nothing is written. Ops are checked against the
+    stored block ids first, and a dotted update key through a non-object value
+    is rejected by Mongo (both PatchError).
+
+    Metrics and the search text are derived from the whole structure, so when
+    an op can change them (anything but an update of other block keys, see
+    DERIVED_KEYS) the update returns the new json_content and both are
+    refreshed from it; otherwise only the revision comes back.
+
+    Returns the new revision.
+    """
+    from pymongo import ReturnDocument
+    from pymongo.errors import OperationFailure
+
+    if not ops:
+        raise PatchError('no operations')
+    col = _col()
+    key = {'type': content_type, 'display_id': display_id}
+    current = col.find_one(key, {'_id': 0, 'revision': 1, 'json_content.blocks.id': 1})
+    if current is None:
+        raise PatchError(f"no structure for {content_type} {display_id}")
+    revision = current.get('revision', 0)
+    if expected_revision is not None and expected_revision != revision:
+        raise RevisionConflict(expected_revision, revision)
+    blocks = (current.get('json_content') or {}).get('blocks') or []
+    _check_ops(ops, [b.get('id') for b in blocks])
+
+    pipeline = [{'$set': {'json_content.blocks': {'$ifNull': [BLOCKS, []]}}}]
+    pipeline += [{'$set': {'json_content.blocks': _op_blocks(op)}} for op in ops]
+    pipeline.append({'$set': {
+        'updated_at': datetime.now(tz=timezone.utc),
+        'revision': {'$add': [{'$ifNull': ['$revision', 0]}, 1]},
+    }})
+    refresh = any(_changes_derived(op) for op in ops)
+    projection = {'_id': 0, 'revision': 1, 'json_content': 1} if refresh else {'_id': 0, 'revision': 1}
+    try:
+        doc = col.find_one_and_update(
+            # documents written before revisions existed have no field yet
+            {**key, 'revision': revision} if revision else {**key, 'revision': {'$in': [0, None]}},
+            pipeline,
+            projection=projection,
+            return_document=ReturnDocument.AFTER,
+        )
+    except OperationFailure as e:
+        if e.code != MERGE_OBJECTS_TYPE_ERROR:
+            raise
+        raise PatchError('an update key goes through a field that is not an object') from e
+    if doc is None:
+        latest = col.find_one(key, {'_id': 0, 'revision': 1}) or {}
+        raise RevisionConflict(revision, latest.get('revision', 0))
+    revision = doc['revision']
+    if not refresh:
+        return revision
+
+    json_content = doc.get('json_content') or {}
+    metrics = compute_metrics(json_content, key=(content_type, display_id, revision))
+    col.update_one({**key, 'revision': revision}, {'$set': {'metrics': metrics}})
+    _index_structure(content_type, display_id, json_content)
+    return revision
+
+
+def backfill_metrics(batch_size: int = 500, force: bool = False) -> int:
+    """
+    Compute and store `metrics` for documents that lack it (or all of them
+    with force=True). Returns the number of documents updated.
+    """
+    from pymongo import UpdateOne
+
+    col = _col()
+    query = {} if force else {'metrics': {'$exists': False}}
+    cursor = col.find(query, {'_id': 1, 'json_content': 1}, batch_size=batch_size)
+    ops, updated = [], 0
+    for doc in cursor:
+        ops.append(UpdateOne(
+            {'_id': doc['_id']},
+            {'$set': {'metrics': compute_metrics(doc.get('json_content') or {})}},
+        ))
+        if len(ops) >= batch_size:
+            updated += col.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += col.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+
 def delete_structure(content_type: str, display_id: int) -> None:
     """Remove the document for (type, display_id)."""
     _col().delete_one({'type': content_type, 'display_id': display_id})
@@ -0,0 +1,85 @@
+"""
+Denormalized engagement counters stored on Content.
+
+    vote_score     — sum of vote values (up = +1, down = -1)
+    comment_count  — comments, replies included
+    success_count  — Complete rows with status 'success'
+    review_count   — Complete rows with status 'review'
+    save_count     — Save rows
+
+Write paths keep them current with atomic F() updates through `bump`;
+`reconcile_counters` recomputes them from the source tables to repair drift
+(see the reconcile_counters management command).
+"""
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+COUNTER_FIELDS = ('vote_score', 'comment_count', 'success_count', 'review_count', 'save_count')
+
+
+def bump(content_id, **deltas) -> None:
+    """Atomically add `deltas` to the counters of one Content row."""
+    from .models import Content
+    updates = {}
+    for field, delta in deltas.items():
+        if not delta:
+            continue
+        expr = F(field) + delta
+        # never let a missed increment push a positive counter below zero
+        updates[field] = Greatest(expr, 0) if field != 'vote_score' and delta < 0 else expr
+    if updates:
+        Content.objects.filter(pk=content_id).update(**updates)
+
+
+def counter_expressions(content_type_id, Vote, Comment, Save, Complete) -> dict:
+    """
+    {field: expression} computing every counter from its source table for
+    the outer Content row.
+    """
+    oid = OuterRef('pk')
+
+    def generic(model, aggregate, **filters):
+        qs = (model.objects
+              .filter(content_type_id=content_type_id, object_id=oid, **filters)
+              .order_by().values('object_id')
+              .annotate(n=aggregate).values('n')[:1])
+        return Coalesce(Subquery(qs, output_field=IntegerField()), 0)
+
+    comments = (Comment.objects.filter(content_item=OuterRef('pk'))
+                .order_by().values('content_item')
+                .annotate(n=Count('id')).values('n')[:1])
+    return {
+        'vote_score': generic(Vote, Sum('value')),
+        'comment_count': Coalesce(Subquery(comments, output_field=IntegerField()), 0),
+        'success_count': generic(Complete, Count('id'), status='success'),
+        'review_count': generic(Complete, Count('id'), status='review'),
+        'save_count': generic(Save, Count('id')),
+    }
+
+
+def reconcile_counters(queryset=None, dry_run=False) -> int:
+    """
+    Recompute the counters of `queryset` (all Content by default) and write
+    back rows that drifted. Returns the number of drifted rows.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from apps.interactions.models import Vote, Save, Complete
+    from .models import Content, Comment
+
+    ct = ContentType.objects.get_for_model(Content)
+    exprs = counter_expressions(ct.id, Vote, Comment, Save, Complete)
+    qs = queryset if queryset is not None else Content.objects.all()
+    expected = qs.annotate(**{f'expected_{f}': e for f, e in exprs.items()}).values(
+        'pk', *COUNTER_FIELDS, *(f'expected_{f}' for f in COUNTER_FIELDS)
+    )
+    drifted = [
+        row for row in expected.iterator()
+        if any(row[f] != row[f'expected_{f}'] for f in COUNTER_FIELDS)
+    ]
+    if not dry_run:
+        for row in drifted:
+            Content.objects.filter(pk=row['pk']).update(
+                **{f: row[f'expected_{f}'] for f in COUNTER_FIELDS}
+            )
+    return len(drifted)
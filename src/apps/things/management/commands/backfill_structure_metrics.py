@@ -0,0 +1,28 @@
+"""
+Management command to store precomputed `metrics` on existing Mongo content documents
+Run with: python manage.py backfill_structure_metrics
+"""
+from django.core.management.base import BaseCommand
+from apps.things.content_store import backfill_metrics
+
+
+class Command(BaseCommand):
+    help = 'Compute and store structure metrics for content documents that lack them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recompute metrics for every document, not only those missing them',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of documents per bulk write',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Starting structure metrics backfill...'))
+        updated = backfill_metrics(batch_size=options['batch_size'], force=options['force'])
+        self.stdout.write(self.style.SUCCESS(f'Backfill complete! Updated: {updated}'))
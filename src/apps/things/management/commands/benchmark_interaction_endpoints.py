@@ -0,0 +1,92 @@
+"""
+Management command timing the endpoints that join the generic interaction tables
+Run with: python manage.py benchmark_interaction_endpoints --items 20000
+
+Seeds one heavy user (votes, saves, completions and time sessions on a share
+of the catalog) inside a transaction that is rolled back at the end, then
+times the content list (user state + showCompleted) and the dashboard
+endpoints. Run it before and after interactions 0018 to compare the
+CharField and integer object_id layouts.
+"""
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.interactions.models import Complete, Save, TimeSession, Vote
+from apps.things.models import Content
+
+ENDPOINTS = [
+    ('content list', '/api/contents/?page_size=50'),
+    ('content list, showCompleted', '/api/contents/?page_size=50&showCompleted=true'),
+    ('dashboard stats', '/api/dashboard/stats/'),
+    ('dashboard recommended', '/api/dashboard/recommended/'),
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark list and dashboard endpoints against the generic interaction tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=20000, help='Catalog size')
+        parser.add_argument('--share', type=float, default=0.5,
+                            help='Share of the catalog the user interacted with')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed requests per endpoint')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options, random.Random(options['seed']))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, options, rng):
+        size = options['items']
+        self.stdout.write(self.style.WARNING(f'Seeding {size} items...'))
+        user = User.objects.create_user(f'bench_{time.time_ns()}')
+        items = [Content(type=rng.choice(['exercise', 'lesson', 'exam']), title=f'bench {i}', author=user)
+                 for i in range(size)]
+        Content.assign_display_ids(items)
+        items = Content.objects.bulk_create(items, batch_size=2000)
+        ct = ContentType.objects.get_for_model(Content)
+
+        touched = rng.sample(items, int(size * options['share']))
+        now = timezone.now()
+        Vote.objects.bulk_create(
+            [Vote(user=user, content_type=ct, object_id=i.pk, value=1) for i in touched[::3]], batch_size=2000)
+        Save.objects.bulk_create(
+            [Save(user=user, content_type=ct, object_id=i.pk) for i in touched[::4]], batch_size=2000)
+        Complete.objects.bulk_create(
+            [Complete(user=user, content_type=ct, object_id=i.pk, status=rng.choice(['success', 'review']))
+             for i in touched], batch_size=2000)
+        TimeSession.objects.bulk_create(
+            [TimeSession(user=user, content_type=ct, object_id=i.pk, session_duration=timedelta(minutes=5),
+                         started_at=now - timedelta(minutes=5), ended_at=now)
+             for i in touched], batch_size=2000)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        for name, url in ENDPOINTS:
+            client.get(url)  # warm caches
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for _ in range(options['repeat']):
+                    response = client.get(url)
+                elapsed = (time.perf_counter() - start) / options['repeat']
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: {elapsed * 1000:.1f} ms/request, '
+                f'{len(queries) // options["repeat"]} queries (HTTP {response.status_code})'
+            ))
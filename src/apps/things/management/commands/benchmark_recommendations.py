@@ -0,0 +1,105 @@
+"""
+Management command comparing the live taxonomy query with the similarity index
+Run with: python manage.py benchmark_recommendations --items 10000 100000
+
+Synthetic content and taxonomy are created inside a transaction that is rolled
+back at the end, so the database is left untouched.
+"""
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.caracteristics.models import Chapter, Subfield, Subject, Theorem
+from apps.things.models import Content
+from apps.things.similarity import build_index, live_neighbors_qs, neighbor_ids
+
+LIMITS = {'exercise': 3, 'lesson': 2, 'exam': 2}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark recommendation lookups: live OR-join query vs precomputed similarity index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, nargs='+', default=[10000, 100000],
+                            help='Catalog sizes to benchmark')
+        parser.add_argument('--samples', type=int, default=50,
+                            help='Source items timed per catalog size')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        for size in options['items']:
+            try:
+                with transaction.atomic():
+                    self._run(size, options['samples'], random.Random(options['seed']))
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _run(self, size, samples, rng):
+        self.stdout.write(self.style.WARNING(f'Seeding {size} synthetic items...'))
+        author = User.objects.create_user(f'bench_{time.time_ns()}')
+        subjects = Subject.objects.bulk_create([Subject(name=f'bench-s{i}') for i in range(5)])
+        subfields = Subfield.objects.bulk_create([
+            Subfield(name=f'bench-f{i}', subject=subjects[i % len(subjects)]) for i in range(50)
+        ])
+        chapters = Chapter.objects.bulk_create([
+            Chapter(name=f'bench-c{i}', subject=subjects[i % len(subjects)]) for i in range(max(size // 50, 20))
+        ])
+        theorems = Theorem.objects.bulk_create([Theorem(name=f'bench-t{i}') for i in range(max(size // 20, 50))])
+
+        types = list(LIMITS)
+        items = [
+            Content(type=rng.choice(types), title=f'bench {i}', author=author,
+                    subject=rng.choice(subjects), view_count=rng.randint(0, 1000))
+            for i in range(size)
+        ]
+        Content.assign_display_ids(items)
+        items = Content.objects.bulk_create(items, batch_size=2000)
+
+        for field, pool, per_item in (('chapters', chapters, 2), ('theorems', theorems, 3),
+                                      ('subfields', subfields, 1)):
+            through = getattr(Content, field).through
+            column = f'{through._meta.get_field(field[:-1]).attname}'
+            rows = []
+            for item in items:
+                for tax in rng.sample(pool, per_item):
+                    rows.append(through(content_id=item.pk, **{column: tax.pk}))
+            through.objects.bulk_create(rows, batch_size=5000)
+
+        start = time.perf_counter()
+        written = build_index()
+        build_secs = time.perf_counter() - start
+
+        sample = rng.sample(items, min(samples, len(items)))
+        live = self._time(lambda src: {
+            t: list(live_neighbors_qs(src, exclude_id=src.pk).filter(type=t)[:n]) for t, n in LIMITS.items()
+        }, sample)
+        indexed = self._time(lambda src: self._indexed(src.pk), sample)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{size} items | index build {build_secs:.1f}s ({written} rows) | '
+            f'live query {live * 1000:.1f} ms/request | index lookup {indexed * 1000:.1f} ms/request'
+        ))
+
+    @staticmethod
+    def _indexed(content_id):
+        ids = neighbor_ids(content_id)
+        wanted = {t: ids.get(t, [])[:n] for t, n in LIMITS.items()}
+        by_id = Content.objects.select_related('author__profile', 'subject').in_bulk(
+            [i for group in wanted.values() for i in group]
+        )
+        return {t: [by_id[i] for i in group if i in by_id] for t, group in wanted.items()}
+
+    @staticmethod
+    def _time(fn, sample):
+        start = time.perf_counter()
+        for src in sample:
+            fn(src)
+        return (time.perf_counter() - start) / len(sample)
@@ -0,0 +1,99 @@
+"""
+Management command comparing the old and new viewed/completed content filters
+Run with: python manage.py benchmark_status_filters --viewed 10000
+
+Old: IN / NOT IN over every ViewHistory.object_id of the user, and a join
+through the `completed` GenericRelation. New: correlated EXISTS subqueries
+(see _viewed_by / _completed_by in things/views.py).
+
+Synthetic data is created inside a transaction that is rolled back at the
+end, so the database is left untouched.
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from apps.interactions.models import Complete
+from apps.things.models import Content
+from apps.things.views import _completed_by, _viewed_by
+from apps.users.models import ViewHistory
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark showViewed / hideViewed / showCompleted: IN lists and joins vs EXISTS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--viewed', type=int, default=10000,
+                            help='ViewHistory rows for the benchmark user')
+        parser.add_argument('--items', type=int, default=None,
+                            help='Catalog size (default: twice --viewed)')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Timed runs per filter')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['viewed'], options['items'] or 2 * options['viewed'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, viewed, size, repeat):
+        self.stdout.write(self.style.WARNING(f'Seeding {size} items, {viewed} viewed by one user...'))
+        user = User.objects.create_user(f'bench_{time.time_ns()}')
+        items = [Content(type='exercise', title=f'bench {i}', author=user) for i in range(size)]
+        Content.assign_display_ids(items)
+        items = Content.objects.bulk_create(items, batch_size=2000)
+        ct = ContentType.objects.get_for_model(Content)
+
+        ViewHistory.objects.bulk_create(
+            [ViewHistory(user=user, content_type=ct, object_id=i.pk) for i in items[:viewed]],
+            batch_size=2000,
+        )
+        Complete.objects.bulk_create(
+            [Complete(user=user, content_type=ct, object_id=i.pk, status='success')
+             for i in items[:viewed // 3]],
+            batch_size=2000,
+        )
+
+        base = Content.objects.all()
+        viewed_ids = ViewHistory.objects.filter(user=user, content_type=ct).values_list('object_id', flat=True)
+        cases = [
+            ('showViewed',
+             lambda: base.filter(id__in=viewed_ids),
+             lambda: base.filter(_viewed_by(user, ct))),
+            ('hideViewed',
+             lambda: base.exclude(id__in=viewed_ids),
+             lambda: base.filter(~_viewed_by(user, ct))),
+            ('showCompleted',
+             lambda: base.filter(Q(completed__user=user, completed__status='success')).distinct(),
+             lambda: base.filter(_completed_by(user, ct, 'success'))),
+        ]
+        for name, old, new in cases:
+            old_page, old_count = self._time(old, repeat)
+            new_page, new_count = self._time(new, repeat)
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: first page old {old_page * 1000:.1f} ms / exists {new_page * 1000:.1f} ms | '
+                f'count old {old_count * 1000:.1f} ms / exists {new_count * 1000:.1f} ms'
+            ))
+
+    @staticmethod
+    def _time(build, repeat):
+        page = count = 0.0
+        for _ in range(repeat):
+            qs = build().order_by('-created_at', '-id')
+            start = time.perf_counter()
+            list(qs[:20])
+            page += time.perf_counter() - start
+            start = time.perf_counter()
+            qs.count()
+            count += time.perf_counter() - start
+        return page / repeat, count / repeat
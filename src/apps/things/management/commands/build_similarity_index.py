@@ -0,0 +1,23 @@
+"""
+Management command to rebuild the taxonomy similarity index
+Run with: python manage.py build_similarity_index
+"""
+from django.core.management.base import BaseCommand
+from apps.things.similarity import build_index
+
+
+class Command(BaseCommand):
+    help = 'Recompute the top-K taxonomy neighbours of every content item'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of source items written per transaction',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Building similarity index...'))
+        written = build_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Index built! Rows written: {written}'))
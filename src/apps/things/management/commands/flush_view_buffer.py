@@ -0,0 +1,16 @@
+"""
+Management command to write buffered content views to the database
+Run with: python manage.py flush_view_buffer
+"""
+from django.core.management.base import BaseCommand
+from apps.things.view_buffer import flush
+
+
+class Command(BaseCommand):
+    help = 'Apply pending view_count increments and ViewHistory upserts from the view buffer'
+
+    def handle(self, *args, **options):
+        items, rows = flush()
+        self.stdout.write(self.style.SUCCESS(
+            f'Flushed views for {items} content items, {rows} history rows'
+        ))
@@ -0,0 +1,29 @@
+"""
+Management command to recompute ContentStats rows from the source tables
+Run with: python manage.py rebuild_content_stats
+"""
+from django.core.management.base import BaseCommand
+from apps.things.stats import rebuild_content_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-content statistics snapshots (sessions, histogram, solution views/matches)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--content',
+            type=int,
+            nargs='+',
+            help='Only rebuild these content ids',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of content items per batch',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Rebuilding content statistics...'))
+        written = rebuild_content_stats(options['content'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuild complete! Rows written: {written}'))
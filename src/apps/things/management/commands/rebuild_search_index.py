@@ -0,0 +1,23 @@
+"""
+Management command to rebuild the full-text search documents
+Run with: python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+from apps.things.search_index import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Reindex titles, taxonomy names and structure text of every content item'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of content items per batch',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Rebuilding search index...'))
+        written = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuild complete! Documents indexed: {written}'))
@@ -0,0 +1,32 @@
+"""
+Management command to repair drift in the denormalized Content engagement counters
+Run with: python manage.py reconcile_counters [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from apps.things.counters import reconcile_counters
+from apps.things.models import Content
+
+
+class Command(BaseCommand):
+    help = 'Recompute vote_score, comment_count, success_count, review_count and save_count on Content'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows drifted, without writing',
+        )
+        parser.add_argument(
+            '--type',
+            choices=[t for t, _ in Content.TYPE_CHOICES],
+            help='Limit to one content type',
+        )
+
+    def handle(self, *args, **options):
+        qs = Content.objects.all()
+        if options['type']:
+            qs = qs.filter(type=options['type'])
+        self.stdout.write(self.style.WARNING(f'Checking counters on {qs.count()} content items...'))
+        drifted = reconcile_counters(qs, dry_run=options['dry_run'])
+        verb = 'would be repaired' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(f'Done! {drifted} drifted rows {verb}'))
@@ -0,0 +1,107 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:44
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import CharField, Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+
+COUNTER_FIELDS = ('vote_score', 'comment_count', 'success_count', 'review_count', 'save_count')
+
+
+def populate_counters(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Content = apps.get_model('things', 'Content')
+    ct = ContentType.objects.filter(app_label='things', model='content').first()
+    if ct is None:
+        return
+
+    def generic(model_name, aggregate, **filters):
+        model = apps.get_model('interactions', model_name)
+        # object_id is a CharField before interactions 0018
+        oid = OuterRef('pk')
+        if isinstance(model._meta.get_field('object_id'), CharField):
+            oid = Cast(oid, CharField())
+        qs = (model.objects
+              .filter(content_type_id=ct.id, object_id=oid, **filters)
+              .order_by().values('object_id')
+              .annotate(n=aggregate).values('n')[:1])
+        return Coalesce(Subquery(qs, output_field=IntegerField()), 0)
+
+    Comment = apps.get_model('things', 'Comment')
+    comments = (Comment.objects.filter(content_item=OuterRef('pk'))
+                .order_by().values('content_item')
+                .annotate(n=Count('id')).values('n')[:1])
+    exprs = {
+        'vote_score': generic('Vote', Sum('value')),
+        'comment_count': Coalesce(Subquery(comments, output_field=IntegerField()), 0),
+        'success_count': generic('Complete', Count('id'), status='success'),
+        'review_count': generic('Complete', Count('id'), status='review'),
+        'save_count': generic('Save', Count('id')),
+    }
+    rows = Content.objects.annotate(**{f'new_{f}': e for f, e in exprs.items()}).values(
+        'pk', *(f'new_{f}' for f in COUNTER_FIELDS)
+    )
+    for row in rows.iterator():
+        Content.objects.filter(pk=row['pk']).update(
+            **{f: row[f'new_{f}'] for f in COUNTER_FIELDS}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('interactions', '0016_remove_exam_author_remove_exam_chapters_and_more'),
+        ('caracteristics', '0001_initial'),
+        ('things', '0002_remove_content_structure_remove_content_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='save_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='success_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='vote_score',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['vote_score', 'created_at'], name='things_cont_vote_sc_337ed4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['comment_count'], name='things_cont_comment_9531a8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['success_count'], name='things_cont_success_5708d5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['review_count'], name='things_cont_review__19dc1f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['save_count'], name='things_cont_save_co_9b10ed_idx'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
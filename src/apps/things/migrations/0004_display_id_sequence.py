@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('things', '0003_content_engagement_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisplayIdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=50, unique=True)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'things_display_id_sequence',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('things', '0004_display_id_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentStats',
+            fields=[
+                ('content', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='things.content')),
+                ('session_count', models.PositiveIntegerField(default=0)),
+                ('total_session_seconds', models.BigIntegerField(default=0)),
+                ('best_session_seconds', models.PositiveIntegerField(blank=True, null=True)),
+                ('duration_histogram', models.JSONField(default=list)),
+                ('solution_views_before_success', models.PositiveIntegerField(default=0)),
+                ('solution_match_count', models.PositiveIntegerField(default=0)),
+                ('study_stats', models.JSONField(default=dict)),
+                ('study_stats_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'things_content_stats',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('things', '0005_content_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.CharField(choices=[('exercise', 'Exercise'), ('lesson', 'Lesson'), ('exam', 'Exam')], max_length=10)),
+                ('score', models.FloatField()),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='things.content')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='things.content')),
+            ],
+            options={
+                'db_table': 'things_content_similarity',
+                'indexes': [models.Index(fields=['source', 'target_type', 'score'], name='things_cont_source__03cafa_idx')],
+                'unique_together': {('source', 'target')},
+            },
+        ),
+    ]
@@ -0,0 +1,136 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+# Search index DDL, see apps.things.search_index ('simple' text search
+# configuration: content mixes French, Arabic and formulas).
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE things_content_search ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(taxonomy, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX things_content_search_vector_gin ON things_content_search USING gin (search_vector)",
+    "CREATE INDEX things_content_search_title_trgm ON things_content_search USING gin (title gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS things_content_search_title_trgm",
+    "DROP INDEX IF EXISTS things_content_search_vector_gin",
+    "ALTER TABLE things_content_search DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE things_content_search_fts USING fts5(
+        title, taxonomy, body,
+        content='things_content_search', content_rowid='content_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER things_content_search_fts_ai AFTER INSERT ON things_content_search BEGIN
+        INSERT INTO things_content_search_fts(rowid, title, taxonomy, body)
+        VALUES (new.content_id, new.title, new.taxonomy, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER things_content_search_fts_ad AFTER DELETE ON things_content_search BEGIN
+        INSERT INTO things_content_search_fts(things_content_search_fts, rowid, title, taxonomy, body)
+        VALUES ('delete', old.content_id, old.title, old.taxonomy, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER things_content_search_fts_au AFTER UPDATE ON things_content_search BEGIN
+        INSERT INTO things_content_search_fts(things_content_search_fts, rowid, title, taxonomy, body)
+        VALUES ('delete', old.content_id, old.title, old.taxonomy, old.body);
+        INSERT INTO things_content_search_fts(rowid, title, taxonomy, body)
+        VALUES (new.content_id, new.title, new.taxonomy, new.body);
+    END
+    """,
+    "INSERT INTO things_content_search_fts(things_content_search_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS things_content_search_fts_au",
+    "DROP TRIGGER IF EXISTS things_content_search_fts_ad",
+    "DROP TRIGGER IF EXISTS things_content_search_fts_ai",
+    "DROP TABLE IF EXISTS things_content_search_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRES_FORWARD:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        try:
+            for sql in SQLITE_FORWARD:
+                schema_editor.execute(sql)
+        except OperationalError:
+            # SQLite built without FTS5 — search falls back to icontains
+            for sql in SQLITE_REVERSE:
+                schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRES_REVERSE:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        for sql in SQLITE_REVERSE:
+            schema_editor.execute(sql)
+
+
+def populate_documents(apps, schema_editor):
+    """Titles and taxonomy names; structure text needs `rebuild_search_index` (reads Mongo)."""
+    Content = apps.get_model('things', 'Content')
+    ContentSearchDocument = apps.get_model('things', 'ContentSearchDocument')
+    items = Content.objects.select_related('subject').prefetch_related(
+        'chapters', 'theorems', 'subfields', 'class_levels'
+    )
+    batch = []
+    for item in items.iterator(chunk_size=500):
+        names = [item.subject.name] if item.subject_id else []
+        for rel in ('chapters', 'theorems', 'subfields', 'class_levels'):
+            names.extend(obj.name for obj in getattr(item, rel).all())
+        batch.append(ContentSearchDocument(
+            content_id=item.pk, title=item.title, taxonomy=' '.join(names), body=item.content or ''
+        ))
+        if len(batch) >= 500:
+            ContentSearchDocument.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ContentSearchDocument.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('things', '0006_content_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentSearchDocument',
+            fields=[
+                ('content', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='things.content')),
+                ('title', models.CharField(blank=True, default='', max_length=200)),
+                ('taxonomy', models.TextField(blank=True, default='')),
+                ('body', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'things_content_search',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(populate_documents, migrations.RunPython.noop),
+    ]
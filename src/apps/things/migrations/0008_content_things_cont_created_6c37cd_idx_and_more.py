@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caracteristics', '0001_initial'),
+        ('things', '0007_content_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['created_at', 'id'], name='things_cont_created_6c37cd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['vote_score', 'id'], name='things_cont_vote_sc_49257f_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils.functional import cached_property
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericRelation
 from apps.interactions.models import VotableMixin, CompleteableMixin, SaveableMixin
@@ -39,6 +40,14 @@ class Content(CompleteableMixin, SaveableMixin, models.Model):
     theorems = models.ManyToManyField(Theorem, related_name='content_items', blank=True)
     subfields = models.ManyToManyField(Subfield, related_name='content_items', blank=True)
     view_count = models.PositiveIntegerField(default=0)
+
+    # denormalized engagement counters — maintained by apps.things.counters
+    vote_score = models.IntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    success_count = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    save_count = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -56,44 +65,77 @@ class Content(CompleteableMixin, SaveableMixin, models.Model):
         constraints = [
             models.UniqueConstraint(fields=['type', 'display_id'], name='unique_display_id_per_type')
         ]
+        indexes = [
+            models.Index(fields=['vote_score', 'created_at']),
+            # keyset pagination orderings (see pagination.py)
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['vote_score', 'id']),
+            models.Index(fields=['comment_count']),
+            models.Index(fields=['success_count']),
+            models.Index(fields=['review_count']),
+            models.Index(fields=['save_count']),
+        ]
 
     def __str__(self):
         return f"[{self.type}] {self.title}"
 
     def save(self, *args, **kwargs):
         if self.display_id is None:
-            max_id = Content.objects.filter(type=self.type).aggregate(
-                models.Max('display_id')
-            )['display_id__max']
-            self.display_id = (max_id or 0) + 1
+            from apps.things.sequences import next_display_id
+            self.display_id = next_display_id(
+                self.display_id_scope(self.type), self._display_id_seed(self.type)
+            )
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def display_id_scope(content_type: str) -> str:
+        return f'content:{content_type}'
+
+    @staticmethod
+    def _display_id_seed(content_type: str):
+        return lambda: Content.objects.filter(type=content_type).aggregate(
+            models.Max('display_id')
+        )['display_id__max']
+
+    @classmethod
+    def assign_display_ids(cls, items) -> None:
+        """Reserve display ids in one block per type for unsaved items (bulk imports)."""
+        from apps.things.sequences import assign_display_ids
+        assign_display_ids(
+            items,
+            scope_for=lambda item: cls.display_id_scope(item.type),
+            seed_for=lambda scope: cls._display_id_seed(scope.split(':', 1)[1]),
+        )
+
     def _get_structure(self) -> dict:
         from apps.things.content_store import get_structure
         return get_structure(self.type, self.display_id)
 
+    @cached_property
+    def metrics(self) -> dict:
+        """Precomputed structure metrics, read once per instance without json_content."""
+        from apps.things.content_store import get_metrics
+        return get_metrics(self.type, self.display_id)
+
     @property
     def total_points(self) -> int:
-        from apps.things.structure_utils import get_total_points
-        return get_total_points(self._get_structure())
+        return self.metrics['total_points']
 
     @property
     def item_count(self) -> int:
-        from apps.things.structure_utils import get_item_count
-        return get_item_count(self._get_structure())
+        return self.metrics['item_count']
 
     @property
     def section_count(self) -> int:
-        from apps.things.structure_utils import get_section_count
-        return get_section_count(self._get_structure())
+        return self.metrics['section_count']
 
     @property
-    def success_count(self):
-        return self.progress.filter(status='success').count()
+    def preview(self) -> str:
+        return self.metrics['preview']
 
     @property
-    def review_count(self):
-        return self.progress.filter(status='review').count()
+    def vote_count(self):
+        return self.vote_score
 
     @property
     def average_time_spent(self):
@@ -146,3 +188,101 @@ class Comment(VotableMixin, models.Model):
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.content_item}"
+
+
+# =====================
+# CONTENT STATS
+# =====================
+
+class ContentStats(models.Model):
+    """
+    Per-content statistics snapshot read by ContentViewSet.statistics.
+    Maintained incrementally by apps.things.stats; rebuild with
+    `python manage.py rebuild_content_stats`.
+    """
+    content = models.OneToOneField(Content, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+
+    session_count = models.PositiveIntegerField(default=0)
+    total_session_seconds = models.BigIntegerField(default=0)
+    best_session_seconds = models.PositiveIntegerField(null=True, blank=True)
+    # session counts per bucket of stats.BUCKET_EDGES
+    duration_histogram = models.JSONField(default=list)
+
+    solution_views_before_success = models.PositiveIntegerField(default=0)
+    solution_match_count = models.PositiveIntegerField(default=0)
+
+    # time successful users spent on the content's chapters, refreshed lazily
+    study_stats = models.JSONField(default=dict)
+    study_stats_at = models.DateTimeField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'things_content_stats'
+
+    def __str__(self):
+        return f"Stats for {self.content_id}"
+
+
+# =====================
+# CONTENT SIMILARITY
+# =====================
+
+class ContentSimilarity(models.Model):
+    """
+    Precomputed top-K taxonomy neighbours of a content item, per target type.
+    Built by apps.things.similarity (`python manage.py build_similarity_index`).
+    """
+    source = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='neighbors')
+    target = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='+')
+    target_type = models.CharField(max_length=10, choices=Content.TYPE_CHOICES)
+    score = models.FloatField()
+
+    class Meta:
+        db_table = 'things_content_similarity'
+        unique_together = ('source', 'target')
+        indexes = [
+            models.Index(fields=['source', 'target_type', 'score']),
+        ]
+
+    def __str__(self):
+        return f"{self.source_id} -> {self.target_id} ({self.score:.2f})"
+
+
+# =====================
+# SEARCH DOCUMENT
+# =====================
+
+class ContentSearchDocument(models.Model):
+    """
+    Text indexed for full-text search — see apps.things.search_index.
+    The tsvector column (Postgres) or FTS5 table (SQLite) is managed by
+    migration 0007 and not declared here.
+    """
+    content = models.OneToOneField(Content, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    title = models.CharField(max_length=200, blank=True, default='')
+    taxonomy = models.TextField(blank=True, default='')
+    body = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'things_content_search'
+
+    def __str__(self):
+        return f"Search document for {self.content_id}"
+
+
+# =====================
+# DISPLAY ID SEQUENCE
+# =====================
+
+class DisplayIdSequence(models.Model):
+    """Last allocated display_id per scope (e.g. 'content:exercise') — see apps.things.sequences."""
+    scope = models.CharField(max_length=50, unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'things_display_id_sequence'
+
+    def __str__(self):
+        return f"{self.scope} @ {self.last_value}"
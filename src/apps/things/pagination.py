@@ -0,0 +1,192 @@
+"""
+Keyset (cursor) pagination for feeds.
+
+OFFSET paging re-reads every skipped row, and PageNumberPagination also runs
+a COUNT(*) over the whole (often DISTINCT, M2M-joined) query on every page.
+KeysetPagination instead remembers the ordering values of the last row it
+returned and asks for the rows strictly after it:
+
+    ORDER BY created_at DESC, id DESC
+    WHERE created_at < :last_created OR (created_at = :last_created AND id < :last_id)
+
+so every page costs the same whatever its depth. The ordering is taken from
+the queryset itself (plain fields or annotations) and `id` is appended as a
+tie-breaker when missing; ordering values must not be NULL.
+
+The cursor is opaque (base64 JSON of the last row's values). Only forward
+paging is offered — this is meant for infinite scroll. The total is skipped
+unless asked for with `?with_count=1`, and then cached for COUNT_CACHE_SECONDS
+per query, so it is an estimate that may lag recent writes.
+"""
+
+import base64
+import hashlib
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+COUNT_CACHE_SECONDS = 300
+
+
+def _encode(values) -> str:
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (TypeError, ValueError):
+        raise NotFound('Invalid cursor')
+    if not isinstance(values, list):
+        raise NotFound('Invalid cursor')
+    return values
+
+
+def cached_count(queryset) -> int:
+    """COUNT(*) of `queryset`, cached per SQL statement for COUNT_CACHE_SECONDS."""
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.md5(f'{sql}|{params!r}'.encode()).hexdigest()
+    key = f'keyset_count:{digest}'
+    count = cache.get(key)
+    if count is None:
+        count = queryset.order_by().count()
+        cache.set(key, count, COUNT_CACHE_SECONDS)
+    return count
+
+
+class KeysetPagination(BasePagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(request.query_params[self.page_size_query_param],
+                                 strict=True, cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, queryset) -> list:
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering or [])
+        if not any(f.lstrip('-') in ('id', 'pk') for f in ordering):
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append('-id' if descending else 'id')
+        return ordering
+
+    def _to_python(self, queryset, name, value):
+        try:
+            return queryset.model._meta.get_field(name).to_python(value)
+        except FieldDoesNotExist:
+            return value
+
+    def _after(self, queryset, ordering, values):
+        """Rows strictly after `values` in `ordering`."""
+        clauses = []
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {
+                f.lstrip('-'): self._to_python(queryset, f.lstrip('-'), v)
+                for f, v in zip(ordering[:i], values[:i])
+            }
+            equal[f'{name}__{lookup}'] = self._to_python(queryset, name, values[i])
+            clauses.append(Q(**equal))
+        return queryset.filter(reduce(or_, clauses))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(queryset)
+        names = [f.lstrip('-') for f in ordering]
+        queryset = queryset.order_by(*ordering)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = cached_count(queryset)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            values = _decode(cursor)
+            if len(values) != len(ordering):
+                raise NotFound('Invalid cursor')
+            queryset = self._after(queryset, ordering, values)
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_values = [getattr(rows[-1], n) for n in names] if self.has_next else None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, _encode(self.next_values))
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link(), 'previous': None, 'results': data}
+        if self.count is not None:
+            payload['count'] = self.count
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+
+def wants_cursor(request) -> bool:
+    """Clients opt into keyset paging by sending `cursor` (empty for the first page)."""
+    return KeysetPagination.cursor_query_param in request.query_params
+
+
+class CursorOrPageNumberPagination(PageNumberPagination):
+    """
+    Page numbers by default (existing clients keep `count`/`page`), keyset
+    paging when the request carries a `cursor` parameter.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if wants_cursor(request):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+def paginate_by_cursor(queryset, request, serialize):
+    """
+    Keyset-paginated Response when the request asks for a cursor, else None so
+    the caller keeps its unpaginated response. `serialize(rows)` -> list.
+    """
+    if not wants_cursor(request):
+        return None
+    paginator = KeysetPagination()
+    rows = paginator.paginate_queryset(queryset, request)
+    return paginator.get_paginated_response(serialize(rows))
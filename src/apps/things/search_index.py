@@ -0,0 +1,173 @@
+"""
+Full-text search over content titles, taxonomy names and structure text.
+
+One ContentSearchDocument row per content item holds the text to index:
+
+    title     — Content.title
+    taxonomy  — subject, chapter, theorem, subfield and class level names
+    body      — Content.content plus the text of every `html` fragment in the
+                Mongo json_content (tags stripped), written at upsert time
+
+The database-specific index lives next to that table (migration 0007):
+
+    Postgres — a generated, weighted `search_vector` tsvector column with a
+               GIN index, plus a pg_trgm GIN index on title for fuzzy matches
+    SQLite   — an external-content FTS5 table kept in sync by triggers
+
+`search(queryset, q)` narrows a Content queryset with a single
+`id IN (...)` subquery on that index and annotates `search_rank`, so results
+are ranked without joining the M2M tables. Other backends (or SQLite builds
+without FTS5) return None and the caller keeps its icontains fallback.
+"""
+
+import logging
+import re
+
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import Content, ContentSearchDocument
+from .structure_utils import extract_text
+
+logger = logging.getLogger('django')
+
+SEARCH_TABLE = 'things_content_search'
+FTS_TABLE = 'things_content_search_fts'
+
+# Postgres text search configuration (must match search_vector in migration
+# 0007); 'simple' indexes every word as written (content mixes French, Arabic
+# and formulas, so no language stemming).
+TS_CONFIG = 'simple'
+
+_backend = None
+
+
+def backend():
+    """'postgresql', 'fts5' or None when no search index is available."""
+    global _backend
+    if _backend is None:
+        if connection.vendor == 'postgresql':
+            _backend = 'postgresql'
+        elif connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+            _backend = 'fts5'
+        else:
+            _backend = ''
+    return _backend or None
+
+
+def _tokens(q: str) -> list:
+    return re.findall(r'\w+', q.lower())[:10]
+
+
+def search(queryset, q: str):
+    """
+    Filter `queryset` to content matching `q`, annotated with `search_rank`
+    (higher is better). Returns None when no search index is available.
+    """
+    kind = backend()
+    if kind is None:
+        return None
+    tokens = _tokens(q)
+    if not tokens:
+        return queryset.none()
+
+    if kind == 'postgresql':
+        tsquery = ' & '.join(f'{t}:*' for t in tokens)
+        matches = RawSQL(
+            f"SELECT content_id FROM {SEARCH_TABLE} "
+            f"WHERE search_vector @@ to_tsquery('{TS_CONFIG}', %s) OR title %% %s",
+            (tsquery, q),
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank(s.search_vector, to_tsquery('{TS_CONFIG}', %s)) + similarity(s.title, %s) "
+            f"FROM {SEARCH_TABLE} s WHERE s.content_id = things_content.id",
+            (tsquery, q),
+            output_field=FloatField(),
+        )
+    else:
+        match = ' '.join(f'"{t}"*' for t in tokens)
+        matches = RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            (match,),
+        )
+        # bm25 is lower-is-better; weights favour title, then taxonomy, then body
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, 10.0, 4.0, 1.0) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = things_content.id",
+            (match,),
+            output_field=FloatField(),
+        )
+    return queryset.filter(id__in=matches).annotate(search_rank=rank)
+
+
+# ---------------------------------------------------------------------------
+# Indexing
+# ---------------------------------------------------------------------------
+
+def _taxonomy_text(item: Content) -> str:
+    names = [item.subject.name] if item.subject_id else []
+    for rel in ('chapters', 'theorems', 'subfields', 'class_levels'):
+        names.extend(obj.name for obj in getattr(item, rel).all())
+    return ' '.join(names)
+
+
+def _body_text(item: Content, json_content) -> str:
+    return ' '.join(filter(None, [item.content, extract_text(json_content)]))
+
+
+def index_metadata(content_ids, body=False) -> int:
+    """
+    (Re)index title and taxonomy names for `content_ids`. With body=True the
+    body is rewritten too (Content.content plus the Mongo structure text);
+    otherwise the stored body is kept.
+    """
+    from .content_store import get_structures_multi
+
+    ids = list(content_ids)
+    items = Content.objects.filter(pk__in=ids).select_related('subject').prefetch_related(
+        'chapters', 'theorems', 'subfields', 'class_levels'
+    ).only('id', 'type', 'display_id', 'title', 'content', 'subject__name')
+    structures = {}
+    if body:
+        try:
+            structures = get_structures_multi([(i.type, i.display_id) for i in items])
+        except Exception as e:
+            # keep the stored structure text rather than dropping it
+            logger.error(f"Search indexing: structures unavailable for {ids}: {e}")
+            body = False
+    docs = [
+        ContentSearchDocument(
+            content_id=item.id, title=item.title, taxonomy=_taxonomy_text(item),
+            body=_body_text(item, structures.get((item.type, item.display_id))) if body else item.content or '',
+        )
+        for item in items
+    ]
+    ContentSearchDocument.objects.bulk_create(
+        docs,
+        update_conflicts=True,
+        unique_fields=['content'],
+        update_fields=['title', 'taxonomy', 'updated_at'] + (['body'] if body else []),
+    )
+    return len(docs)
+
+
+def index_structure(content_type: str, display_id: int, json_content: dict) -> None:
+    """Store the structure text of (type, display_id); called from upsert_structure."""
+    item = Content.objects.filter(type=content_type, display_id=display_id).only('id', 'content').first()
+    if item is None:
+        return
+    body = _body_text(item, json_content)
+    updated = ContentSearchDocument.objects.filter(content_id=item.id).update(body=body)
+    if not updated:
+        index_metadata([item.id])
+        ContentSearchDocument.objects.filter(content_id=item.id).update(body=body)
+
+
+def rebuild_search_index(batch_size=500) -> int:
+    """Reindex every content item, reading structure text from Mongo in batches."""
+    ids = list(Content.objects.order_by('pk').values_list('pk', flat=True))
+    written = 0
+    for start in range(0, len(ids), batch_size):
+        written += index_metadata(ids[start:start + batch_size], body=True)
+    return written
@@ -1,12 +1,21 @@
-from rest_framework import serializers
+from collections import defaultdict
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, Prefetch, Q
 from .models import Solution, Comment, Content
 from apps.caracteristics.models import ClassLevel, Chapter, Subfield, Theorem, Subject
-from apps.users.serializers import UserSerializer
+from apps.users.serializers import AuthorSummarySerializer
 from apps.users.models import ViewHistory
 from apps.caracteristics.serializers import ChapterSerializer, ClassLevelSerializer, SubjectSerializer, SubfieldSerializer, TheoremSerializer
+from apps.uploads.models import FileAttachment
 from apps.uploads.serializers import FileAttachmentSerializer
-from .content_store import get_structure, upsert_structure, get_structures_batch
-from .structure_utils import get_total_points, get_item_count, get_section_count
+from apps.interactions.models import Vote
+from .content_store import (
+    PatchError, RevisionConflict, get_documents_multi, get_structure_and_metrics, metrics_of,
+    patch_blocks, upsert_structure,
+)
+from .structure_utils import compute_metrics
 import logging
 
 logger = logging.getLogger('django')
@@ -17,7 +26,7 @@ logger = logging.getLogger('django')
 # =====================
 
 class SolutionSerializer(serializers.ModelSerializer):
-    author = UserSerializer(read_only=True)
+    author = AuthorSummarySerializer(read_only=True)
     vote_count = serializers.IntegerField(read_only=True)
     user_vote = serializers.SerializerMethodField()
     content = serializers.CharField(source='solution_text', required=True, allow_blank=False)
@@ -38,10 +47,50 @@ class SolutionSerializer(serializers.ModelSerializer):
 # COMMENT
 # =====================
 
+def load_comment_tree(content_item, request=None):
+    """
+    Load every comment of `content_item` in one query (authors, attachments and
+    vote totals included), thread them in memory and fetch the current user's
+    votes in one batch.
+
+    Returns (top_level_comments, context) — pass the context to
+    CommentSerializer so replies and user votes are read from memory.
+    """
+    comments = list(
+        Comment.objects.filter(content_item=content_item)
+        .select_related('author__profile')
+        .prefetch_related(Prefetch(
+            'attachments', queryset=FileAttachment.objects.select_related('uploaded_by')
+        ))
+        .annotate(
+            vote_count_annotation=Count('votes', filter=Q(votes__value=Vote.UP)) -
+                                  Count('votes', filter=Q(votes__value=Vote.DOWN))
+        )
+        .order_by('id')
+    )
+    children = defaultdict(list)
+    roots = []
+    for c in comments:
+        if c.parent_id:
+            children[c.parent_id].append(c)
+        else:
+            roots.append(c)
+
+    ctx = {'comment_children': children}
+    user = request.user if request else None
+    if user and user.is_authenticated and comments:
+        ctx['comment_user_votes'] = dict(Vote.objects.filter(
+            user=user,
+            content_type=ContentType.objects.get_for_model(Comment),
+            object_id__in=[c.id for c in comments],
+        ).values_list('object_id', 'value'))
+    return roots, ctx
+
+
 class CommentSerializer(serializers.ModelSerializer):
-    author = UserSerializer(read_only=True)
+    author = AuthorSummarySerializer(read_only=True)
     replies = serializers.SerializerMethodField()
-    vote_count = serializers.IntegerField(read_only=True)
+    vote_count = serializers.SerializerMethodField()
     user_vote = serializers.SerializerMethodField()
     attachments = FileAttachmentSerializer(many=True, read_only=True)
     parent_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
@@ -51,14 +100,29 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = ['id', 'author', 'content', 'created_at', 'replies',
                   'vote_count', 'user_vote', 'parent_id', 'attachments']
 
+    # When built from load_comment_tree, replies and user votes come from
+    # context maps; otherwise fall back to per-node queries.
+
     def get_replies(self, obj):
-        if obj.replies.exists():
-            return CommentSerializer(obj.replies.all(), many=True, context=self.context).data
-        return []
+        children = self.context.get('comment_children')
+        if children is not None:
+            replies = children.get(obj.id, [])
+        elif obj.replies.exists():
+            replies = obj.replies.select_related('author__profile')
+        else:
+            return []
+        return CommentSerializer(replies, many=True, context=self.context).data
+
+    def get_vote_count(self, obj):
+        annotated = getattr(obj, 'vote_count_annotation', None)
+        return annotated if annotated is not None else obj.vote_count
 
     def get_user_vote(self, obj):
         user = self.context.get('request').user if self.context.get('request') else None
         if user and user.is_authenticated:
+            votes = self.context.get('comment_user_votes')
+            if votes is not None:
+                return votes.get(obj.id)
             vote = obj.votes.filter(user=user).first()
             return vote.value if vote else None
         return None
@@ -69,11 +133,11 @@ class CommentSerializer(serializers.ModelSerializer):
 # =====================
 
 class ContentSerializer(serializers.ModelSerializer):
-    author = UserSerializer(read_only=True)
+    author = AuthorSummarySerializer(read_only=True)
     chapters = ChapterSerializer(many=True, read_only=True)
     comments = serializers.SerializerMethodField()
     solution = SolutionSerializer(read_only=True)
-    vote_count = serializers.IntegerField(read_only=True)
+    vote_count = serializers.IntegerField(source='vote_score', read_only=True)
     user_vote = serializers.SerializerMethodField()
     view_count = serializers.IntegerField(read_only=True)
     class_levels = ClassLevelSerializer(many=True, read_only=True)
@@ -102,22 +166,29 @@ class ContentSerializer(serializers.ModelSerializer):
         ]
 
     def to_representation(self, instance):
+        key = (instance.type, instance.display_id)
+        doc = get_documents_multi([key], fields=('json_content', 'metrics', 'revision')).get(key, {})
+        # prime Content.metrics so total_points / item_count / section_count don't re-query
+        instance.__dict__['metrics'] = metrics_of(doc)
         data = super().to_representation(instance)
-        json_content = get_structure(instance.type, instance.display_id)
-        data['json_content'] = json_content
-        data['total_points'] = get_total_points(json_content)
-        data['item_count'] = get_item_count(json_content)
-        data['section_count'] = get_section_count(json_content)
+        data['json_content'] = doc.get('json_content') or {}
+        # editors send it back with json_patch (see ContentCreateSerializer)
+        data['structure_revision'] = doc.get('revision', 0)
         return data
 
     def get_comments(self, obj):
-        return CommentSerializer(
-            obj.comments.filter(parent=None), many=True, context=self.context
-        ).data
+        roots, ctx = load_comment_tree(obj, self.context.get('request'))
+        return CommentSerializer(roots, many=True, context={**self.context, **ctx}).data
+
+    # user_votes / user_saves / user_completes maps are used when the caller
+    # already loaded them (see ContentViewSet.bundle).
 
     def get_user_vote(self, obj):
         user = self.context.get('request').user if self.context.get('request') else None
         if user and user.is_authenticated:
+            votes = self.context.get('user_votes')
+            if votes is not None:
+                return votes.get(obj.id)
             vote = obj.votes.filter(user=user).first()
             return vote.value if vote else None
         return None
@@ -125,12 +196,18 @@ class ContentSerializer(serializers.ModelSerializer):
     def get_user_save(self, obj):
         user = self.context.get('request').user if self.context.get('request') else None
         if user and user.is_authenticated:
+            saves = self.context.get('user_saves')
+            if saves is not None:
+                return obj.id in saves
             return obj.saved.filter(user=user).exists()
         return False
 
     def get_user_complete(self, obj):
         user = self.context.get('request').user if self.context.get('request') else None
         if user and user.is_authenticated:
+            completes = self.context.get('user_completes')
+            if completes is not None:
+                return completes.get(obj.id)
             c = obj.completed.filter(user=user).first()
             return c.status if c else None
         return None
@@ -153,20 +230,36 @@ class ContentSerializer(serializers.ModelSerializer):
 # =====================
 
 class ContentListSerializer(serializers.ModelSerializer):
-    author = UserSerializer(read_only=True)
+    author = AuthorSummarySerializer(read_only=True)
     subject = SubjectSerializer(read_only=True)
     class_levels = ClassLevelSerializer(many=True, read_only=True)
     chapters = serializers.SerializerMethodField()
     theorems = serializers.SerializerMethodField()
-    comment_count = serializers.SerializerMethodField()
-    vote_count = serializers.IntegerField(read_only=True)
+    comment_count = serializers.IntegerField(read_only=True)
+    vote_count = serializers.IntegerField(source='vote_score', read_only=True)
     user_vote = serializers.SerializerMethodField()
     user_save = serializers.SerializerMethodField()
     user_complete = serializers.SerializerMethodField()
     total_points = serializers.IntegerField(read_only=True)
     item_count = serializers.IntegerField(read_only=True)
+    section_count = serializers.IntegerField(read_only=True)
+    preview = serializers.CharField(read_only=True)
     json_content = serializers.JSONField(required=False)
 
+    # Only sent when explicitly requested through context['fields'].
+    OPTIONAL_FIELDS = ('section_count', 'preview')
+    # ?view=card — everything a card grid renders, without the block tree.
+    CARD_FIELDS = (
+        'id', 'display_id', 'type', 'title', 'difficulty',
+        'author', 'subject', 'class_levels', 'chapters', 'theorems',
+        'comment_count', 'created_at', 'view_count', 'vote_count',
+        'user_vote', 'user_save', 'user_complete',
+        'total_points', 'item_count', 'section_count', 'preview',
+        'is_national_exam', 'national_year', 'duration_minutes',
+    )
+    # Fields that need the Mongo document (json_content and/or metrics).
+    STRUCTURE_FIELDS = ('json_content', 'total_points', 'item_count', 'section_count', 'preview')
+
     class Meta:
         model = Content
         fields = [
@@ -174,20 +267,33 @@ class ContentListSerializer(serializers.ModelSerializer):
             'author', 'subject', 'class_levels', 'chapters', 'theorems',
             'comment_count', 'created_at', 'view_count', 'vote_count',
             'user_vote', 'user_save', 'user_complete',
-            'total_points', 'item_count',
+            'total_points', 'item_count', 'section_count', 'preview',
             'is_national_exam', 'national_year', 'duration_minutes',
         ]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        keep = set(requested) if requested else set(self.fields) - set(self.OPTIONAL_FIELDS)
+        for name in set(self.fields) - keep:
+            self.fields.pop(name)
+
     def to_representation(self, instance):
-        data = super().to_representation(instance)
+        key = (instance.type, instance.display_id)
         mongo_structures = self.context.get('mongo_structures')
-        if mongo_structures is not None:
-            json_content = mongo_structures.get(instance.display_id, {})
-        else:
-            json_content = get_structure(instance.type, instance.display_id)
-        data['json_content'] = json_content
-        data['total_points'] = get_total_points(json_content)
-        data['item_count'] = get_item_count(json_content)
+        mongo_metrics = self.context.get('mongo_metrics')
+        json_content = None
+        if 'json_content' in self.fields:
+            if mongo_structures is not None:
+                json_content = mongo_structures.get(key, {})
+            else:
+                json_content, instance.__dict__['metrics'] = get_structure_and_metrics(*key)
+        if 'metrics' not in instance.__dict__ and mongo_metrics is not None:
+            # prime Content.metrics so the metric properties don't re-query
+            instance.__dict__['metrics'] = mongo_metrics.get(key) or compute_metrics(json_content or {})
+        data = super().to_representation(instance)
+        if json_content is not None:
+            data['json_content'] = json_content
         return data
 
     def get_chapters(self, obj):
@@ -196,12 +302,15 @@ class ContentListSerializer(serializers.ModelSerializer):
     def get_theorems(self, obj):
         return [{'id': t.id, 'name': t.name} for t in obj.theorems.all()]
 
-    def get_comment_count(self, obj):
-        return obj.comments.count()
+    # Per-page maps built by the viewset (see things.views._user_state_context).
+    # Each getter falls back to a per-row query when the map isn't provided.
 
     def get_user_vote(self, obj):
         user = self.context.get('request').user if self.context.get('request') else None
         if user and user.is_authenticated:
+            votes = self.context.get('user_votes')
+            if votes is not None:
+                return votes.get(obj.id)
             vote = obj.votes.filter(user=user).first()
             return vote.value if vote else None
         return None
@@ -209,12 +318,18 @@ class ContentListSerializer(serializers.ModelSerializer):
     def get_user_save(self, obj):
         user = self.context.get('request').user if self.context.get('request') else None
         if user and user.is_authenticated:
+            saves = self.context.get('user_saves')
+            if saves is not None:
+                return obj.id in saves
             return obj.saved.filter(user=user).exists()
         return False
 
     def get_user_complete(self, obj):
         user = self.context.get('request').user if self.context.get('request') else None
         if user and user.is_authenticated:
+            completes = self.context.get('user_completes')
+            if completes is not None:
+                return completes.get(obj.id)
             c = obj.completed.filter(user=user).first()
             return c.status if c else None
         return None
@@ -224,6 +339,17 @@ class ContentListSerializer(serializers.ModelSerializer):
 # CONTENT — create/update serializer
 # =====================
 
+class StructureConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The content structure was modified by someone else.'
+    default_code = 'structure_conflict'
+
+    def __init__(self, current_revision):
+        super().__init__()
+        # kept as a number so the editor can reload and rebase on it
+        self.detail = {'detail': self.default_detail, 'structure_revision': current_revision}
+
+
 class ContentCreateSerializer(serializers.ModelSerializer):
     solution_content = serializers.CharField(
         write_only=True, required=False, allow_blank=True
@@ -244,16 +370,28 @@ class ContentCreateSerializer(serializers.ModelSerializer):
         write_only=True, required=False, allow_null=True
     )
     json_content = serializers.JSONField(required=False)
+    # Block-level edit instead of a full json_content:
+    # {"revision": <structure_revision the editor loaded>, "ops": [...]}, see content_store.patch_blocks
+    json_patch = serializers.JSONField(write_only=True, required=False)
+    structure_revision = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Content
         fields = [
-            'id', 'type', 'title', 'content', 'json_content', 'difficulty',
-            'chapters', 'class_levels', 'subject', 'subfields', 'theorems',
+            'id', 'type', 'title', 'content', 'json_content', 'json_patch', 'structure_revision',
+            'difficulty', 'chapters', 'class_levels', 'subject', 'subfields', 'theorems',
             'solution_content', 'national_date',
             'is_national_exam', 'national_year', 'duration_minutes',
         ]
 
+    def validate_json_patch(self, value):
+        if not isinstance(value, dict) or not isinstance(value.get('ops'), list) or not value['ops']:
+            raise serializers.ValidationError('Expected {"revision": <int>, "ops": [...]}.')
+        revision = value.get('revision')
+        if revision is not None and (not isinstance(revision, int) or isinstance(revision, bool)):
+            raise serializers.ValidationError('revision must be an integer.')
+        return value
+
     def validate(self, data):
         national_date = data.pop('national_date', None)
         if national_date:
@@ -271,6 +409,10 @@ class ContentCreateSerializer(serializers.ModelSerializer):
                         data['national_year'] = int(year_str)
                 except Exception:
                     pass
+        if 'json_patch' in data and ('json_content' in data or self.instance is None):
+            raise serializers.ValidationError(
+                {'json_patch': 'Only for updates, and not together with json_content.'}
+            )
         return data
 
     def create(self, validated_data):
@@ -296,7 +438,7 @@ class ContentCreateSerializer(serializers.ModelSerializer):
             item.theorems.set(theorems)
 
         if json_content is not None:
-            upsert_structure(item.type, item.display_id, json_content)
+            item.structure_revision = upsert_structure(item.type, item.display_id, json_content)
 
         if solution_content:
             Solution.objects.create(
@@ -309,6 +451,17 @@ class ContentCreateSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         json_content = validated_data.pop('json_content', None)
+        json_patch = validated_data.pop('json_patch', None)
+        if json_patch is not None:
+            # before any other write, so a rejected patch leaves the item untouched
+            try:
+                instance.structure_revision = patch_blocks(
+                    instance.type, instance.display_id, json_patch['ops'], json_patch.get('revision')
+                )
+            except PatchError as e:
+                raise serializers.ValidationError({'json_patch': str(e)})
+            except RevisionConflict as e:
+                raise StructureConflict(e.current)
         solution_content = validated_data.pop('solution_content', None)
         chapters = validated_data.pop('chapters', None)
         class_levels = validated_data.pop('class_levels', None)
@@ -330,7 +483,7 @@ class ContentCreateSerializer(serializers.ModelSerializer):
         instance.save()
 
         if json_content is not None:
-            upsert_structure(instance.type, instance.display_id, json_content)
+            instance.structure_revision = upsert_structure(instance.type, instance.display_id, json_content)
 
         if solution_content is not None:
             sol, _ = Solution.objects.get_or_create(
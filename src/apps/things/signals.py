@@ -1,9 +1,15 @@
 import logging
-from django.db.models.signals import post_delete
-from django.dispatch import receiver
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
 
-from .models import Content
+from apps.caracteristics.models import Chapter, ClassLevel, Subfield, Subject, Theorem
+from .models import Content, Comment
 from .content_store import delete_structure, model_type, display_id_for
+from .counters import bump
+from .search_index import index_metadata
+from .similarity import refresh_items
+from .suggest import invalidate as invalidate_suggestions
+from .taxonomy_map import invalidate as invalidate_taxonomy_map
 
 logger = logging.getLogger('django')
 
@@ -19,3 +25,203 @@ def _delete(sender, instance, **kwargs):
 
 
 post_delete.connect(_delete, sender=Content)
+
+
+def _comment_deleted(sender, instance, **kwargs):
+    bump(instance.content_item_id, comment_count=-1)
+
+
+post_delete.connect(_comment_deleted, sender=Comment)
+
+
+# Derived data (similarity, search documents, the taxonomy map and the suggest
+# index) is refreshed once per transaction: handlers add content ids to the
+# pending batch of the current transaction and a single on_commit callback
+# drains it.
+
+class _Batch:
+    def __init__(self):
+        self.similarity = set()
+        self.search = set()
+        self.search_body = set()
+        self.taxonomy_map = set()
+        self.suggest = False
+
+    def run(self):
+        connection = transaction.get_connection()
+        if getattr(connection, '_things_batch', None) is self:
+            connection._things_batch = None
+        steps = (
+            ('similarity', self.similarity, refresh_items),
+            ('search', self.search - self.search_body, lambda ids: index_metadata(ids, body=False)),
+            ('search', self.search_body, lambda ids: index_metadata(ids, body=True)),
+            ('taxonomy map', self.taxonomy_map, invalidate_taxonomy_map),
+        )
+        for name, ids, step in steps:
+            if not ids:
+                continue
+            try:
+                step(sorted(ids))
+            except Exception as e:
+                logger.error(f"Refreshing {name} failed for content {sorted(ids)}: {e}")
+        if self.suggest:
+            invalidate_suggestions()
+
+
+def _pending():
+    """The batch of the current transaction, registering its on_commit on first use."""
+    connection = transaction.get_connection()
+    batch = getattr(connection, '_things_batch', None)
+    # a rolled back transaction drops its callback along with the batch
+    if batch is not None and connection.in_atomic_block and any(
+        func == batch.run for _, func, _ in connection.run_on_commit
+    ):
+        return batch, False
+    batch = _Batch()
+    connection._things_batch = batch
+    return batch, True
+
+
+def _schedule(similarity=(), search=(), search_body=(), taxonomy_map=(), suggest=False):
+    batch, new = _pending()
+    batch.similarity.update(similarity)
+    batch.search.update(search)
+    batch.search.update(search_body)
+    batch.search_body.update(search_body)
+    batch.taxonomy_map.update(taxonomy_map)
+    batch.suggest = batch.suggest or suggest
+    if new:
+        # outside a transaction this runs right away
+        transaction.on_commit(batch.run)
+
+
+# Field values as loaded, so saves only refresh what actually changed. Deferred
+# fields are missing from __dict__ and count as changed.
+
+_UNKNOWN = object()
+CONTENT_TRACKED = ('subject_id', 'type', 'title', 'content')
+TAXONOMY_TRACKED = ('name',)
+
+
+def _snapshot(instance, fields):
+    instance._tracked = {f: instance.__dict__.get(f, _UNKNOWN) for f in fields}
+
+
+def _changed(instance, fields, created, update_fields):
+    before = getattr(instance, '_tracked', {})
+    _snapshot(instance, fields)
+    if created:
+        return set(fields)
+    if update_fields is not None:
+        fields = [f for f in fields if f in update_fields or f.removesuffix('_id') in update_fields]
+    return {f for f in fields if before.get(f, _UNKNOWN) is _UNKNOWN or before[f] != instance._tracked[f]}
+
+
+def _content_loaded(sender, instance, **kwargs):
+    _snapshot(instance, CONTENT_TRACKED)
+
+
+post_init.connect(_content_loaded, sender=Content)
+
+
+def _content_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    changed = _changed(instance, CONTENT_TRACKED, created, update_fields)
+    if not changed:
+        return
+    ids = [instance.pk]
+    _schedule(
+        # subject is the only taxonomy held on the row itself
+        similarity=ids if 'subject_id' in changed else (),
+        taxonomy_map=ids if not created and {'subject_id', 'type'} & changed else (),
+        # the indexed body starts with Content.content
+        search=ids if {'subject_id', 'title'} & changed else (),
+        search_body=ids if 'content' in changed else (),
+        suggest=bool({'title', 'type'} & changed),
+    )
+
+
+post_save.connect(_content_saved, sender=Content)
+
+
+def _content_deleted(sender, instance, **kwargs):
+    _schedule(taxonomy_map=[instance.pk], suggest=True)
+
+
+post_delete.connect(_content_deleted, sender=Content)
+
+
+def _changed_ids(sender, instance, action, reverse, pk_set):
+    if action in ('post_add', 'post_remove'):
+        return list(pk_set or []) if reverse else [instance.pk]
+    if action == 'post_clear' and not reverse:
+        return [instance.pk]
+    if action == 'pre_clear' and reverse:
+        # post_clear has no pk_set; read the rows before they go
+        return list(Content.objects.filter(**{_THROUGH_FIELDS[sender]: instance.pk}).values_list('pk', flat=True))
+    return []
+
+
+def _taxonomy_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    ids = _changed_ids(sender, instance, action, reverse, pk_set)
+    if ids:
+        _schedule(similarity=ids, search=ids, taxonomy_map=ids)
+
+
+def _class_levels_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    ids = _changed_ids(sender, instance, action, reverse, pk_set)
+    if ids:
+        _schedule(search=ids)
+
+
+# Content field holding each taxonomy model, and whether the suggest index
+# lists its names.
+TAXONOMY_FIELDS = {
+    Subject: ('subject', True),
+    Subfield: ('subfields', True),
+    Chapter: ('chapters', True),
+    Theorem: ('theorems', True),
+    ClassLevel: ('class_levels', False),
+}
+
+_THROUGH_FIELDS = {}
+for _model, (_field, _) in TAXONOMY_FIELDS.items():
+    if _field == 'subject':
+        continue
+    _through = Content._meta.get_field(_field).remote_field.through
+    _THROUGH_FIELDS[_through] = _field
+    m2m_changed.connect(
+        _class_levels_changed if _model is ClassLevel else _taxonomy_changed, sender=_through
+    )
+
+
+def _content_ids_for(instance):
+    field, _ = TAXONOMY_FIELDS[type(instance)]
+    return list(Content.objects.filter(**{field: instance.pk}).values_list('pk', flat=True))
+
+
+def _taxonomy_loaded(sender, instance, **kwargs):
+    _snapshot(instance, TAXONOMY_TRACKED)
+
+
+def _taxonomy_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    if not _changed(instance, TAXONOMY_TRACKED, created, update_fields):
+        return
+    _, suggested = TAXONOMY_FIELDS[sender]
+    # search documents embed the names; a new row has no content yet
+    _schedule(search=() if created else _content_ids_for(instance), suggest=suggested)
+
+
+def _taxonomy_deleting(sender, instance, **kwargs):
+    # the through rows go with the cascade, without m2m_changed
+    ids = _content_ids_for(instance)
+    _, suggested = TAXONOMY_FIELDS[sender]
+    if sender is ClassLevel:
+        _schedule(search=ids)
+    else:
+        _schedule(similarity=ids, search=ids, taxonomy_map=ids, suggest=suggested)
+
+
+for _model in TAXONOMY_FIELDS:
+    post_init.connect(_taxonomy_loaded, sender=_model)
+    post_save.connect(_taxonomy_saved, sender=_model)
+    pre_delete.connect(_taxonomy_deleting, sender=_model)
@@ -0,0 +1,310 @@
+"""
+Precomputed taxonomy similarity index (ContentSimilarity).
+
+Recommendations used to OR-join chapters, theorems, subfields and subject and
+annotate DISTINCT counts on every request. Instead, each content item is
+reduced to a sparse set of taxonomy features
+
+    {('chapter', 12), ('theorem', 4), ('subfield', 3), ('subject', 1), ...}
+
+and scored against candidates sharing a feature with weighted Jaccard
+(shared weight / union weight, see WEIGHTS). The best TOP_K neighbours of each
+target type are stored per source, so `similar` and
+`get_content_recommendations` become a lookup on (source, target_type).
+
+Candidates come from an inverted index over chapter/theorem/subfield
+features; subject alone is too broad to scan, so lists that are still short
+are topped up with the most viewed items of the same subject.
+
+build_index()      — full offline rebuild (build_similarity_index command)
+refresh_items(ids) — incremental refresh after an item's taxonomy changed;
+                     rewrites its own lists and patches the lists pointing
+                     at it. Subject-only top-ups on other items are left to
+                     the next full rebuild.
+"""
+
+import heapq
+import logging
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from .models import Content, ContentSimilarity
+
+logger = logging.getLogger('django')
+
+TOP_K = 10
+
+WEIGHTS = {
+    'chapter': 3.0,
+    'theorem': 2.0,
+    'subfield': 2.0,
+    'subject': 1.0,
+}
+
+_M2M = {
+    'chapter': (Content.chapters.through, 'chapter_id'),
+    'theorem': (Content.theorems.through, 'theorem_id'),
+    'subfield': (Content.subfields.through, 'subfield_id'),
+}
+
+TYPES = [t for t, _ in Content.TYPE_CHOICES]
+
+
+class _Item:
+    __slots__ = ('id', 'type', 'subject_id', 'view_count', 'features', 'weight')
+
+    def __init__(self, id, type, subject_id, view_count):
+        self.id = id
+        self.type = type
+        self.subject_id = subject_id
+        self.view_count = view_count
+        self.features = set()
+        if subject_id is not None:
+            self.features.add(('subject', subject_id))
+        self.weight = 0.0
+
+
+def _load_items(ids=None) -> dict:
+    """Taxonomy feature sets for `ids` (all content when None), in 4 queries."""
+    qs = Content.objects.all()
+    if ids is not None:
+        qs = qs.filter(pk__in=ids)
+    items = {
+        pk: _Item(pk, type_, subject_id, view_count)
+        for pk, type_, subject_id, view_count in qs.values_list('pk', 'type', 'subject_id', 'view_count')
+    }
+    for kind, (through, column) in _M2M.items():
+        rows = through.objects.all()
+        if ids is not None:
+            rows = rows.filter(content_id__in=ids)
+        for content_id, tax_id in rows.values_list('content_id', column).iterator():
+            item = items.get(content_id)
+            if item is not None:
+                item.features.add((kind, tax_id))
+    for item in items.values():
+        item.weight = _weight(item.features)
+    return items
+
+
+def _weight(features) -> float:
+    return sum(WEIGHTS[kind] for kind, _ in features)
+
+
+def score(a: _Item, b: _Item) -> float:
+    """Weighted Jaccard similarity of two items' taxonomy features."""
+    shared = a.features & b.features
+    if not shared:
+        return 0.0
+    shared_w = _weight(shared)
+    return shared_w / (a.weight + b.weight - shared_w)
+
+
+def _specific(features):
+    return [f for f in features if f[0] != 'subject']
+
+
+def _top_neighbors(src: _Item, scored, subject_fill) -> list:
+    """
+    Best TOP_K (type, score, id) per target type for `src`, from `scored`
+    (candidate, score) pairs. `subject_fill(subject_id, type)` yields items
+    to top up short lists with.
+    """
+    by_type = defaultdict(list)
+    for cand, s in scored:
+        if s > 0 and cand.id != src.id:
+            by_type[cand.type].append((s, cand.view_count, cand.id))
+
+    result = []
+    for type_ in TYPES:
+        top = heapq.nlargest(TOP_K, by_type[type_])
+        if len(top) < TOP_K and src.subject_id is not None:
+            chosen = {t[2] for t in top}
+            for cand in subject_fill(src.subject_id, type_):
+                if len(top) >= TOP_K:
+                    break
+                if cand.id != src.id and cand.id not in chosen:
+                    top.append((score(src, cand), cand.view_count, cand.id))
+                    chosen.add(cand.id)
+            top.sort(reverse=True)
+        result.extend((type_, s, target_id) for s, _, target_id in top)
+    return result
+
+
+def _rows(src_id, neighbors):
+    return [
+        ContentSimilarity(source_id=src_id, target_id=target_id, target_type=type_, score=s)
+        for type_, s, target_id in neighbors
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Full rebuild
+# ---------------------------------------------------------------------------
+
+def build_index(batch_size=1000) -> int:
+    """Recompute every neighbour list. Returns the number of rows written."""
+    items = _load_items()
+
+    postings = defaultdict(list)
+    by_subject_type = defaultdict(list)
+    for item in items.values():
+        for f in _specific(item.features):
+            postings[f].append(item)
+        if item.subject_id is not None:
+            by_subject_type[(item.subject_id, item.type)].append(item)
+    for bucket in by_subject_type.values():
+        bucket.sort(key=lambda i: (-i.view_count, -i.id))
+
+    def subject_fill(subject_id, type_):
+        return by_subject_type.get((subject_id, type_), [])
+
+    table = ContentSimilarity._meta.db_table
+    insert_sql = f'INSERT INTO {table} (source_id, target_id, target_type, score) VALUES (%s, %s, %s, %s)'
+    written = 0
+    batch_ids, batch_rows = [], []
+
+    def flush():
+        # plain executemany: model instances cost more than the scoring itself
+        with transaction.atomic(), connection.cursor() as cursor:
+            ContentSimilarity.objects.filter(source_id__in=batch_ids).delete()
+            cursor.executemany(insert_sql, batch_rows)
+        return len(batch_rows)
+
+    subject_w = WEIGHTS['subject']
+    for src in items.values():
+        # shared weight per candidate, accumulated over the inverted index
+        shared = defaultdict(float)
+        for f in _specific(src.features):
+            w = WEIGHTS[f[0]]
+            for cand in postings[f]:
+                shared[cand] += w
+        scored = []
+        for cand, w in shared.items():
+            if src.subject_id is not None and cand.subject_id == src.subject_id:
+                w += subject_w
+            scored.append((cand, w / (src.weight + cand.weight - w)))
+        batch_ids.append(src.id)
+        batch_rows.extend(
+            (src.id, target_id, type_, s)
+            for type_, s, target_id in _top_neighbors(src, scored, subject_fill)
+        )
+        if len(batch_ids) >= batch_size:
+            written += flush()
+            batch_ids, batch_rows = [], []
+    if batch_ids:
+        written += flush()
+    # sources that no longer exist are removed by the FK cascade
+    return written
+
+
+# ---------------------------------------------------------------------------
+# Incremental refresh
+# ---------------------------------------------------------------------------
+
+def refresh_items(content_ids) -> None:
+    """Rebuild the neighbour lists of `content_ids` and patch lists that point at them."""
+    for content_id in set(content_ids):
+        try:
+            _refresh_one(content_id)
+        except Exception as e:
+            logger.error(f"Similarity refresh failed for content {content_id}: {e}")
+
+
+def _refresh_one(content_id):
+    src = _load_items([content_id]).get(content_id)
+    if src is None:
+        return
+
+    # candidates share a chapter/theorem/subfield, as in build_index()
+    sharing = set()
+    for kind, (through, column) in _M2M.items():
+        tax_ids = [tax_id for k, tax_id in src.features if k == kind]
+        if tax_ids:
+            sharing.update(through.objects.filter(**{f'{column}__in': tax_ids}).values_list('content_id', flat=True))
+    sharing.discard(content_id)
+    fill_ids = {}
+    if src.subject_id is not None:
+        for type_ in TYPES:
+            fill_ids[type_] = list(
+                Content.objects.filter(subject_id=src.subject_id, type=type_)
+                .exclude(pk=content_id).order_by('-view_count', '-pk')
+                .values_list('pk', flat=True)[:2 * TOP_K]
+            )
+    # lists that currently point at src must be re-scored too
+    related = sharing | set(
+        ContentSimilarity.objects.filter(target_id=content_id).values_list('source_id', flat=True)
+    )
+    items = _load_items(related | {i for ids in fill_ids.values() for i in ids})
+
+    def subject_fill(subject_id, type_):
+        return [items[i] for i in fill_ids.get(type_, []) if i in items]
+
+    candidates = [items[i] for i in sharing if i in items]
+    neighbors = _top_neighbors(src, [(c, score(src, c)) for c in candidates], subject_fill)
+
+    with transaction.atomic():
+        ContentSimilarity.objects.filter(source_id=content_id).delete()
+        ContentSimilarity.objects.bulk_create(_rows(content_id, neighbors))
+
+        # reverse direction: re-score src in the lists of related items
+        reverse = [(items[i], score(items[i], src)) for i in related if i in items]
+        ContentSimilarity.objects.filter(
+            target_id=content_id, source_id__in=[i.id for i, s in reverse if s <= 0]
+        ).delete()
+        ContentSimilarity.objects.bulk_create(
+            [ContentSimilarity(source_id=i.id, target_id=content_id, target_type=src.type, score=s)
+             for i, s in reverse if s > 0],
+            update_conflicts=True,
+            unique_fields=['source', 'target'],
+            update_fields=['score', 'target_type'],
+        )
+        _trim([i.id for i, s in reverse if s > 0], src.type)
+
+
+def _trim(source_ids, target_type):
+    """Drop rows ranked below TOP_K in the (source, target_type) lists of `source_ids`."""
+    if not source_ids:
+        return
+    rows = ContentSimilarity.objects.filter(
+        source_id__in=source_ids, target_type=target_type
+    ).order_by('source_id', '-score', '-target__view_count').values_list('id', 'source_id')
+    seen = defaultdict(int)
+    extra = []
+    for row_id, source_id in rows:
+        seen[source_id] += 1
+        if seen[source_id] > TOP_K:
+            extra.append(row_id)
+    if extra:
+        ContentSimilarity.objects.filter(id__in=extra).delete()
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+def live_neighbors_qs(source, exclude_id=None):
+    """The on-the-fly taxonomy overlap query the index replaces (fallback / benchmarks)."""
+    qs = Content.objects.filter(
+        Q(chapters__in=source.chapters.all()) |
+        Q(theorems__in=source.theorems.all()) |
+        Q(subfields__in=source.subfields.all()) |
+        Q(subject=source.subject)
+    )
+    if exclude_id:
+        qs = qs.exclude(id=exclude_id)
+    return qs.distinct().select_related('author__profile', 'subject').annotate(
+        relevance=Count('chapters') + Count('theorems') + Count('subfields')
+    ).order_by('-relevance', '-view_count')
+
+
+def neighbor_ids(content_id) -> dict:
+    """{target_type: [content ids, best first]} for `content_id`, in one query."""
+    rows = ContentSimilarity.objects.filter(source_id=content_id).order_by(
+        '-score', '-target__view_count'
+    ).values_list('target_type', 'target_id')
+    result = defaultdict(list)
+    for target_type, target_id in rows:
+        result[target_type].append(target_id)
+    return result
@@ -0,0 +1,335 @@
+"""
+Per-content statistics snapshot (ContentStats).
+
+ContentViewSet.statistics used to load every TimeSession into Python, run two
+queries per solution viewer and one per successful-user × chapter pair. The
+figures now live in one ContentStats row per content item:
+
+    * session_count / total_session_seconds / best_session_seconds and a
+      duration histogram over fixed log-spaced buckets — updated when a
+      session is saved or deleted;
+    * solution_views_before_success — updated when a completion moves in or
+      out of 'success' and when a solution view is removed;
+    * solution_match_count — updated on SolutionMatch create/delete;
+    * study_stats — time successful users spent on the content's chapters,
+      recomputed with one aggregate when older than STUDY_STATS_TTL.
+
+Success/review counts are the denormalized counters on Content itself
+(see counters.py); every completion is one user, so participants is their sum.
+
+The user's time percentile and the `?distribution=1` payload are read from
+the histogram in O(buckets); with ~25 buckets plain Python is enough.
+
+A missing row is built from scratch on first use, and
+`python manage.py rebuild_content_stats` recomputes everything.
+"""
+
+import logging
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, Exists, Min, OuterRef, Sum
+from django.utils import timezone
+
+from .models import Content, ContentStats
+from .taxonomy_map import get as get_taxonomy
+
+logger = logging.getLogger('django')
+
+# Lower edge (seconds) of each histogram bucket: 0, 10, 14, 20, 28, 40 ... ~8h.
+# The last bucket is open-ended.
+BUCKET_EDGES = [0] + [int(10 * 2 ** (k / 2)) for k in range(24)]
+
+STUDY_STATS_TTL = timedelta(hours=1)
+
+EMPTY_STUDY_STATS = {'exercises_avg_seconds': 0, 'lessons_avg_seconds': 0,
+                     'exams_avg_seconds': 0, 'chapters': []}
+
+
+def _content_ct():
+    return ContentType.objects.get_for_model(Content)
+
+
+# ---------------------------------------------------------------------------
+# Histogram helpers
+# ---------------------------------------------------------------------------
+
+def bucket_for(seconds: int) -> int:
+    return bisect_right(BUCKET_EDGES, max(seconds, 0)) - 1
+
+
+def histogram_of(stats: ContentStats) -> list:
+    hist = list(stats.duration_histogram or [])
+    return hist + [0] * (len(BUCKET_EDGES) - len(hist))
+
+
+def sessions_slower_than(histogram: list, seconds: int) -> float:
+    """Number of sessions longer than `seconds`, interpolating inside its bucket."""
+    i = bucket_for(seconds)
+    slower = sum(histogram[i + 1:])
+    if i + 1 < len(BUCKET_EDGES):
+        lo, hi = BUCKET_EDGES[i], BUCKET_EDGES[i + 1]
+        slower += histogram[i] * (hi - seconds) / (hi - lo)
+    return slower
+
+
+def time_percentile(stats: ContentStats, seconds: int):
+    """Share of sessions (0-100) slower than `seconds`."""
+    if not stats.session_count:
+        return None
+    return int(sessions_slower_than(histogram_of(stats), seconds) / stats.session_count * 100)
+
+
+def duration_at(histogram: list, q: float):
+    """
+    Session duration (seconds) at quantile `q` in [0, 1], interpolated inside
+    the bucket. The open-ended last bucket reports its lower edge.
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+    target = q * total
+    seen = 0
+    for i, n in enumerate(histogram):
+        if n and seen + n >= target:
+            lo = BUCKET_EDGES[i]
+            if i + 1 == len(BUCKET_EDGES):
+                return lo
+            hi = BUCKET_EDGES[i + 1]
+            return int(lo + (hi - lo) * (target - seen) / n)
+        seen += n
+    return BUCKET_EDGES[-1]
+
+
+def time_distribution(stats: ContentStats, user_seconds=None) -> dict:
+    """Compact histogram payload for drawing the session-duration curve."""
+    hist = histogram_of(stats)
+    return {
+        'bucket_edges': BUCKET_EDGES,
+        'counts': hist,
+        'session_count': stats.session_count,
+        'percentiles': {f'p{int(q * 100)}': duration_at(hist, q) for q in (0.25, 0.5, 0.75, 0.9)},
+        'user_bucket': bucket_for(user_seconds) if user_seconds is not None else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Incremental updates — call after the underlying row was written, inside
+# the same transaction where possible.
+# ---------------------------------------------------------------------------
+
+def _locked_stats(content_id):
+    """
+    Row-locked ContentStats for `content_id`, or None when the row did not
+    exist and was just rebuilt (it then already reflects the change).
+    """
+    if not ContentStats.objects.filter(content_id=content_id).exists():
+        rebuild_content_stats([content_id])
+        return None
+    return ContentStats.objects.select_for_update().get(content_id=content_id)
+
+
+def record_session(content_id: int, seconds: int) -> None:
+    with transaction.atomic():
+        stats = _locked_stats(content_id)
+        if stats is None:
+            return
+        hist = histogram_of(stats)
+        hist[bucket_for(seconds)] += 1
+        stats.duration_histogram = hist
+        stats.session_count += 1
+        stats.total_session_seconds += seconds
+        if stats.best_session_seconds is None or seconds < stats.best_session_seconds:
+            stats.best_session_seconds = seconds
+        stats.save(update_fields=['duration_histogram', 'session_count', 'total_session_seconds',
+                                  'best_session_seconds', 'updated_at'])
+
+
+def forget_session(content_id: int, seconds: int) -> None:
+    from apps.interactions.models import TimeSession
+
+    with transaction.atomic():
+        stats = _locked_stats(content_id)
+        if stats is None:
+            return
+        hist = histogram_of(stats)
+        b = bucket_for(seconds)
+        hist[b] = max(hist[b] - 1, 0)
+        stats.duration_histogram = hist
+        stats.session_count = max(stats.session_count - 1, 0)
+        stats.total_session_seconds = max(stats.total_session_seconds - seconds, 0)
+        if stats.best_session_seconds is not None and seconds <= stats.best_session_seconds:
+            best = TimeSession.objects.filter(
+                content_type=_content_ct(), object_id=content_id
+            ).aggregate(m=Min('session_duration'))['m']
+            stats.best_session_seconds = int(best.total_seconds()) if best is not None else None
+        stats.save(update_fields=['duration_histogram', 'session_count', 'total_session_seconds',
+                                  'best_session_seconds', 'updated_at'])
+
+
+def completion_changed(content_id: int, user_id: int, previous, current, completed_at) -> None:
+    """Track moves in/out of 'success' for solution_views_before_success."""
+    from apps.interactions.models import SolutionView
+
+    was, now = previous == 'success', current == 'success'
+    if was == now:
+        return
+    viewed_first = SolutionView.objects.filter(
+        user_id=user_id, content_type=_content_ct(), object_id=content_id,
+        viewed_at__lte=completed_at
+    ).exists()
+    if not viewed_first:
+        return
+    with transaction.atomic():
+        stats = _locked_stats(content_id)
+        if stats is None:
+            return
+        stats.solution_views_before_success = max(
+            stats.solution_views_before_success + (1 if now else -1), 0
+        )
+        stats.save(update_fields=['solution_views_before_success', 'updated_at'])
+
+
+def solution_view_removed(content_id: int, user_id: int, viewed_at) -> None:
+    from apps.interactions.models import Complete
+
+    counted = Complete.objects.filter(
+        user_id=user_id, content_type=_content_ct(), object_id=content_id,
+        status='success', created_at__gte=viewed_at
+    ).exists()
+    if not counted:
+        return
+    with transaction.atomic():
+        stats = _locked_stats(content_id)
+        if stats is None:
+            return
+        stats.solution_views_before_success = max(stats.solution_views_before_success - 1, 0)
+        stats.save(update_fields=['solution_views_before_success', 'updated_at'])
+
+
+def solution_match_changed(content_id: int, delta: int) -> None:
+    with transaction.atomic():
+        stats = _locked_stats(content_id)
+        if stats is None:
+            return
+        stats.solution_match_count = max(stats.solution_match_count + delta, 0)
+        stats.save(update_fields=['solution_match_count', 'updated_at'])
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+def get_content_stats(item: Content) -> ContentStats:
+    """The stats row for `item`, built on first use and with fresh study_stats."""
+    stats = ContentStats.objects.filter(content_id=item.id).first()
+    if stats is None:
+        rebuild_content_stats([item.id])
+        stats = ContentStats.objects.get(content_id=item.id)
+    if stats.study_stats_at is None or timezone.now() - stats.study_stats_at > STUDY_STATS_TTL:
+        stats.study_stats = compute_study_stats(item)
+        stats.study_stats_at = timezone.now()
+        stats.save(update_fields=['study_stats', 'study_stats_at'])
+    return stats
+
+
+def compute_study_stats(item: Content) -> dict:
+    """Average chapter time (by content kind) of the users who succeeded on `item`."""
+    from apps.interactions.models import Complete, TaxonomyTimeSpent
+    from apps.caracteristics.models import Chapter
+
+    successful = Complete.objects.filter(
+        content_type=_content_ct(), object_id=item.id, status='success'
+    ).values('user')
+    taxonomy = get_taxonomy(item.id)
+    chapters = taxonomy.chapters if taxonomy else ()
+    count = successful.count() if chapters else 0
+    if not count:
+        return dict(EMPTY_STUDY_STATS)
+    totals = TaxonomyTimeSpent.objects.filter(
+        user__in=successful, taxonomy_type='chapter',
+        content_type=ContentType.objects.get_for_model(Chapter),
+        object_id__in=chapters
+    ).aggregate(ex=Sum('exercise_time'), le=Sum('lesson_time'), exam=Sum('exam_time'))
+
+    def avg(total):
+        return int(total.total_seconds() / count) if total else 0
+
+    return {
+        'exercises_avg_seconds': avg(totals['ex']),
+        'lessons_avg_seconds': avg(totals['le']),
+        'exams_avg_seconds': avg(totals['exam']),
+        'chapters': [c.name for c in chapters],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Rebuild
+# ---------------------------------------------------------------------------
+
+def rebuild_content_stats(content_ids=None, batch_size=500) -> int:
+    """
+    Recompute ContentStats from the source tables for `content_ids`
+    (all content when None). Returns the number of rows written.
+    """
+    from apps.interactions.models import Complete, SolutionMatch, SolutionView, TimeSession
+
+    if content_ids is None:
+        content_ids = Content.objects.order_by('pk').values_list('pk', flat=True).iterator()
+    ct = _content_ct()
+    written = 0
+    batch = []
+
+    def flush(ids):
+        rows = {i: ContentStats(content_id=i, duration_histogram=[0] * len(BUCKET_EDGES))
+                for i in ids}
+
+        sessions = TimeSession.objects.filter(
+            content_type=ct, object_id__in=ids
+        ).values_list('object_id', 'session_duration')
+        for object_id, duration in sessions.iterator():
+            row = rows[object_id]
+            seconds = int(duration.total_seconds())
+            row.session_count += 1
+            row.total_session_seconds += seconds
+            row.duration_histogram[bucket_for(seconds)] += 1
+            if row.best_session_seconds is None or seconds < row.best_session_seconds:
+                row.best_session_seconds = seconds
+
+        viewed_first = SolutionView.objects.filter(
+            content_type=ct, user=OuterRef('user'),
+            object_id=OuterRef('object_id'),
+            viewed_at__lte=OuterRef('created_at'),
+        )
+        before_success = Complete.objects.filter(
+            content_type=ct, object_id__in=ids, status='success'
+        ).filter(Exists(viewed_first)).values('object_id').annotate(n=Count('id'))
+        for r in before_success:
+            rows[r['object_id']].solution_views_before_success = r['n']
+
+        matches = SolutionMatch.objects.filter(
+            content_type=ct, object_id__in=ids
+        ).values('object_id').annotate(n=Count('id'))
+        for r in matches:
+            rows[r['object_id']].solution_match_count = r['n']
+
+        ContentStats.objects.bulk_create(
+            rows.values(),
+            update_conflicts=True,
+            unique_fields=['content'],
+            update_fields=['session_count', 'total_session_seconds', 'best_session_seconds',
+                           'duration_histogram', 'solution_views_before_success',
+                           'solution_match_count', 'study_stats_at', 'updated_at'],
+        )
+        return len(rows)
+
+    for content_id in content_ids:
+        batch.append(content_id)
+        if len(batch) >= batch_size:
+            written += flush(batch)
+            batch = []
+    if batch:
+        written += flush(batch)
+    return written
@@ -2,6 +2,11 @@
 Pure functions that operate on a structure dict.
 No model imports — fully testable in isolation.
 
+StructureIndex walks the block tree once and holds every derived figure.
+structure_index() memoizes it when the caller passes a cheap version key
+(content_store uses (type, display_id, revision)); without one it just
+builds the index, since hashing the document costs more than the walk.
+
 Structure shape:
 {
     "version": "2.0",
@@ -14,58 +19,167 @@ Structure shape:
 }
 """
 
+import html as _html
+import re
+import threading
+from collections import OrderedDict
 
-def get_all_item_paths(structure: dict) -> list[str]:
-    paths = []
-    for block in (structure or {}).get('blocks', []):
-        if block.get('type') != 'question':
-            continue
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACE_RE = re.compile(r'\s+')
+
+
+class StructureIndex:
+    """
+    Everything derived from one traversal of the block tree:
+
+        paths         question paths in document order ("q1", "q1.a", "q1.a.i")
+        blocks        {path: block / subQuestion / part dict}
+        points        {path: points} — a question counts the sum of its
+                      sub-questions (and their parts) when that is > 0,
+                      otherwise its own points
+        total_points, section_count, preview
+    """
+    __slots__ = ('paths', 'blocks', 'points', 'total_points', 'section_count', 'preview')
+
+    def __init__(self, structure: dict):
+        self.paths = []
+        self.blocks = {}
+        self.points = {}
+        self.total_points = 0
+        self.section_count = 0
+        self.preview = ''
+        for block in (structure or {}).get('blocks', []):
+            block_type = block.get('type')
+            if block_type == 'section':
+                self.section_count += 1
+            if not self.preview and block_type in ('context', 'question'):
+                self.preview = ((block.get('content') or {}).get('html') or '')[:500]
+            if block_type == 'question':
+                self.total_points += self._add_question(block)
+
+    def _add(self, path, node, points):
+        self.paths.append(path)
+        self.blocks[path] = node
+        self.points[path] = points
+
+    def _add_question(self, block) -> int:
         block_id = block.get('id', '')
+        block_points = block.get('points', 0) or 0
+        sub_points = 0
+        if block_id:
+            self._add(block_id, block, block_points)
+        for sub in block.get('subQuestions', []):
+            sub_id = sub.get('id', '')
+            sub_path = f"{block_id}.{sub_id}"
+            points = sub.get('points', 0) or 0
+            parts_points = 0
+            indexed = bool(block_id and sub_id)
+            if indexed:
+                self._add(sub_path, sub, points)
+            for part in sub.get('parts', []):
+                part_points = part.get('points', 0) or 0
+                parts_points += part_points
+                if indexed and part.get('id', ''):
+                    self._add(f"{sub_path}.{part['id']}", part, part_points)
+            if indexed:
+                self.points[sub_path] = points + parts_points
+            sub_points += points + parts_points
+        total = sub_points if sub_points > 0 else block_points
         if block_id:
-            paths.append(block_id)
-            for sub in block.get('subQuestions', []):
-                sub_id = sub.get('id', '')
-                if sub_id:
-                    sub_path = f"{block_id}.{sub_id}"
-                    paths.append(sub_path)
-                    for part in sub.get('parts', []):
-                        part_id = part.get('id', '')
-                        if part_id:
-                            paths.append(f"{sub_path}.{part_id}")
-    return paths
+            self.points[block_id] = total
+        return total
+
+    @property
+    def item_count(self) -> int:
+        return len(self.paths)
+
+    def metrics(self) -> dict:
+        return {
+            'total_points': self.total_points,
+            'item_count': self.item_count,
+            'section_count': self.section_count,
+            'preview': self.preview,
+            'question_paths': list(self.paths),
+        }
+
+
+INDEX_CACHE_SIZE = 256
+
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def cached_index(key):
+    """The memoized StructureIndex for `key`, or None."""
+    with _index_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+        return index
+
+
+def structure_index(structure: dict, key=None) -> StructureIndex:
+    """
+    The StructureIndex of `structure`. With a `key` identifying this version
+    of the structure — e.g. (type, display_id, revision) from content_store —
+    it is memoized in a bounded LRU and shared: treat it as read-only.
+    """
+    if key is None:
+        return StructureIndex(structure)
+    index = cached_index(key)
+    if index is not None:
+        return index
+    index = StructureIndex(structure)
+    with _index_lock:
+        _index_cache[key] = index
+        if len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def get_all_item_paths(structure: dict) -> list[str]:
+    return list(structure_index(structure).paths)
 
 
 def get_total_points(structure: dict) -> int:
-    total = 0
-    for block in (structure or {}).get('blocks', []):
-        if block.get('type') != 'question':
-            continue
-        block_points = block.get('points', 0) or 0
-        sub_points = sum(
-            (sub.get('points', 0) or 0) + sum(
-                (part.get('points', 0) or 0) for part in sub.get('parts', [])
-            )
-            for sub in block.get('subQuestions', [])
-        )
-        total += sub_points if sub_points > 0 else block_points
-    return total
+    return structure_index(structure).total_points
 
 
 def get_item_count(structure: dict) -> int:
-    return len(get_all_item_paths(structure))
+    return structure_index(structure).item_count
 
 
 def get_section_count(structure: dict) -> int:
-    return sum(
-        1 for b in (structure or {}).get('blocks', [])
-        if b.get('type') == 'section'
-    )
+    return structure_index(structure).section_count
 
 
 def get_preview(structure: dict) -> str:
-    for block in (structure or {}).get('blocks', []):
-        if block.get('type') in ('context', 'question'):
-            html = block.get('content', {}).get('html', '')
-            if html:
-                return html[:500]
-    return ''
+    return structure_index(structure).preview
+
+
+def extract_text(structure: dict, limit: int = 100_000) -> str:
+    """Plain text of every `html` fragment in the structure (tags and entities stripped)."""
+    parts = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == 'html' and isinstance(value, str):
+                    parts.append(_TAG_RE.sub(' ', value))
+                else:
+                    walk(value)
+        elif isinstance(node, list):
+            for child in node:
+                walk(child)
+
+    walk(structure or {})
+    text = _SPACE_RE.sub(' ', _html.unescape(' '.join(parts))).strip()
+    return text[:limit]
+
+
+def compute_metrics(structure: dict, key=None) -> dict:
+    """
+    Summary stored next to the structure in Mongo (`metrics` sub-document)
+    so readers don't have to re-walk the block tree.
+    """
+    return structure_index(structure, key).metrics()
@@ -0,0 +1,125 @@
+"""
+In-memory prefix index for search-as-you-type suggestions.
+
+Each worker lazily loads content titles and Subject / Subfield / Chapter /
+Theorem names into a sorted array of normalized keys (lowercase, accents
+stripped, one key per word start) and answers prefix queries with bisect —
+no database access on the hot path.
+
+Writes bump a version stamp in the Django cache (see signals.py); a worker
+reloads when the stamp differs from the one it loaded, or after MAX_AGE
+seconds so per-process caches converge too.
+"""
+
+import logging
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+logger = logging.getLogger('django')
+
+VERSION_KEY = 'search_suggest:version'
+MAX_AGE = 300
+SCAN_LIMIT = 2000
+
+
+def normalize(text: str) -> str:
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower().strip()
+
+
+class SuggestIndex:
+    """Sorted (key, entry index) pairs over a list of suggestion entries."""
+
+    def __init__(self, entries):
+        # entry: (kind, id, label, subtype, weight)
+        self.entries = entries
+        self.labels = [normalize(e[2]) for e in entries]
+        pairs = []
+        for idx, label in enumerate(self.labels):
+            words = label.split()
+            for start in range(len(words)):
+                pairs.append((' '.join(words[start:]), idx))
+        pairs.sort()
+        self.keys = [k for k, _ in pairs]
+        self.refs = [i for _, i in pairs]
+
+    def query(self, q: str, limit: int = 8) -> list:
+        tokens = normalize(q).split()
+        if not tokens:
+            return []
+        prefix = ' '.join(tokens)
+        last, rest = tokens[-1], tokens[:-1]
+        # the full phrase matches contiguously; otherwise earlier words must appear anywhere
+        found = self._scan(prefix)
+        if len(found) < limit and rest:
+            for idx in self._scan(last):
+                if idx not in found and all(t in self.labels[idx] for t in rest):
+                    found[idx] = False
+        ranked = sorted(
+            found.items(),
+            key=lambda item: (not self.labels[item[0]].startswith(prefix), -self.entries[item[0]][4]),
+        )
+        return [self._serialize(idx) for idx, _ in ranked[:limit]]
+
+    def _scan(self, prefix: str) -> dict:
+        found = {}
+        i = bisect_left(self.keys, prefix)
+        end = min(i + SCAN_LIMIT, len(self.keys))
+        while i < end and self.keys[i].startswith(prefix):
+            found.setdefault(self.refs[i], True)
+            i += 1
+        return found
+
+    def _serialize(self, idx):
+        kind, obj_id, label, subtype, _ = self.entries[idx]
+        data = {'kind': kind, 'id': obj_id, 'label': label}
+        if subtype:
+            data['type'] = subtype
+        return data
+
+
+def _load_entries():
+    from apps.caracteristics.models import Chapter, Subfield, Subject, Theorem
+    from .models import Content
+
+    entries = [
+        ('content', pk, title, type_, view_count)
+        for pk, title, type_, view_count in Content.objects.values_list('pk', 'title', 'type', 'view_count')
+    ]
+    for kind, model in (('subject', Subject), ('subfield', Subfield), ('chapter', Chapter), ('theorem', Theorem)):
+        entries.extend((kind, pk, name, None, 0) for pk, name in model.objects.values_list('pk', 'name'))
+    return entries
+
+
+_lock = threading.Lock()
+_state = {'index': None, 'version': None, 'loaded_at': 0.0}
+
+
+def get_index() -> SuggestIndex:
+    version = cache.get(VERSION_KEY)
+    fresh = time.monotonic() - _state['loaded_at'] < MAX_AGE
+    if _state['index'] is not None and _state['version'] == version and fresh:
+        return _state['index']
+    with _lock:
+        if _state['index'] is None or _state['version'] != version or \
+                time.monotonic() - _state['loaded_at'] >= MAX_AGE:
+            started = time.monotonic()
+            _state['index'] = SuggestIndex(_load_entries())
+            _state['version'] = version
+            _state['loaded_at'] = time.monotonic()
+            logger.info(f"Suggest index loaded: {len(_state['index'].entries)} entries "
+                        f"in {(_state['loaded_at'] - started) * 1000:.0f} ms")
+    return _state['index']
+
+
+def invalidate() -> None:
+    """Mark every worker's index stale."""
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def suggest(q: str, limit: int = 8) -> list:
+    return get_index().query(q, limit)
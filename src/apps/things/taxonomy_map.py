@@ -0,0 +1,132 @@
+"""
+Content -> taxonomy membership map.
+
+Study-time rollups, taxonomy time stats and content statistics only need the
+ids of a content item's subject, subfields, chapters and theorems, but each
+used to re-query the M2M tables. `get_many(ids)` keeps one Django cache key
+per content id and loads what is missing with one query on Content plus one
+per through table.
+
+Each worker keeps the entries it loaded in a process-local dict, checked
+against a version stamp in the Django cache like the suggest index: a
+membership change (m2m_changed on chapters / subfields / theorems, a
+content's subject or type, a deletion, see signals.py) bumps the stamp and
+drops the local entries. When the cache is shared by every worker (Redis, see
+CACHES in settings) entries are also kept there per content id, and the
+change deletes the keys of the content involved. With the per-process LocMem
+cache other workers never see the new stamp, so their entries expire after
+MAX_AGE seconds.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import Content
+
+SHARED_TTL = 24 * 3600
+VERSION_KEY = 'content_taxonomy:version'
+MAX_AGE = 300
+LOCAL_MAX_ENTRIES = 50000
+
+# (taxonomy_type, ContentTaxonomy field, Content M2M field)
+M2M_FIELDS = (
+    ('subfield', 'subfields', Content.subfields),
+    ('chapter', 'chapters', Content.chapters),
+    ('theorem', 'theorems', Content.theorems),
+)
+
+
+class ContentTaxonomy(namedtuple('ContentTaxonomy', 'type subject subfields chapters theorems')):
+    """type and subject id (or None), then sorted id tuples per M2M."""
+    __slots__ = ()
+
+    def memberships(self):
+        """(taxonomy_type, taxonomy id) pairs, subject first."""
+        pairs = [('subject', self.subject)] if self.subject else []
+        for taxonomy_type, name, _ in M2M_FIELDS:
+            pairs.extend((taxonomy_type, taxonomy_id) for taxonomy_id in getattr(self, name))
+        return pairs
+
+
+def _load(ids) -> dict:
+    rows = Content.objects.filter(pk__in=ids).values_list('pk', 'type', 'subject_id')
+    members = {pk: {'type': type_, 'subject': subject_id} for pk, type_, subject_id in rows}
+    for _, name, field in M2M_FIELDS:
+        for entry in members.values():
+            entry[name] = []
+        column = f'{field.field.m2m_reverse_field_name()}_id'
+        for content_id, taxonomy_id in field.through.objects.filter(
+            content_id__in=list(members)
+        ).values_list('content_id', column):
+            members[content_id][name].append(taxonomy_id)
+    return {
+        pk: ContentTaxonomy(e['type'], e['subject'], tuple(sorted(e['subfields'])),
+                            tuple(sorted(e['chapters'])), tuple(sorted(e['theorems'])))
+        for pk, e in members.items()
+    }
+
+
+def _key(content_id) -> str:
+    return f'content_taxonomy:{content_id}'
+
+
+def _shared() -> bool:
+    """Whether cache writes and deletes reach every worker (not the per-process LocMem cache)."""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+_lock = threading.Lock()
+_local = {'entries': {}, 'version': None, 'loaded_at': 0.0}
+
+
+def _local_entries() -> dict:
+    """This worker's entries, emptied when the version stamp moved or MAX_AGE passed."""
+    version = cache.get(VERSION_KEY)
+    with _lock:
+        if _local['version'] != version or time.monotonic() - _local['loaded_at'] >= MAX_AGE \
+                or len(_local['entries']) > LOCAL_MAX_ENTRIES:
+            _local['entries'] = {}
+            _local['version'] = version
+            _local['loaded_at'] = time.monotonic()
+        return _local['entries']
+
+
+def get_many(ids) -> dict:
+    """{content id: ContentTaxonomy} for the existing content among `ids`."""
+    ids = set(ids)
+    if not ids:
+        return {}
+    local = _local_entries()
+    found = {i: local[i] for i in ids if i in local}
+    missing = ids - found.keys()
+    if missing and _shared():
+        keys = {_key(i): i for i in missing}
+        found.update(
+            (keys[key], ContentTaxonomy(*value)) for key, value in cache.get_many(list(keys)).items()
+        )
+        missing = ids - found.keys()
+    if missing:
+        loaded = _load(missing)
+        if _shared():
+            cache.set_many({_key(i): tuple(t) for i, t in loaded.items()}, SHARED_TTL)
+        found.update(loaded)
+    local.update(found)
+    return found
+
+
+def get(content_id):
+    """ContentTaxonomy of one content item, or None."""
+    return get_many([content_id]).get(content_id)
+
+
+def invalidate(content_ids) -> None:
+    """Drop the cached memberships of `content_ids`, and every worker's local entries."""
+    if _shared():
+        cache.delete_many([_key(i) for i in content_ids])
+    cache.set(VERSION_KEY, time.time_ns(), None)
+    with _lock:
+        _local['entries'] = {}
@@ -0,0 +1,297 @@
+import copy
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from pymongo.errors import OperationFailure
+from rest_framework.test import APIClient
+
+from apps.caracteristics.models import Subject
+from apps.interactions.models import Complete, Save, Vote
+from .content_store import PatchError, RevisionConflict, patch_blocks
+from .counters import reconcile_counters
+from .models import Comment, Content
+
+
+@mock.patch('apps.things.content_store._col')
+class ContentListQueryCountTests(TestCase):
+    """The list endpoint costs the same number of queries whatever the page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='x')
+        subject = Subject.objects.create(name='Mathématiques')
+        ct = ContentType.objects.get_for_model(Content)
+        for i in range(30):
+            item = Content.objects.create(
+                type=('exercise', 'lesson', 'exam')[i % 3], title=f'Item {i}',
+                author=cls.user, subject=subject,
+            )
+            Vote.objects.create(user=cls.user, content_type=ct, object_id=item.id, value=1)
+            Save.objects.create(user=cls.user, content_type=ct, object_id=item.id)
+            Complete.objects.create(user=cls.user, content_type=ct, object_id=item.id, status='success')
+            Comment.objects.create(content_item=item, author=cls.user, content='ok')
+        reconcile_counters()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _list(self, page_size):
+        response = self.client.get('/api/contents/', {'page_size': page_size})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_constant_queries_across_page_sizes(self, col):
+        col.return_value.find.return_value = []
+        for page_size in (1, 10, 30):
+            with self.assertNumQueries(10):
+                results = self._list(page_size)
+            self.assertEqual(len(results), page_size)
+        # and one Mongo round trip per page
+        self.assertEqual(col.return_value.find.call_count, 3)
+
+    def test_user_state_read_from_batched_maps(self, col):
+        col.return_value.find.return_value = []
+        item = self._list(5)[0]
+        self.assertEqual(item['user_vote'], 1)
+        self.assertTrue(item['user_save'])
+        self.assertEqual(item['user_complete'], 'success')
+        self.assertEqual(item['comment_count'], 1)
+
+
+@mock.patch('apps.things.content_store._col')
+class ContentBundleTests(TestCase):
+    """Each bundle section carries the payload of its standalone endpoint."""
+
+    ENDPOINTS = {
+        'stats': 'statistics',
+        'progress': 'question_progress',
+        'sessions': 'session_stats',
+        'recs': 'recommendations',
+        'ai': 'ai_corrections',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='x')
+        subject = Subject.objects.create(name='Mathématiques')
+        cls.items = [
+            Content.objects.create(type=type_, title=f'Item {i}', author=cls.user, subject=subject)
+            for i, type_ in enumerate(('exercise', 'exercise', 'lesson', 'exam'))
+        ]
+        ct = ContentType.objects.get_for_model(Content)
+        Complete.objects.create(user=cls.user, content_type=ct, object_id=cls.items[0].id, status='success')
+        reconcile_counters()
+
+    def setUp(self):
+        # statistics are cached per content and user
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/contents/{self.items[0].id}/'
+
+    def _mongo(self, col):
+        col.return_value.find.return_value = []
+        col.return_value.find_one.return_value = None
+
+    def test_sections_match_endpoints(self, col):
+        self._mongo(col)
+        # threads are skipped inside the test transaction, whatever the setting
+        for workers in (1, 4):
+            with override_settings(CONTENT_BUNDLE_WORKERS=workers):
+                response = self.client.get(f'{self.url}bundle/')
+            self.assertEqual(response.status_code, 200)
+            data = response.data
+            self.assertEqual(sorted(data), ['ai', 'content', 'progress', 'recs', 'sessions', 'stats'])
+            self.assertEqual(data['content'], self.client.get(self.url).data)
+            for name, endpoint in self.ENDPOINTS.items():
+                self.assertNotIn('error', data[name])
+                self.assertEqual(data[name], self.client.get(f'{self.url}{endpoint}/').data, name)
+
+    def test_section_payloads(self, col):
+        self._mongo(col)
+        data = self.client.get(f'{self.url}bundle/').data
+        self.assertEqual(data['content']['user_complete'], 'success')
+        self.assertEqual(data['stats']['total_participants'], 1)
+        self.assertEqual(data['stats']['user_completed'], 'success')
+        self.assertEqual(data['progress'], {})
+        self.assertEqual(data['sessions']['sessions'], [])
+        self.assertEqual(data['sessions']['stats']['total_sessions'], 0)
+        self.assertEqual([r['id'] for r in data['recs']['exercises']], [self.items[1].id])
+        self.assertEqual([r['id'] for r in data['recs']['lessons']], [self.items[2].id])
+        self.assertEqual([r['id'] for r in data['recs']['exams']], [self.items[3].id])
+        self.assertEqual(data['ai'], [])
+
+    def test_include_and_anonymous(self, col):
+        self._mongo(col)
+        data = self.client.get(f'{self.url}bundle/', {'include': 'stats,ai'}).data
+        self.assertEqual(sorted(data), ['ai', 'content', 'stats'])
+        self.assertEqual(self.client.get(f'{self.url}bundle/', {'include': 'stats,bogus'}).status_code, 400)
+        data = APIClient().get(f'{self.url}bundle/').data
+        self.assertEqual(sorted(data), ['content', 'recs', 'stats'])
+
+
+def _evaluate(expr, doc, variables):
+    """The aggregation expressions patch_blocks builds, evaluated in Python."""
+    if isinstance(expr, str) and expr.startswith('$'):
+        name, *path = expr[2:].split('.') if expr.startswith('$$') else ('', *expr[1:].split('.'))
+        value = variables[name] if name else doc
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        return value
+    if isinstance(expr, list):
+        return [_evaluate(e, doc, variables) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) != 1 or not next(iter(expr)).startswith('$'):
+        return {k: _evaluate(v, doc, variables) for k, v in expr.items()}
+    (op, arg), = expr.items()
+    if op == '$literal':
+        return copy.deepcopy(arg)
+    if op == '$map':
+        return [_evaluate(arg['in'], doc, {**variables, arg['as']: x})
+                for x in _evaluate(arg['input'], doc, variables)]
+    if op == '$filter':
+        return [x for x in _evaluate(arg['input'], doc, variables)
+                if _evaluate(arg['cond'], doc, {**variables, arg['as']: x})]
+    if op == '$cond':
+        return _evaluate(arg[1] if _evaluate(arg[0], doc, variables) else arg[2], doc, variables)
+    args = _evaluate(arg, doc, variables)
+    if op == '$mergeObjects':
+        merged = {}
+        for part in args:
+            if not isinstance(part, dict):
+                raise OperationFailure('$mergeObjects requires object inputs', code=40400)
+            merged.update(part)
+        return merged
+    return {
+        '$eq': lambda: args[0] == args[1],
+        '$ne': lambda: args[0] != args[1],
+        '$ifNull': lambda: args[1] if args[0] is None else args[0],
+        '$concatArrays': lambda: [x for part in args for x in part],
+        '$size': lambda: len(args),
+        '$add': lambda: sum(args),
+        '$slice': lambda: args[0][args[1]:args[1] + args[2]] if len(args) == 3 else args[0][:args[1]],
+    }[op]()
+
+
+class FakeStructures:
+    """One structure document, with the calls patch_blocks makes on the collection."""
+
+    def __init__(self, blocks, revision=1):
+        self.doc = {'type': 'exercise', 'display_id': 1, 'revision': revision, 'json_content': {'blocks': blocks}}
+
+    def _matches(self, query):
+        revision = query.get('revision', self.doc['revision'])
+        if isinstance(revision, dict):
+            return self.doc['revision'] in revision['$in']
+        return self.doc['revision'] == revision
+
+    def find_one(self, query, projection=None):
+        return copy.deepcopy(self.doc) if self._matches(query) else None
+
+    def find_one_and_update(self, query, pipeline, projection=None, return_document=None):
+        if not self._matches(query):
+            return None
+        for stage in pipeline:
+            for path, expr in stage['$set'].items():
+                value = _evaluate(expr, self.doc, {})
+                *parents, last = path.split('.')
+                target = self.doc
+                for key in parents:
+                    target = target.setdefault(key, {})
+                target[last] = value
+        return {k: copy.deepcopy(v) for k, v in self.doc.items() if k in projection}
+
+    def update_one(self, query, update):
+        if self._matches(query):
+            self.doc.update(update['$set'])
+
+
+class PatchBlocksTests(TestCase):
+    """patch_blocks against an in-memory collection evaluating its pipeline."""
+
+    def setUp(self):
+        self.col = FakeStructures([
+            {'id': 'q1', 'type': 'question', 'points': 1, 'content': {'html': '<p>one</p>'}},
+            {'id': 'q2', 'type': 'question', 'points': 2, 'content': {'html': '<p>two</p>'}},
+        ])
+        for patcher in (
+            mock.patch('apps.things.content_store._col', return_value=self.col),
+            # indexes are memoized per (type, display_id, revision), the same in every test
+            mock.patch.dict('apps.things.structure_utils._index_cache', clear=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _patch(self, *ops, **kwargs):
+        return patch_blocks('exercise', 1, list(ops), **kwargs)
+
+    def _ids(self):
+        return [b['id'] for b in self.col.doc['json_content']['blocks']]
+
+    def _block(self, block_id):
+        return next(b for b in self.col.doc['json_content']['blocks'] if b['id'] == block_id)
+
+    def test_set(self):
+        self.assertEqual(self._patch({'op': 'set', 'id': 'q2', 'block': {'type': 'context'}}), 2)
+        self.assertEqual(self._block('q2'), {'type': 'context', 'id': 'q2'})
+        self.assertEqual(self.col.doc['metrics']['total_points'], 1)
+
+    def test_update(self):
+        self._patch({'op': 'update', 'id': 'q1', 'fields': {'points': 5, 'content.html': '<p>new</p>'}})
+        self.assertEqual(self._block('q1'), {
+            'id': 'q1', 'type': 'question', 'points': 5, 'content': {'html': '<p>new</p>'},
+        })
+        self.assertEqual(self.col.doc['metrics']['total_points'], 7)
+
+    def test_update_outside_derived_keys_skips_metrics(self):
+        self._patch({'op': 'update', 'id': 'q1', 'fields': {'difficulty': 'hard'}})
+        self.assertEqual(self._block('q1')['difficulty'], 'hard')
+        self.assertEqual(self.col.doc['revision'], 2)
+        self.assertNotIn('metrics', self.col.doc)
+
+    def test_update_through_scalar(self):
+        with self.assertRaises(PatchError):
+            self._patch({'op': 'update', 'id': 'q1', 'fields': {'points.value': 3}})
+
+    def test_insert_positions(self):
+        self._patch(
+            {'op': 'insert', 'block': {'id': 'first'}, 'position': 0},
+            {'op': 'insert', 'block': {'id': 'middle'}, 'position': 2},
+            {'op': 'insert', 'block': {'id': 'last'}},
+        )
+        self.assertEqual(self._ids(), ['first', 'q1', 'middle', 'q2', 'last'])
+
+    def test_remove(self):
+        self._patch({'op': 'remove', 'id': 'q1'})
+        self.assertEqual(self._ids(), ['q2'])
+        self.assertEqual(self.col.doc['metrics']['total_points'], 2)
+
+    def test_duplicate_id_writes_nothing(self):
+        with self.assertRaises(PatchError):
+            self._patch({'op': 'remove', 'id': 'q1'}, {'op': 'insert', 'block': {'id': 'q2'}})
+        self.assertEqual(self._ids(), ['q1', 'q2'])
+        self.assertEqual(self.col.doc['revision'], 1)
+
+    def test_stale_revision(self):
+        with self.assertRaises(RevisionConflict) as ctx:
+            self._patch({'op': 'remove', 'id': 'q1'}, expected_revision=0)
+        self.assertEqual((ctx.exception.expected, ctx.exception.current), (0, 1))
+        self.assertEqual(self._ids(), ['q1', 'q2'])
+
+    def test_concurrent_write_conflicts(self):
+        read = self.col.find_one
+
+        def read_then_write(*args):
+            # another writer bumps the revision between the read and the update
+            doc = read(*args)
+            self.col.doc['revision'] = 5
+            return doc
+
+        self.col.find_one = read_then_write
+        with self.assertRaises(RevisionConflict):
+            self._patch({'op': 'remove', 'id': 'q1'})
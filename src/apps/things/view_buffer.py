@@ -0,0 +1,288 @@
+"""
+Write-behind buffer for content view counting.
+
+The `view` action used to run an EXISTS on ViewHistory, an UPDATE of
+view_count, a refresh and an update_or_create on every page open. Views are
+now recorded in a shared buffer and written to the database periodically:
+
+    * view_count increments are summed per content item and applied as one
+      UPDATE ... SET view_count = view_count + n per item;
+    * ViewHistory upserts are collapsed per (user, content) and written with
+      a single bulk INSERT ... ON CONFLICT, then stamped with the buffered
+      view time (viewed_at is auto_now, so that takes a bulk_update);
+    * the 24h "already viewed" dedupe is answered from the buffer;
+    * the displayed count is the cached database value plus the pending
+      increments. The cached value is tagged with a flush generation so it
+      is re-read once after each flush, and the endpoint otherwise never
+      touches the database.
+
+Backends:
+    RedisViewBuffer — shared by every worker, used when VIEW_BUFFER_REDIS_URL
+                      is set and the redis package is installed.
+    LocalViewBuffer — in-process fallback (per worker), flushed from the
+                      worker itself.
+
+Flushing happens opportunistically in a background thread once every
+VIEW_BUFFER_FLUSH_SECONDS, and can be forced with `flush_view_buffer`.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+
+logger = logging.getLogger('django')
+
+DEDUPE_SECONDS = 24 * 3600
+
+
+class LocalViewBuffer:
+    """In-process buffer guarded by a lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}   # content_id -> pending increments
+        self._history = {}  # (user_id, content_id) -> viewed_at (epoch)
+        self._seen = {}     # (user_id, content_id) -> dedupe expiry (epoch)
+        self._generation = 0
+
+    def record(self, content_id, user_id) -> bool:
+        now = time.time()
+        key = (user_id, content_id)
+        with self._lock:
+            self._history[key] = now
+            if self._seen.get(key, 0) > now:
+                return False
+            self._seen[key] = now + DEDUPE_SECONDS
+            self._counts[content_id] = self._counts.get(content_id, 0) + 1
+            if len(self._seen) > 100_000:
+                self._seen = {k: exp for k, exp in self._seen.items() if exp > now}
+            return True
+
+    def pending(self, content_id) -> int:
+        with self._lock:
+            return self._counts.get(content_id, 0)
+
+    def drain(self):
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            history, self._history = self._history, {}
+        return counts, history
+
+    def restore(self, counts, history):
+        with self._lock:
+            for content_id, n in counts.items():
+                self._counts[content_id] = self._counts.get(content_id, 0) + n
+            for key, ts in history.items():
+                self._history.setdefault(key, ts)
+
+    def generation(self) -> int:
+        return self._generation
+
+    def bump_generation(self):
+        with self._lock:
+            self._generation += 1
+
+
+class RedisViewBuffer:
+    """Buffer shared across workers, kept in Redis hashes."""
+
+    COUNTS = 'content_views:pending'
+    HISTORY = 'content_views:history'
+    SEEN = 'content_views:seen:{}:{}'
+    GENERATION = 'content_views:generation'
+
+    def __init__(self, client):
+        self._r = client
+
+    def record(self, content_id, user_id) -> bool:
+        pipe = self._r.pipeline()
+        pipe.hset(self.HISTORY, f'{user_id}:{content_id}', time.time())
+        pipe.set(self.SEEN.format(user_id, content_id), 1, nx=True, ex=DEDUPE_SECONDS)
+        _, first_view = pipe.execute()
+        if first_view:
+            self._r.hincrby(self.COUNTS, content_id, 1)
+        return bool(first_view)
+
+    def pending(self, content_id) -> int:
+        return int(self._r.hget(self.COUNTS, content_id) or 0)
+
+    def drain(self):
+        pipe = self._r.pipeline(transaction=True)
+        pipe.hgetall(self.COUNTS)
+        pipe.delete(self.COUNTS)
+        pipe.hgetall(self.HISTORY)
+        pipe.delete(self.HISTORY)
+        raw_counts, _, raw_history, _ = pipe.execute()
+        counts = {int(k): int(v) for k, v in raw_counts.items()}
+        history = {}
+        for k, v in raw_history.items():
+            user_id, content_id = (int(x) for x in k.decode().split(':'))
+            history[(user_id, content_id)] = float(v)
+        return counts, history
+
+    def restore(self, counts, history):
+        pipe = self._r.pipeline()
+        for content_id, n in counts.items():
+            pipe.hincrby(self.COUNTS, content_id, n)
+        for (user_id, content_id), ts in history.items():
+            pipe.hsetnx(self.HISTORY, f'{user_id}:{content_id}', ts)
+        pipe.execute()
+
+    def generation(self) -> int:
+        return int(self._r.get(self.GENERATION) or 0)
+
+    def bump_generation(self):
+        self._r.incr(self.GENERATION)
+
+
+def _make_buffer():
+    url = getattr(settings, 'VIEW_BUFFER_REDIS_URL', None)
+    if url:
+        try:
+            import redis
+            client = redis.Redis.from_url(url, socket_timeout=1)
+            client.ping()
+            return RedisViewBuffer(client)
+        except Exception as e:
+            logger.warning(f"View buffer: Redis unavailable ({e}), using in-process buffer")
+    return LocalViewBuffer()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+_last_flush = time.time()
+_flushing = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = _make_buffer()
+    return _buffer
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def record_view(content_id: int, user_id: int) -> bool:
+    """Buffer a view; returns False when the user already viewed it in the last 24h."""
+    counted = get_buffer().record(content_id, user_id)
+    _maybe_flush()
+    return counted
+
+
+def pending_views(content_id: int) -> int:
+    """Increments recorded for `content_id` but not yet written to the database."""
+    return get_buffer().pending(content_id)
+
+
+def current_view_count(content_id: int, loader) -> int:
+    """
+    Stored view_count plus pending increments. `loader()` reads the stored
+    value and is only called on a cache miss or after a flush.
+    """
+    buf = get_buffer()
+    key = f'content_views:base:{content_id}'
+    generation = buf.generation()
+    cached = cache.get(key)
+    if cached is not None and cached[1] == generation:
+        base = cached[0]
+    else:
+        base = loader()
+        cache.set(key, (base, generation), DEDUPE_SECONDS)
+    return base + buf.pending(content_id)
+
+
+def flush() -> tuple[int, int]:
+    """
+    Write buffered views to the database.
+    Returns (content items updated, history rows upserted).
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from apps.users.models import ViewHistory
+    from .models import Content
+
+    buf = get_buffer()
+    with _flushing:
+        counts, history = buf.drain()
+        if not counts and not history:
+            return 0, 0
+        try:
+            ct = ContentType.objects.get_for_model(Content)
+            with transaction.atomic():
+                for content_id, n in counts.items():
+                    Content.objects.filter(pk=content_id).update(view_count=F('view_count') + n)
+                existing = set(Content.objects.filter(
+                    pk__in={cid for _, cid in history}
+                ).values_list('pk', flat=True))
+                viewed_at = {
+                    key: datetime.fromtimestamp(ts, tz=timezone.utc)
+                    for key, ts in history.items() if key[1] in existing
+                }
+                rows = [
+                    ViewHistory(user_id=user_id, content_type=ct, object_id=content_id, status='viewed')
+                    for (user_id, content_id) in viewed_at
+                ]
+                ViewHistory.objects.bulk_create(
+                    rows, batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=['user', 'content_type', 'object_id'],
+                    update_fields=['status'],
+                )
+                # viewed_at is auto_now, so inserts stamp the flush time; write the
+                # buffered view times with bulk_update, which skips pre_save
+                stored = ViewHistory.objects.filter(
+                    content_type=ct,
+                    user_id__in={user_id for user_id, _ in viewed_at},
+                    object_id__in={content_id for _, content_id in viewed_at},
+                ).only('pk', 'user_id', 'object_id')
+                stamped = []
+                for row in stored:
+                    ts = viewed_at.get((row.user_id, row.object_id))
+                    if ts is not None:
+                        row.viewed_at = ts
+                        stamped.append(row)
+                ViewHistory.objects.bulk_update(stamped, ['viewed_at'], batch_size=500)
+        except Exception:
+            # Put the drained views back so the next flush retries them.
+            buf.restore(counts, history)
+            raise
+        buf.bump_generation()
+        return len(counts), len(rows)
+
+
+def _maybe_flush():
+    global _last_flush
+    interval = getattr(settings, 'VIEW_BUFFER_FLUSH_SECONDS', 30)
+    if time.time() - _last_flush < interval or _flushing.locked():
+        return
+    _last_flush = time.time()
+    threading.Thread(target=_flush_in_thread, daemon=True).start()
+
+
+def _flush_in_thread():
+    try:
+        flush()
+    except Exception as e:
+        logger.error(f"View buffer flush failed: {e}")
+    finally:
+        connection.close()
+
+
+@atexit.register
+def _flush_on_exit():
+    if isinstance(_buffer, LocalViewBuffer):
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"View buffer final flush failed: {e}")
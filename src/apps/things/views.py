@@ -1,16 +1,17 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view, permission_classes as perm_classes
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes as perm_classes
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from datetime import timedelta
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db import transaction
+from django.db import connection, connections, transaction
 from django.core.cache import cache
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Count, Q, F
+from django.db.models import Exists, F, OuterRef, Q
 from django.conf import settings
 
 USE_TRIGRAM = 'postgresql' in settings.DATABASES['default']['ENGINE']
@@ -24,15 +25,25 @@ else:
     TrigramSimilarity = None
 
 from .models import Content, Solution, Comment
-from .content_store import get_structures_batch, get_structure
+from .counters import bump
+from .content_store import get_documents_multi, get_metrics_multi, get_structure, get_structure_index, metrics_of
+from .pagination import CursorOrPageNumberPagination
 from .pdf_parser import parse_pdf
-from .serializers import ContentSerializer, ContentListSerializer, ContentCreateSerializer, SolutionSerializer, CommentSerializer
+from .search_index import search as search_content
+from .similarity import live_neighbors_qs, neighbor_ids
+from .suggest import suggest
+from .stats import (
+    completion_changed, forget_session, get_content_stats, record_session,
+    solution_match_changed, solution_view_removed, time_distribution, time_percentile,
+)
+from .view_buffer import current_view_count, record_view
+from .serializers import ContentSerializer, ContentListSerializer, ContentCreateSerializer, SolutionSerializer, CommentSerializer, load_comment_tree
 from apps.interactions.models import Vote, Save, Complete, TimeSession, SolutionView, SolutionMatch, QuestionProgress, AICorrection
 from apps.interactions.serializers import VoteSerializer, SaveSerializer, CompleteSerializer, AICorrectionSerializer
 from apps.interactions.views import VoteMixin
 from apps.interactions.services import AIVisionService
 from apps.users.models import ViewHistory
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly, IsAuthenticated
 
 import logging
 logger = logging.getLogger('django')
@@ -54,6 +65,78 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 
+def _mongo_context(items, fields=None):
+    """
+    Serializer context with the structures and/or metrics of `items`, fetched
+    in one query. When `fields` doesn't ask for json_content only the metrics
+    sub-document is projected.
+    """
+    wanted = set(ContentListSerializer.STRUCTURE_FIELDS)
+    if fields:
+        wanted &= set(fields)
+    if not wanted:
+        return {}
+    keys = [(i.type, i.display_id) for i in items]
+    if 'json_content' not in wanted:
+        return {'mongo_metrics': get_metrics_multi(keys)}
+    docs = get_documents_multi(keys)
+    return {
+        'mongo_structures': {k: d.get('json_content') or {} for k, d in docs.items()},
+        'mongo_metrics': {k: metrics_of(d) for k, d in docs.items()},
+    }
+
+
+def _user_state_context(request, items):
+    """
+    Serializer context with the current user's votes, saves and completions
+    for `items` — one query per relation instead of one per row.
+    """
+    ids = [i.id for i in items]
+    if not ids:
+        return {}
+    ctx = {}
+    user = request.user if request else None
+    if user and user.is_authenticated:
+        ct = ContentType.objects.get_for_model(Content)
+        base = {'user': user, 'content_type': ct, 'object_id__in': ids}
+        ctx['user_votes'] = dict(Vote.objects.filter(**base).values_list('object_id', 'value'))
+        ctx['user_saves'] = set(Save.objects.filter(**base).values_list('object_id', flat=True))
+        ctx['user_completes'] = dict(Complete.objects.filter(**base).values_list('object_id', 'status'))
+    return ctx
+
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def _bundle_section(name, build, timings, threaded=False):
+    """
+    Build one ContentViewSet.bundle section. A failing section is reported in
+    place instead of failing the whole bundle. Worker threads get their own DB
+    connection, closed here so it does not outlive the request.
+    """
+    started = time.perf_counter()
+    try:
+        return build()
+    except Exception as e:
+        logger.error(f"Bundle section {name} failed: {e}", exc_info=True)
+        return {'error': f'Failed to load {name}'}
+    finally:
+        timings[name] = _elapsed_ms(started)
+        if threaded:
+            connections.close_all()
+
+
+def _viewed_by(user, ct):
+    """EXISTS on the user's ViewHistory row — one probe of its (user, content_type, object_id) index."""
+    return Exists(ViewHistory.objects.filter(user=user, content_type=ct, object_id=OuterRef('pk')))
+
+
+def _completed_by(user, ct, status):
+    """EXISTS on the user's Complete row with `status` — served by its (user, content_type, status, object_id) index."""
+    return Exists(Complete.objects.filter(user=user, content_type=ct, status=status, object_id=OuterRef('pk')))
+
+
 # =====================
 # CONTENT VIEWSET
 # =====================
@@ -65,11 +148,19 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
     """
     queryset = Content.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
-    pagination_class = StandardResultsSetPagination
+    # ?cursor= switches to keyset paging (infinite scroll), page numbers otherwise
+    pagination_class = CursorOrPageNumberPagination
 
     # Subclasses set this to scope automatically
     content_type_scope = None
 
+    # Content columns loaded in projected list mode (?view=card / ?fields=)
+    LIST_ONLY_FIELDS = (
+        'id', 'display_id', 'type', 'title', 'difficulty', 'created_at', 'view_count',
+        'is_national_exam', 'national_year', 'duration_minutes', 'author', 'subject',
+        'vote_score', 'comment_count',
+    )
+
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return ContentCreateSerializer
@@ -77,38 +168,38 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
             return ContentListSerializer
         return ContentSerializer
 
+    def _requested_list_fields(self):
+        """Field projection for list: ?fields=a,b,c or ?view=card. None means the full payload."""
+        params = self.request.query_params
+        fields = params.get('fields')
+        if fields:
+            return [f.strip() for f in fields.split(',') if f.strip()]
+        if params.get('view') == 'card':
+            return list(ContentListSerializer.CARD_FIELDS)
+        return None
+
+    def get_serializer_context(self):
+        ctx = super().get_serializer_context()
+        if self.action == 'list':
+            ctx['fields'] = self._requested_list_fields()
+        return ctx
+
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
         page = self.paginate_queryset(queryset)
         items = page if page is not None else queryset
-        # batch fetch structures from Mongo
-        type_scope = self.content_type_scope or request.query_params.get('type')
-        if type_scope and items:
-            display_ids = [i.display_id for i in items if i.display_id]
-            structures = get_structures_batch(type_scope, display_ids)
-        else:
-            # mixed types — fetch per type
-            from collections import defaultdict
-            by_type = defaultdict(list)
-            for i in items:
-                if i.display_id:
-                    by_type[i.type].append(i.display_id)
-            structures = {}
-            for t, ids in by_type.items():
-                batch = get_structures_batch(t, ids)
-                structures.update(batch)
-        ctx = {**self.get_serializer_context(), 'mongo_structures': structures}
+        # batch fetch structures from Mongo — one query, keyed by (type, display_id)
+        ctx = self.get_serializer_context()
+        ctx.update(_mongo_context(items, ctx['fields']))
+        ctx.update(_user_state_context(request, items))
         serializer = self.get_serializer(items, many=True, context=ctx)
         return self.get_paginated_response(serializer.data) if page is not None else Response(serializer.data)
 
     def get_queryset(self):
         queryset = Content.objects.all().select_related(
-            'author', 'solution', 'subject'
+            'author__profile', 'solution__author__profile', 'subject'
         ).prefetch_related(
-            'chapters', 'class_levels', 'comments', 'votes', 'theorems', 'subfields', 'completed'
-        ).annotate(
-            vote_count_annotation=Count('votes', filter=Q(votes__value=Vote.UP)) -
-                                  Count('votes', filter=Q(votes__value=Vote.DOWN))
+            'chapters', 'class_levels', 'theorems', 'subfields', 'subject__class_levels'
         )
 
         # Type scope (from subclass or query param)
@@ -119,7 +210,10 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
         # Search
         search_query = self.request.query_params.get('search')
         if search_query:
-            if USE_TRIGRAM:
+            searched = search_content(queryset, search_query)
+            if searched is not None:
+                queryset = searched
+            elif USE_TRIGRAM:
                 queryset = queryset.annotate(
                     title_similarity=TrigramSimilarity('title', search_query),
                     content_similarity=TrigramSimilarity('content', search_query),
@@ -184,14 +278,11 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
             content_ct = ContentType.objects.get_for_model(Content)
             status_filter = Q()
             if show_viewed:
-                viewed_ids = ViewHistory.objects.filter(
-                    user=self.request.user, content_type=content_ct
-                ).values_list('object_id', flat=True)
-                status_filter |= Q(id__in=viewed_ids)
+                status_filter |= Q(_viewed_by(self.request.user, content_ct))
             if show_completed:
-                status_filter |= Q(completed__user=self.request.user, completed__status='success')
+                status_filter |= Q(_completed_by(self.request.user, content_ct, 'success'))
             if show_failed:
-                status_filter |= Q(completed__user=self.request.user, completed__status='review')
+                status_filter |= Q(_completed_by(self.request.user, content_ct, 'review'))
             if status_filter:
                 filters &= status_filter
 
@@ -199,18 +290,23 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
 
         if hide_viewed and self.request.user and self.request.user.is_authenticated:
             content_ct = ContentType.objects.get_for_model(Content)
-            viewed_ids = ViewHistory.objects.filter(
-                user=self.request.user, content_type=content_ct
-            ).values_list('object_id', flat=True)
-            queryset = queryset.exclude(id__in=viewed_ids)
-
-        sort_by = self.request.query_params.get('sort', 'newest')
-        if sort_by == 'oldest':
-            queryset = queryset.order_by('created_at')
+            queryset = queryset.filter(~_viewed_by(self.request.user, content_ct))
+
+        sort_by = self.request.query_params.get('sort')
+        if sort_by is None and search_query and 'search_rank' in queryset.query.annotations:
+            queryset = queryset.order_by('-search_rank', '-id')
+        elif sort_by == 'oldest':
+            queryset = queryset.order_by('created_at', 'id')
         elif sort_by == 'most_upvoted':
-            queryset = queryset.order_by('-vote_count_annotation', '-created_at')
+            queryset = queryset.order_by('-vote_score', '-id')
         else:
-            queryset = queryset.order_by('-created_at')
+            queryset = queryset.order_by('-created_at', '-id')
+
+        if self.action == 'list':
+            if self._requested_list_fields():
+                queryset = queryset.only(*self.LIST_ONLY_FIELDS)
+            else:
+                queryset = queryset.defer('content')
 
         return queryset.distinct()
 
@@ -231,6 +327,7 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
                 author=request.user,
                 parent_id=request.data.get('parent')
             )
+            bump(item.id, comment_count=1)
             file_ids = request.data.get('file_ids', [])
             if file_ids:
                 ct = ContentType.objects.get_for_model(comment)
@@ -243,6 +340,16 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['get'])
+    def comments(self, request, pk=None):
+        """Paged top-level comments with their full reply threads."""
+        item = self.get_object()
+        roots, ctx = load_comment_tree(item, request)
+        paginator = StandardResultsSetPagination()
+        page = paginator.paginate_queryset(roots, request, view=self)
+        serializer = CommentSerializer(page, many=True, context={'request': request, **ctx})
+        return paginator.get_paginated_response(serializer.data)
+
     # ---- solution ----
     @action(detail=True, methods=['post'])
     def solution(self, request, pk=None):
@@ -268,10 +375,20 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
         if status_value not in ['success', 'review']:
             return Response({'error': 'status must be "success" or "review"'}, status=status.HTTP_400_BAD_REQUEST)
         ct = ContentType.objects.get_for_model(Content)
-        progress, _ = Complete.objects.update_or_create(
-            user=request.user, content_type=ct, object_id=item.id,
-            defaults={'status': status_value}
-        )
+        with transaction.atomic():
+            previous = Complete.objects.select_for_update().filter(
+                user=request.user, content_type=ct, object_id=item.id
+            ).values_list('status', flat=True).first()
+            progress, _ = Complete.objects.update_or_create(
+                user=request.user, content_type=ct, object_id=item.id,
+                defaults={'status': status_value}
+            )
+            if previous != status_value:
+                deltas = {f'{status_value}_count': 1}
+                if previous:
+                    deltas[f'{previous}_count'] = -1
+                bump(item.id, **deltas)
+                completion_changed(item.id, request.user.id, previous, status_value, progress.created_at)
         cache.delete(f'content_stats_{item.id}_user_{request.user.id}')
         cache.delete(f'content_stats_{item.id}_user_None')
         return Response({'id': progress.id, 'status': progress.status,
@@ -281,9 +398,16 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
     def remove_progress(self, request, pk=None):
         item = self.get_object()
         ct = ContentType.objects.get_for_model(Content)
-        deleted, _ = Complete.objects.filter(
-            user=request.user, content_type=ct, object_id=item.id
-        ).delete()
+        with transaction.atomic():
+            previous, completed_at = Complete.objects.select_for_update().filter(
+                user=request.user, content_type=ct, object_id=item.id
+            ).values_list('status', 'created_at').first() or (None, None)
+            deleted, _ = Complete.objects.filter(
+                user=request.user, content_type=ct, object_id=item.id
+            ).delete()
+            if deleted and previous:
+                bump(item.id, **{f'{previous}_count': -1})
+                completion_changed(item.id, request.user.id, previous, None, completed_at)
         if deleted:
             cache.delete(f'content_stats_{item.id}_user_{request.user.id}')
             cache.delete(f'content_stats_{item.id}_user_None')
@@ -295,6 +419,11 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
         return self.mark_progress(request, pk)
 
     # ---- question progress ----
+    @staticmethod
+    def _unknown_question_path(item, question_path):
+        """True when `question_path` doesn't exist in the item's structure."""
+        return question_path not in get_structure_index(item.type, item.display_id).blocks
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def assess_question(self, request, pk=None):
         item = self.get_object()
@@ -304,6 +433,8 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
             return Response({'error': 'question_path required'}, status=status.HTTP_400_BAD_REQUEST)
         if assessment_status not in ['success', 'partial', 'review', 'failed']:
             return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+        if self._unknown_question_path(item, question_path):
+            return Response({'error': 'Unknown question_path'}, status=status.HTTP_400_BAD_REQUEST)
         ct = ContentType.objects.get_for_model(Content)
         progress, _ = QuestionProgress.objects.update_or_create(
             user=request.user, content_type=ct, object_id=item.id,
@@ -333,6 +464,8 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
             return Response({'error': 'question_path required'}, status=status.HTTP_400_BAD_REQUEST)
         if validation and validation not in ['compatible', 'different', 'not-understood']:
             return Response({'error': 'Invalid validation'}, status=status.HTTP_400_BAD_REQUEST)
+        if self._unknown_question_path(item, question_path):
+            return Response({'error': 'Unknown question_path'}, status=status.HTTP_400_BAD_REQUEST)
         ct = ContentType.objects.get_for_model(Content)
         progress, _ = QuestionProgress.objects.update_or_create(
             user=request.user, content_type=ct, object_id=item.id,
@@ -345,18 +478,20 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
     def question_progress(self, request, pk=None):
         item = self.get_object()
-        ct = ContentType.objects.get_for_model(Content)
+        return Response(self._question_progress_data(request, item, ContentType.objects.get_for_model(Content)))
+
+    def _question_progress_data(self, request, item, ct):
         records = QuestionProgress.objects.filter(
             user=request.user, content_type=ct, object_id=item.id
         )
-        return Response({
+        return {
             r.question_path: {
                 'status': r.status,
                 'solution_validation': r.solution_validation,
                 'assessed_at': r.assessed_at
             }
             for r in records
-        })
+        }
 
     # ---- similar ----
     @action(detail=True, methods=['get'])
@@ -365,11 +500,18 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
         chapters = item.chapters.all()
         if not chapters.exists():
             return Response({'results': [], 'count': 0})
-        similar = Content.objects.filter(
-            type=item.type, chapters__in=chapters
-        ).exclude(id=item.id).distinct()[:10]
+        ids = neighbor_ids(item.id).get(item.type, [])[:10]
+        if ids:
+            by_id = Content.objects.select_related('author__profile', 'subject').prefetch_related(
+                'chapters', 'class_levels', 'theorems', 'subfields', 'subject__class_levels'
+            ).in_bulk(ids)
+            similar = [by_id[i] for i in ids if i in by_id]
+        else:
+            similar = list(Content.objects.filter(
+                type=item.type, chapters__in=chapters
+            ).exclude(id=item.id).distinct()[:10])
         serializer = ContentSerializer(similar, many=True, context={'request': request})
-        return Response({'results': serializer.data, 'count': similar.count()})
+        return Response({'results': serializer.data, 'count': len(similar)})
 
     # ---- save / unsave ----
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
@@ -381,6 +523,7 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
             return Response({'error': 'Already saved', 'already_saved': True},
                             status=status.HTTP_400_BAD_REQUEST)
         s = Save.objects.create(user=request.user, content_type=ct, object_id=item.id)
+        bump(item.id, save_count=1)
         return Response({'id': s.id, 'saved_at': s.saved_at}, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post', 'delete'], permission_classes=[IsAuthenticated])
@@ -390,40 +533,42 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
         deleted, _ = Save.objects.filter(
             user=request.user, content_type=ct, object_id=item.id
         ).delete()
+        bump(item.id, save_count=-deleted)
         return Response({'saved': False, 'deleted': deleted > 0})
 
     # ---- view ----
     @action(detail=True, methods=['post'])
     def view(self, request, pk=None):
-        item = self.get_object()
+        # Views go through the write-behind buffer (see view_buffer); the
+        # database is only read on a cold cache and written on flush.
+        content_id = int(pk) if str(pk).isdigit() else None
+        if content_id is None:
+            return Response({'error': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        def load_view_count():
+            return get_object_or_404(
+                Content.objects.values_list('view_count', flat=True), pk=content_id
+            )
+
+        view_count = current_view_count(content_id, load_view_count)
         should_count = True
         if request.user.is_authenticated:
-            ct = ContentType.objects.get_for_model(Content)
-            one_day_ago = timezone.now() - timedelta(days=1)
             try:
-                already_viewed = ViewHistory.objects.filter(
-                    user=request.user, content_type=ct,
-                    object_id=item.id, viewed_at__gte=one_day_ago
-                ).exists()
-                if already_viewed:
-                    should_count = False
-                else:
-                    Content.objects.filter(id=item.id).update(view_count=F('view_count') + 1)
-                    item.refresh_from_db()
-                ViewHistory.objects.update_or_create(
-                    user=request.user, content_type=ct, object_id=item.id,
-                    defaults={'status': 'viewed'}
-                )
+                should_count = record_view(content_id, request.user.id)
+                if should_count:
+                    view_count += 1
             except Exception as e:
                 logger.error(f"Error recording view: {e}")
                 should_count = False
-        return Response({'view_count': item.view_count, 'counted': should_count})
+        return Response({'view_count': view_count, 'counted': should_count})
 
     # ---- sessions ----
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
     def session_stats(self, request, pk=None):
         item = self.get_object()
-        ct = ContentType.objects.get_for_model(Content)
+        return Response(self._session_stats_data(request, item, ContentType.objects.get_for_model(Content)))
+
+    def _session_stats_data(self, request, item, ct):
         sessions = TimeSession.objects.filter(
             user=request.user, content_type=ct, object_id=item.id
         ).order_by('-created_at')[:10]
@@ -457,7 +602,7 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
             'session_type': s.session_type, 'started_at': s.started_at,
             'ended_at': s.ended_at, 'notes': s.notes, 'created_at': s.created_at
         } for s in sessions]
-        return Response({'sessions': sessions_data, 'stats': stats})
+        return {'sessions': sessions_data, 'stats': stats}
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def save_session(self, request, pk=None):
@@ -470,14 +615,16 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
             return Response({'error': 'Invalid duration'}, status=status.HTTP_400_BAD_REQUEST)
         try:
             ct = ContentType.objects.get_for_model(Content)
-            session = TimeSession.objects.create(
-                user=request.user, content_type=ct, object_id=item.id,
-                session_duration=timedelta(seconds=duration_seconds),
-                started_at=timezone.now() - timedelta(seconds=duration_seconds),
-                ended_at=timezone.now(),
-                session_type=request.data.get('session_type', 'practice'),
-                notes=request.data.get('notes', '')
-            )
+            with transaction.atomic():
+                session = TimeSession.objects.create(
+                    user=request.user, content_type=ct, object_id=item.id,
+                    session_duration=timedelta(seconds=duration_seconds),
+                    started_at=timezone.now() - timedelta(seconds=duration_seconds),
+                    ended_at=timezone.now(),
+                    session_type=request.data.get('session_type', 'practice'),
+                    notes=request.data.get('notes', '')
+                )
+                record_session(item.id, duration_seconds)
             response_data = {
                 'message': 'Session saved',
                 'session': {'id': session.id, 'duration_seconds': session.session_duration_in_seconds,
@@ -508,7 +655,9 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
             session = TimeSession.objects.get(
                 id=session_id, user=request.user, content_type=ct, object_id=item.id
             )
-            session.delete()
+            with transaction.atomic():
+                session.delete()
+                forget_session(item.id, session.session_duration_in_seconds)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except TimeSession.DoesNotExist:
             return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -536,113 +685,80 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     # ---- statistics ----
-    def _get_successful_users_study_stats(self, item, ct):
-        from apps.interactions.models import TaxonomyTimeSpent
-        from apps.caracteristics.models import Chapter
-        successful_users = Complete.objects.filter(
-            content_type=ct, object_id=item.id, status='success'
-        ).values_list('user', flat=True)
-        if not successful_users:
-            return {'exercises_avg_seconds': 0, 'lessons_avg_seconds': 0,
-                    'exams_avg_seconds': 0, 'chapters': []}
-        chapters = item.chapters.all()
-        if not chapters:
-            return {'exercises_avg_seconds': 0, 'lessons_avg_seconds': 0,
-                    'exams_avg_seconds': 0, 'chapters': []}
-        chapter_ct = ContentType.objects.get_for_model(Chapter)
-        from datetime import timedelta as td
-        total_ex = td(); total_le = td(); total_ex2 = td(); count = 0
-        for user_id in successful_users:
-            for chapter in chapters:
-                ts = TaxonomyTimeSpent.objects.filter(
-                    user_id=user_id, taxonomy_type='chapter',
-                    content_type=chapter_ct, object_id=chapter.id
-                ).first()
-                if ts:
-                    total_ex += ts.exercise_time
-                    total_le += ts.lesson_time
-                    total_ex2 += ts.exam_time
-            count += 1
-        if count > 0:
-            return {
-                'exercises_avg_seconds': int(total_ex.total_seconds() / count),
-                'lessons_avg_seconds': int(total_le.total_seconds() / count),
-                'exams_avg_seconds': int(total_ex2.total_seconds() / count),
-                'chapters': [c.name for c in chapters]
-            }
-        return {'exercises_avg_seconds': 0, 'lessons_avg_seconds': 0,
-                'exams_avg_seconds': 0, 'chapters': [c.name for c in chapters]}
-
     @action(detail=True, methods=['get'])
     def statistics(self, request, pk=None):
         item = self.get_object()
-        user_id = request.user.id if (request.user and request.user.is_authenticated) else None
-        cache_key = f'content_stats_{item.id}_user_{user_id}'
-        cached = cache.get(cache_key)
-        if cached:
-            return Response(cached)
         try:
-            ct = ContentType.objects.get_for_model(Content)
-            completions = Complete.objects.filter(content_type=ct, object_id=item.id)
-            success_count = completions.filter(status='success').count()
-            review_count = completions.filter(status='review').count()
-            total_participants = completions.values('user').distinct().count()
-            success_percentage = int(success_count / total_participants * 100) if total_participants > 0 else 0
-            sessions = TimeSession.objects.filter(content_type=ct, object_id=item.id)
-            if sessions.exists():
-                total_secs = sum(int(s.session_duration.total_seconds()) for s in sessions)
-                average_time_seconds = int(total_secs / sessions.count())
-                best_time_seconds = min(int(s.session_duration.total_seconds()) for s in sessions)
-            else:
-                average_time_seconds = best_time_seconds = 0
-            user_time_seconds = user_time_percentile = user_completed = None
-            is_auth = request.user and request.user.is_authenticated
-            if is_auth:
-                uc = Complete.objects.filter(user=request.user, content_type=ct, object_id=item.id).first()
-                user_completed = uc.status if uc else None
-                user_session = sessions.filter(user=request.user).order_by('-created_at').first()
-                if user_session:
-                    user_time_seconds = int(user_session.session_duration.total_seconds())
-                    slower = sessions.filter(
-                        session_duration__gt=user_session.session_duration
-                    ).values('user').distinct().count()
-                    user_time_percentile = int(slower / max(total_participants, 1) * 100)
-            solution_views = SolutionView.objects.filter(content_type=ct, object_id=item.id)
-            users_viewed_before_success = 0
-            for u in solution_views.values('user').distinct():
-                uid = u['user']
-                uv = solution_views.filter(user=uid).first()
-                uc = Complete.objects.filter(user=uid, content_type=ct, object_id=item.id, status='success').first()
-                if uv and uc and uv.viewed_at <= uc.created_at:
-                    users_viewed_before_success += 1
-            user_viewed_solution = is_auth and solution_views.filter(user=request.user).exists()
-            solution_matches = SolutionMatch.objects.filter(content_type=ct, object_id=item.id)
-            user_solution_matched = is_auth and solution_matches.filter(user=request.user).exists()
-            study_stats = self._get_successful_users_study_stats(item, ct)
-            data = {
-                'total_participants': total_participants,
-                'success_count': success_count,
-                'review_count': review_count,
-                'success_percentage': success_percentage,
-                'average_time_seconds': average_time_seconds,
-                'best_time_seconds': best_time_seconds,
-                'solution_views_before_success': users_viewed_before_success,
-                'solution_view_percentage': int(users_viewed_before_success / max(success_count, 1) * 100) if success_count else 0,
-                'user_time_percentile': user_time_percentile,
-                'user_completed': user_completed,
-                'user_viewed_solution': user_viewed_solution,
-                'user_time_seconds': user_time_seconds,
-                'solution_match_count': solution_matches.count(),
-                'user_solution_matched': user_solution_matched,
-                'successful_users_study_stats': study_stats
-            }
-            cache.set(cache_key, data, 300)
-            return Response(data)
+            return Response(self._statistics_data(request, item, ContentType.objects.get_for_model(Content)))
         except Exception as e:
             logger.error(f"Error calculating statistics: {e}")
             return Response({'error': 'Failed to calculate statistics'},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def _statistics_data(self, request, item, ct, user_completes=None):
+        user_id = request.user.id if (request.user and request.user.is_authenticated) else None
+        with_distribution = request.query_params.get('distribution') in ('1', 'true')
+        cache_key = f'content_stats_{item.id}_user_{user_id}'
+        cached = cache.get(cache_key)
+        if cached:
+            if with_distribution:
+                cached = {**cached, 'time_distribution': time_distribution(
+                    get_content_stats(item), cached['user_time_seconds']
+                )}
+            return cached
+        stats = get_content_stats(item)
+        success_count, review_count = item.success_count, item.review_count
+        total_participants = success_count + review_count
+        success_percentage = int(success_count / total_participants * 100) if total_participants > 0 else 0
+        if stats.session_count:
+            average_time_seconds = int(stats.total_session_seconds / stats.session_count)
+            best_time_seconds = stats.best_session_seconds or 0
+        else:
+            average_time_seconds = best_time_seconds = 0
+        user_time_seconds = user_time_percentile = user_completed = None
+        user_viewed_solution = user_solution_matched = False
+        if user_id:
+            if user_completes is not None:
+                user_completed = user_completes.get(item.id)
+            else:
+                user_completed = Complete.objects.filter(
+                    user=request.user, content_type=ct, object_id=item.id
+                ).values_list('status', flat=True).first()
+            user_session = TimeSession.objects.filter(
+                user=request.user, content_type=ct, object_id=item.id
+            ).order_by('-created_at').values_list('session_duration', flat=True).first()
+            if user_session is not None:
+                user_time_seconds = int(user_session.total_seconds())
+                user_time_percentile = time_percentile(stats, user_time_seconds)
+            user_viewed_solution = SolutionView.objects.filter(
+                user=request.user, content_type=ct, object_id=item.id
+            ).exists()
+            user_solution_matched = SolutionMatch.objects.filter(
+                user=request.user, content_type=ct, object_id=item.id
+            ).exists()
+        users_viewed_before_success = stats.solution_views_before_success
+        data = {
+            'total_participants': total_participants,
+            'success_count': success_count,
+            'review_count': review_count,
+            'success_percentage': success_percentage,
+            'average_time_seconds': average_time_seconds,
+            'best_time_seconds': best_time_seconds,
+            'solution_views_before_success': users_viewed_before_success,
+            'solution_view_percentage': int(users_viewed_before_success / max(success_count, 1) * 100) if success_count else 0,
+            'user_time_percentile': user_time_percentile,
+            'user_completed': user_completed,
+            'user_viewed_solution': user_viewed_solution,
+            'user_time_seconds': user_time_seconds,
+            'solution_match_count': stats.solution_match_count,
+            'user_solution_matched': user_solution_matched,
+            'successful_users_study_stats': stats.study_stats
+        }
+        cache.set(cache_key, data, 300)
+        if with_distribution:
+            data = {**data, 'time_distribution': time_distribution(stats, user_time_seconds)}
+        return data
+
     # ---- solution view/match tracking ----
     @action(detail=True, methods=['post', 'delete'], permission_classes=[IsAuthenticated])
     def mark_solution_viewed(self, request, pk=None):
@@ -654,9 +770,14 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
                 cache.delete(f'content_stats_{item.id}_user_{request.user.id}')
                 return Response({'marked_as_viewed': True})
             else:
-                deleted, _ = SolutionView.objects.filter(
-                    user=request.user, content_type=ct, object_id=item.id
-                ).delete()
+                with transaction.atomic():
+                    views = SolutionView.objects.filter(
+                        user=request.user, content_type=ct, object_id=item.id
+                    )
+                    viewed_at = views.values_list('viewed_at', flat=True).first()
+                    deleted, _ = views.delete()
+                    if deleted:
+                        solution_view_removed(item.id, request.user.id, viewed_at)
                 cache.delete(f'content_stats_{item.id}_user_{request.user.id}')
                 cache.delete(f'content_stats_{item.id}_user_None')
                 return Response({'marked_as_viewed': False, 'deleted': deleted > 0})
@@ -670,13 +791,21 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
         ct = ContentType.objects.get_for_model(Content)
         try:
             if request.method == 'POST':
-                SolutionMatch.objects.get_or_create(user=request.user, content_type=ct, object_id=item.id)
+                with transaction.atomic():
+                    _, created = SolutionMatch.objects.get_or_create(
+                        user=request.user, content_type=ct, object_id=item.id
+                    )
+                    if created:
+                        solution_match_changed(item.id, 1)
                 cache.delete(f'content_stats_{item.id}_user_{request.user.id}')
                 return Response({'solution_matched': True})
             else:
-                deleted, _ = SolutionMatch.objects.filter(
-                    user=request.user, content_type=ct, object_id=item.id
-                ).delete()
+                with transaction.atomic():
+                    deleted, _ = SolutionMatch.objects.filter(
+                        user=request.user, content_type=ct, object_id=item.id
+                    ).delete()
+                    if deleted:
+                        solution_match_changed(item.id, -1)
                 return Response({'solution_matched': False, 'deleted': deleted > 0})
         except Exception as e:
             logger.error(f"Failed to manage solution match: {e}")
@@ -837,12 +966,74 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
     def ai_corrections(self, request, pk=None):
         item = self.get_object()
-        ct = ContentType.objects.get_for_model(Content)
+        return Response(self._ai_corrections_data(request, item, ContentType.objects.get_for_model(Content)))
+
+    def _ai_corrections_data(self, request, item, ct):
         corrections = AICorrection.objects.filter(
             user=request.user, content_type=ct, object_id=item.id
         ).order_by('-submitted_at')[:10]
-        serializer = AICorrectionSerializer(corrections, many=True, context={'request': request})
-        return Response(serializer.data)
+        return AICorrectionSerializer(corrections, many=True, context={'request': request}).data
+
+    # ---- bundle ----
+    BUNDLE_SECTIONS = ('stats', 'progress', 'sessions', 'recs', 'ai')
+    BUNDLE_AUTH_SECTIONS = ('progress', 'sessions', 'ai')
+
+    @action(detail=True, methods=['get'])
+    def bundle(self, request, pk=None):
+        """
+        GET /api/contents/<id>/bundle/?include=stats,progress,sessions,recs,ai
+        Content detail plus the requested sections (default: all) in one
+        response. The item, its ContentType and the user's vote / save /
+        completion state are loaded once and shared by every section; the
+        sections are built in turn, or on CONTENT_BUNDLE_WORKERS threads while
+        the detail is serialized when that is above 1. Threads open their own
+        DB connections, which cannot see an open transaction, so inside an
+        atomic block the sections always run on the request thread.
+        progress, sessions and ai (the user's AI corrections) are left out for
+        anonymous users.
+        With DEBUG on, `timings` reports milliseconds per section.
+        """
+        include = request.query_params.get('include')
+        sections = [s.strip() for s in include.split(',') if s.strip()] if include else list(self.BUNDLE_SECTIONS)
+        unknown = sorted(set(sections) - set(self.BUNDLE_SECTIONS))
+        if unknown:
+            return Response({'error': f"Unknown sections: {', '.join(unknown)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not (request.user and request.user.is_authenticated):
+            sections = [s for s in sections if s not in self.BUNDLE_AUTH_SECTIONS]
+
+        timings = {}
+        started = time.perf_counter()
+        item = self.get_object()
+        ct = ContentType.objects.get_for_model(Content)
+        state = _user_state_context(request, [item])
+        timings['load'] = _elapsed_ms(started)
+
+        builders = {
+            'stats': lambda: self._statistics_data(request, item, ct, state.get('user_completes')),
+            'progress': lambda: self._question_progress_data(request, item, ct),
+            'sessions': lambda: self._session_stats_data(request, item, ct),
+            'recs': lambda: _recommendations_data(request, item),
+            'ai': lambda: self._ai_corrections_data(request, item, ct),
+        }
+        detail = lambda: ContentSerializer(item, context={**self.get_serializer_context(), **state}).data
+        workers = min(settings.CONTENT_BUNDLE_WORKERS, len(sections))
+        if workers > 1 and not connection.in_atomic_block:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    name: pool.submit(_bundle_section, name, builders[name], timings, True)
+                    for name in sections
+                }
+                data = {'content': _bundle_section('content', detail, timings)}
+                data.update((name, future.result()) for name, future in futures.items())
+        else:
+            data = {'content': _bundle_section('content', detail, timings)}
+            data.update((name, _bundle_section(name, builders[name], timings)) for name in sections)
+
+        if settings.DEBUG:
+            timings['total'] = _elapsed_ms(started)
+            data['timings'] = timings
+        return Response(data)
 
 
 # =====================
@@ -850,7 +1041,7 @@ class ContentViewSet(VoteMixin, viewsets.ModelViewSet):
 # =====================
 
 class SolutionViewSet(VoteMixin, viewsets.ModelViewSet):
-    queryset = Solution.objects.all()
+    queryset = Solution.objects.select_related('author__profile')
     serializer_class = SolutionSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
@@ -863,7 +1054,7 @@ class SolutionViewSet(VoteMixin, viewsets.ModelViewSet):
 # =====================
 
 class CommentViewSet(VoteMixin, viewsets.ModelViewSet):
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related('author__profile')
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
@@ -875,20 +1066,6 @@ class CommentViewSet(VoteMixin, viewsets.ModelViewSet):
 # Recommendations
 # ---------------------------------------------------------------------------
 
-def _taxonomy_qs(source, exclude_id=None):
-    qs = Content.objects.filter(
-        Q(chapters__in=source.chapters.all()) |
-        Q(theorems__in=source.theorems.all()) |
-        Q(subfields__in=source.subfields.all()) |
-        Q(subject=source.subject)
-    )
-    if exclude_id:
-        qs = qs.exclude(id=exclude_id)
-    return qs.distinct().annotate(
-        relevance=Count('chapters') + Count('theorems') + Count('subfields')
-    ).order_by('-relevance', '-view_count')
-
-
 @api_view(['POST'])
 @perm_classes([IsAuthenticated])
 def parse_pdf_view(request):
@@ -924,11 +1101,47 @@ def get_content_recommendations(request, content_id):
         source = Content.objects.get(id=content_id)
     except Content.DoesNotExist:
         return Response({'error': 'Not found'}, status=404)
+    return Response(_recommendations_data(request, source))
+
+
+def _recommendations_data(request, source):
+    content_id = source.id
+    limits = {'exercise': 3, 'lesson': 2, 'exam': 2}
+    ids = neighbor_ids(content_id)
+    if ids:
+        wanted = {t: ids.get(t, [])[:n] for t, n in limits.items()}
+        by_id = Content.objects.select_related('author__profile', 'subject').prefetch_related(
+            'chapters', 'class_levels', 'theorems', 'subfields', 'subject__class_levels'
+        ).in_bulk([i for group in wanted.values() for i in group])
+        picked = {t: [by_id[i] for i in group if i in by_id] for t, group in wanted.items()}
+    else:
+        # index not built for this item yet — fall back to the live query
+        qs = live_neighbors_qs(source, exclude_id=content_id)
+        picked = {t: list(qs.filter(type=t)[:n]) for t, n in limits.items()}
+    groups = {
+        'exercises': picked['exercise'],
+        'lessons': picked['lesson'],
+        'exams': picked['exam'],
+    }
+    flat = [i for items in groups.values() for i in items]
+    ctx = {'request': request, **_mongo_context(flat), **_user_state_context(request, flat)}
+    return {
+        key: ContentListSerializer(items, many=True, context=ctx).data
+        for key, items in groups.items()
+    }
+
 
-    qs = _taxonomy_qs(source, exclude_id=content_id)
-    ctx = {'request': request}
-    return Response({
-        'exercises': ContentListSerializer(qs.filter(type='exercise')[:3], many=True, context=ctx).data,
-        'lessons': ContentListSerializer(qs.filter(type='lesson')[:2], many=True, context=ctx).data,
-        'exams': ContentListSerializer(qs.filter(type='exam')[:2], many=True, context=ctx).data,
-    })
+@api_view(['GET'])
+@authentication_classes([])
+@perm_classes([AllowAny])
+def search_suggest(request):
+    """
+    GET /api/search/suggest/?q=<prefix>&limit=8
+    Title and taxonomy suggestions from the in-memory prefix index (no DB access).
+    """
+    q = request.query_params.get('q', '')
+    try:
+        limit = min(max(int(request.query_params.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
+    return Response({'results': suggest(q, limit) if q.strip() else []})
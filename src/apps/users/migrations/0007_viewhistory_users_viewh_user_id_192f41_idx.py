@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('users', '0006_teacherinvitation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='viewhistory',
+            index=models.Index(fields=['user', 'viewed_at', 'id'], name='users_viewh_user_id_192f41_idx'),
+        ),
+    ]
@@ -353,6 +353,9 @@ class ViewHistory(models.Model):
         app_label = 'users'
         ordering = ['-viewed_at']
         unique_together = ['user', 'content_type', 'object_id']
+        indexes = [
+            models.Index(fields=['user', 'viewed_at', 'id']),
+        ]
         verbose_name = "View History"
         verbose_name_plural = "View Histories"
     
@@ -93,6 +93,34 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return obj.students.count()
 
 
+class AuthorSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact author representation embedded in content, comment and solution
+    payloads. Callers should select_related('author__profile'); the full
+    profile is only served by /api/users/<username>/.
+    """
+    avatar = serializers.SerializerMethodField()
+    reputation = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'avatar', 'reputation')
+
+    def get_reputation(self, obj):
+        return getattr(getattr(obj, 'profile', None), 'reputation', None)
+
+    def get_avatar(self, obj):
+        profile = getattr(obj, 'profile', None)
+        if profile is None:
+            return None
+        if profile.avatar_file:
+            request = self.context.get('request')
+            if request:
+                return request.build_absolute_uri(profile.avatar_file.url)
+            return profile.avatar_file.url
+        return profile.avatar_url
+
+
 class UserSerializer(serializers.ModelSerializer):
     profile = UserProfileSerializer(read_only=False)
     is_self = serializers.SerializerMethodField()
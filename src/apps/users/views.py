@@ -16,6 +16,7 @@ from .time_stats_views import TimeStatsViewMixin
 from apps.things.models import Content
 from apps.caracteristics.models import Subject, ClassLevel
 from apps.interactions.models import Complete, Save
+from apps.things.pagination import paginate_by_cursor
 from apps.things.serializers import ContentListSerializer
 from apps.interactions.serializers import ViewHistorySerializer
 
@@ -444,7 +445,13 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         user = self.get_object()
         if user.id != request.user.id and not request.user.is_superuser:
             return Response({'error': "You cannot view other users' history"}, status=status.HTTP_403_FORBIDDEN)
-        history = ViewHistory.objects.filter(user=user).order_by('-viewed_at')
+        history = ViewHistory.objects.filter(user=user).order_by('-viewed_at', '-id')
+        page = paginate_by_cursor(
+            history, request,
+            lambda rows: ViewHistorySerializer(rows, many=True, context={'request': request}).data,
+        )
+        if page is not None:
+            return page
         return Response(ViewHistorySerializer(history, many=True, context={'request': request}).data)
 
     @action(detail=True, methods=['get'])
@@ -176,6 +176,35 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017')
 MONGODB_DB_NAME = os.getenv('MONGODB_DB_NAME', 'fidni')
 
+REDIS_URL = os.getenv('REDIS_URL')
+
+# Shared by every worker when Redis is configured; the LocMem fallback is
+# per process, so caches that need cross-worker invalidation (the content
+# taxonomy map) are bypassed with it.
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Content view buffer (apps.things.view_buffer); falls back to an
+# in-process buffer when no Redis URL is configured.
+VIEW_BUFFER_REDIS_URL = REDIS_URL
+VIEW_BUFFER_FLUSH_SECONDS = int(os.getenv('VIEW_BUFFER_FLUSH_SECONDS', '30'))
+
+# Threads used to build independent sections of /api/contents/<id>/bundle/;
+# 1 (the default) builds them sequentially on the request thread. Each
+# thread opens its own database connection per request.
+CONTENT_BUNDLE_WORKERS = int(os.getenv('CONTENT_BUNDLE_WORKERS', '1'))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -19,13 +19,13 @@ from apps.users.dashboard_views import (
     get_recommended_content,
 )
 from apps.users.study_stats_views import get_study_statistics
-from apps.things.views import get_content_recommendations, parse_pdf_view
+from apps.things.views import get_content_recommendations, parse_pdf_view, search_suggest
 from apps.caracteristics.views import (
     ClassLevelViewSet, SubjectViewSet, ChapterViewSet, SubfieldViewSet, TheoremViewSet,
     difficulty_counts,
 )
 from apps.authentication.views import LogoutView, LoginView, RegisterView
-from apps.interactions.views import RevisionListViewSet, track_study_time, get_taxonomy_time_stats
+from apps.interactions.views import RevisionListViewSet, track_study_time, track_study_time_batch, get_taxonomy_time_stats
 from apps.notebooks.views import (
     NotebookViewSet, NotebookChapterViewSet, NotebookLessonEntryAnnotationViewSet
 )
@@ -121,6 +121,7 @@ urlpatterns = [
 
     # Study time tracking
     path('api/study-time/track/', track_study_time, name='track-study-time'),
+    path('api/study-time/track-batch/', track_study_time_batch, name='track-study-time-batch'),
     path('api/study-time/taxonomy-stats/', get_taxonomy_time_stats, name='taxonomy-time-stats'),
 
     # Study statistics
@@ -132,6 +133,9 @@ urlpatterns = [
     # Recommendations
     path('api/contents/<int:content_id>/recommendations/', get_content_recommendations, name='content-recommendations'),
 
+    # Search-as-you-type
+    path('api/search/suggest/', search_suggest, name='search-suggest'),
+
     # PDF parsing
     path('api/parse-pdf/', parse_pdf_view, name='parse-pdf'),
 